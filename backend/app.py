@@ -1,16 +1,148 @@
-
-from flask import Flask, jsonify, send_from_directory, request
+from flask import Flask, Response, jsonify, send_from_directory, request, stream_with_context
 from flask_cors import CORS
 import pandas as pd
+import pyarrow as pa
 import os
 import glob
 import json
-from market_phases import calculate_market_phases
+import logging
+import threading
+import time
+from datetime import date
+from market_phases import DEFAULT_PARAMS, normalize_params
+from data_store import DatasetStore, GRANULARITIES
+from responses import negotiate_format, tabular_response
+from regional_grid import REQUIRED_COLUMNS as REGIONAL_COLUMNS, RegionalGridBuilder, cache_path as regional_cache_path
+from market_phase_cube import MarketPhaseCube
+from market_phase_memo import MarketPhaseMemo
+from market_phase_view import MIN_POINTS, ResultFiles, shape_result
+from region_index import RegionIndexCache
+import profiling
+from metrics import Registry, instrument, phase, process_resident_bytes
+from jobs import JobQueue, JobQueueFull, FINISHED as JOB_FINISHED
+from http_cache import validators, request_variant, is_fresh, not_modified, stamp, send_cache_file, ensure_gzip
+
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s %(message)s'
+)
+log = logging.getLogger('tankdaten.app')
 
 app = Flask(__name__, static_folder="../frontend", static_url_path="/")
 CORS(app)
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+# Data directory (overridable, e.g. for benchmarks against synthetic data)
+DATA_DIR = os.environ.get('DATA_DIR') or os.path.join(os.path.dirname(__file__), 'data')
+
+# Shared in-memory dataset store (byte budget configurable via env, default 512 MB)
+DATA_CACHE_MAX_BYTES = int(os.environ.get('DATA_CACHE_MAX_MB', 512)) * 1024 * 1024
+# Production (serve.py): datasets as read-only memory-mapped Arrow files shared by all workers
+DATA_MMAP_DIR = os.environ.get('DATA_MMAP_DIR') or None
+datasets = DatasetStore(DATA_DIR, max_bytes=DATA_CACHE_MAX_BYTES, mmap_dir=DATA_MMAP_DIR)
+
+# Spatial index + monthly aggregates per year for /api/data/history
+region_indexes = RegionIndexCache(datasets)
+
+# Precomputed market phases per PLZ3 region
+market_phase_cube = MarketPhaseCube(os.path.join(DATA_DIR, 'cache'))
+
+# Memoized live calculations (custom parameters / regions without cube), results bounded by bytes (default 64 MB)
+MEMO_CACHE_MAX_BYTES = int(os.environ.get('MEMO_CACHE_MAX_MB', 64)) * 1024 * 1024
+# Results are also written to cache/market_phases_memo/ so every worker process can serve them
+market_phase_memo = MarketPhaseMemo(
+    datasets,
+    max_result_bytes=MEMO_CACHE_MAX_BYTES,
+    results_dir=os.path.join(DATA_DIR, 'cache', 'market_phases_memo')
+)
+
+# Parsed market_phases_{fuel}.json for sliced / downsampled responses
+market_phase_files = ResultFiles()
+
+# Write-through builder for missing regional_{year}.json grids
+regional_grids = RegionalGridBuilder(
+    os.path.join(DATA_DIR, 'cache'),
+    lambda year: datasets.frame('daily', year, columns=REGIONAL_COLUMNS)
+)
+
+# Bounded background pool for cache misses of heavy computations (202 + job id, 503 when full).
+# Job state lives in cache/jobs/, so limits, coalescing and /api/jobs/<id> span all worker processes
+heavy_jobs = JobQueue(
+    os.path.join(DATA_DIR, 'cache', 'jobs'),
+    workers=int(os.environ.get('HEAVY_JOB_WORKERS', 2)),
+    max_queued=int(os.environ.get('HEAVY_JOB_QUEUE', 8))
+)
+
+# Prometheus metrics: per-route latency + phases, bytes sent, cache counters (/api/metrics)
+metrics = Registry(prefix='tankdaten_')
+instrument(app, metrics)
+
+# Opt-in cProfile report for single requests (?profile=1, only with PROFILE_REQUESTS=1)
+profiling.install(app)
+
+job_duration = metrics.histogram('job_duration_seconds', 'Run time of background jobs by kind', ('kind',))
+
+@metrics.collector
+def _cache_metrics():
+    """Hit/miss/eviction counters and sizes of every cache layer, read at scrape time."""
+    ds = datasets.stats()
+    memo = market_phase_memo.stats()
+    layers = {
+        'datasets': ds,
+        'memo_series': memo['series'],
+        'memo_metrics': memo['metrics'],
+        'memo_results': memo['results'],
+        'region_index': region_indexes.stats(),
+        'market_phase_files': market_phase_files.stats(),
+    }
+    coalesced = {
+        'datasets': ds['coalesced'],
+        'memo': memo['coalesced'],
+        'region_index': region_indexes.stats()['coalesced'],
+        'regional_grid': regional_grids.stats()['coalesced'],
+    }
+    jobs = heavy_jobs.stats()
+
+    def per_layer(field):
+        return [({'cache': name}, stats[field]) for name, stats in layers.items() if field in stats]
+
+    def entries(stats):
+        return len(stats['entries']) if isinstance(stats['entries'], list) else stats['entries']
+
+    return [
+        ('cache_hits_total', 'counter', 'Cache hits per cache layer', per_layer('hits')),
+        ('cache_misses_total', 'counter', 'Cache misses per cache layer', per_layer('misses')),
+        ('cache_evictions_total', 'counter', 'Cache evictions per cache layer', per_layer('evictions')),
+        ('cache_entries', 'gauge', 'Entries held per cache layer',
+         [({'cache': name}, entries(stats)) for name, stats in layers.items() if 'entries' in stats]),
+        ('cache_bytes', 'gauge', 'Bytes held per cache layer (estimated for the memo)', per_layer('bytes')),
+        ('coalesced_calls_total', 'counter', 'Calls that waited for an identical in-flight computation',
+         [({'cache': name}, n) for name, n in coalesced.items()]),
+        ('regional_grid_builds_total', 'counter', 'Regional grids built on a cache miss',
+         [({}, regional_grids.stats()['builds'])]),
+        ('dataset_bytes', 'gauge', 'Bytes of Arrow tables held by the dataset store', [({}, ds['bytes'])]),
+        ('dataset_budget_bytes', 'gauge', 'Byte budget of the dataset store', [({}, ds['max_bytes'])]),
+        ('dataset_mapped', 'gauge', '1 if datasets are memory-mapped Arrow files', [({}, int(ds['mapped']))]),
+        ('process_resident_bytes', 'gauge', 'Resident set size of this process', [({}, process_resident_bytes())]),
+        ('jobs', 'gauge', 'Heavy jobs by state',
+         [({'state': 'queued'}, jobs['queued']), ({'state': 'running'}, jobs['running'])]),
+        ('jobs_total', 'counter', 'Heavy job submissions by outcome',
+         [({'outcome': k}, jobs[k]) for k in ('submitted', 'shared', 'rejected', 'failed')]),
+    ]
+
+# Set once the data plane is loaded (warm_up / dev server), reported by /api/ready
+ready = threading.Event()
+
+def warm_up():
+    """Preload every dataset, the history indexes and the gzip variants of the cache files."""
+    for granularity in GRANULARITIES:
+        for year in datasets.available_years(granularity):
+            datasets.table(granularity, year)
+    for year in datasets.available_years('daily'):
+        region_indexes.get(year)
+    for pattern in ('cache/*.json', 'geometries/*.geojson'):
+        for path in glob.glob(os.path.join(DATA_DIR, pattern)):
+            ensure_gzip(path)
+    ready.set()
 
 @app.route('/')
 def serve_index():
@@ -20,94 +152,176 @@ def serve_index():
 def serve_static(path):
     return send_from_directory(app.static_folder, path)
 
-@app.route('/api/data/daily')
-def get_daily_data():
+def _split_arg(name):
+    """Comma separated query parameter -> list (None if absent)."""
+    value = request.args.get(name, type=str)
+    if not value:
+        return None
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+def _date_arg(name):
+    value = request.args.get(name, type=str)
+    if not value:
+        return None
+    return date.fromisoformat(value)
+
+def _int_arg(name, minimum):
+    """Integer query parameter >= minimum (None if absent); ValueError for anything else."""
+    value = request.args.get(name, type=str)
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    if number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return number
+
+def _serve_granularity(granularity):
+    """Shared handler for /api/data/{daily,weekly,monthly} with optional pushdown filters."""
     try:
         year = request.args.get('year', default=2024, type=int)
-        file_path = os.path.join(DATA_DIR, f'data_daily_{year}.parquet')
-        if not os.path.exists(file_path):
+        if not datasets.exists(granularity, year):
             return jsonify({"error": f"Data for year {year} not found"}), 404
-            
-        df = pd.read_parquet(file_path)
-        return jsonify(df.to_dict(orient='records'))
+
+        v = validators(datasets.files(granularity, year), request_variant(negotiate_format()))
+        if is_fresh(v):
+            return not_modified(v)
+
+        try:
+            with phase('load'):
+                table = datasets.query(
+                    granularity, year,
+                    fuels=_split_arg('fuel'),
+                    regions=_split_arg('region'),
+                    date_from=_date_arg('from'),
+                    date_to=_date_arg('to'),
+                    columns=_split_arg('columns')
+                )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        with phase('serialize'):
+            return stamp(tabular_response(table), v)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/ready')
+def get_readiness():
+    """Readiness probe: 503 until the data plane is loaded."""
+    if not ready.is_set():
+        return jsonify({"status": "starting"}), 503
+    return jsonify({"status": "ready", "pid": os.getpid(), "datasets": datasets.stats(), "jobs": heavy_jobs.stats()})
+
+def _run_as_job(key, fn):
+    """Hand a cache miss to the job pool: 202 with the job, or 503 + Retry-After when the queue is full."""
+    def timed():
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            job_duration.observe(time.perf_counter() - start, kind=key[0])
+
+    try:
+        job = heavy_jobs.submit(key, timed, result_url=request.full_path.rstrip('?'))
+    except JobQueueFull as e:
+        response = jsonify({"error": str(e), "retry_after": e.retry_after})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    job = heavy_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job", "job_id": job_id}), 404
+    response = jsonify(job.to_dict())
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/jobs/<job_id>/events')
+def get_job_events(job_id):
+    """Server-Sent Events: one 'status' event per state change, closes when the job is finished."""
+    job = heavy_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job", "job_id": job_id}), 404
+
+    def stream():
+        seen = 0
+        while True:
+            events = job.wait(seen, timeout=15)
+            if not events:
+                if heavy_jobs.get(job.id) is None:
+                    return
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                yield f'event: status\ndata: {json.dumps(event)}\n\n'
+            seen += len(events)
+            if events[-1]['status'] in JOB_FINISHED:
+                return
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/data/daily')
+def get_daily_data():
+    return _serve_granularity('daily')
+
 @app.route('/api/data/weekly')
 def get_weekly_data():
-    try:
-        year = request.args.get('year', default=2024, type=int)
-        file_path = os.path.join(DATA_DIR, f'data_weekly_{year}.parquet')
-        if not os.path.exists(file_path):
-            return jsonify({"error": f"Data for year {year} not found"}), 404
-            
-        df = pd.read_parquet(file_path)
-        return jsonify(df.to_dict(orient='records'))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return _serve_granularity('weekly')
 
 @app.route('/api/data/monthly')
 def get_monthly_data():
-    try:
-        year = request.args.get('year', default=2024, type=int)
-        file_path = os.path.join(DATA_DIR, f'data_monthly_{year}.parquet')
-        if not os.path.exists(file_path):
-            return jsonify({"error": f"Data for year {year} not found"}), 404
-            
-        df = pd.read_parquet(file_path)
-        return jsonify(df.to_dict(orient='records'))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return _serve_granularity('monthly')
 
 @app.route('/api/data/regional')
 def get_regional_data():
     try:
-        year = request.args.get('year', type=int)
-        
+        year = request.args.get('year', default=2024, type=int)
+        cache_dir = os.path.join(DATA_DIR, 'cache')
+
         # 1. Try Cache First (Mega Efficient)
-        if year:
-            cache_file = os.path.join(DATA_DIR, 'cache', f'regional_{year}.json')
-            if os.path.exists(cache_file):
-                print(f"Serving from cache: {cache_file}")
-                # We can just return the file content
-                with open(cache_file, 'r') as f:
-                    return jsonify(json.load(f))
-
-        # 2. Fallback: Slow Calculation
-        print("Cache miss or no year, calculating...")
-        target_year = year if year else 2024
-        parquet_file = os.path.join(DATA_DIR, f'data_daily_{target_year}.parquet')
-        
-        if not os.path.exists(parquet_file):
-             return jsonify({"error": f"Data for year {target_year} not found"}), 404
-             
-        df = pd.read_parquet(parquet_file)
-        
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
-            if year:
-                df = df[df['date'].dt.year == year]
-            else:
-                max_date = df['date'].max()
-                start_date = max_date - pd.Timedelta(days=30)
-                df = df[df['date'] >= start_date]
-
-        # Aggregate Long Format -> Wide
-        if 'period' in df.columns: # Sometimes aggregated? No, assuming raw
-             pass
-
-        # Group by Region + Fuel first
-        agg = df.groupby(['region_plz2', 'fuel'])['price_mean'].mean().reset_index()
-        
-        # Pivot
-        pivot = agg.pivot(index='region_plz2', columns='fuel', values='price_mean').reset_index()
-        
-        # Ensure cols
-        for col in ['e5', 'e10', 'diesel']:
-            if col not in pivot.columns:
-                pivot[col] = None
-                
-        return jsonify(pivot.to_dict(orient='records'))
+        cache_file = regional_cache_path(cache_dir, year)
+        if os.path.exists(cache_file):
+            log.debug("regional source=cache file=%s", cache_file)
+        else:
+            # 2. Cache miss: build the grid once in the background, persist it, serve it from now on
+            if not datasets.exists('daily', year):
+                return jsonify({"error": f"Data for year {year} not found"}), 404
+            log.info("regional source=job year=%s", year)
+
+            def build():
+                if regional_grids.ensure(year) is None:
+                    raise LookupError(f"No regional data for year {year}")
+            # Profiled requests build inline so the work shows up in the profile
+            if not profiling.active():
+                return _run_as_job(('regional', year), build)
+            try:
+                build()
+            except LookupError as e:
+                return jsonify({"error": str(e)}), 404
+
+        fmt = negotiate_format()
+        # We can just return the file content
+        if fmt == 'json':
+            return send_cache_file(cache_dir, os.path.basename(cache_file))
+
+        v = validators([cache_file], request_variant(fmt))
+        if is_fresh(v):
+            return not_modified(v)
+        with phase('load'):
+            with open(cache_file, 'r') as f:
+                rows = json.load(f)
+        with phase('serialize'):
+            return stamp(tabular_response(pa.Table.from_pylist(rows)), v)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -116,7 +330,7 @@ def get_regional_data():
 def get_states_geo():
     try:
         geo_dir = os.path.join(DATA_DIR, 'geometries')
-        return send_from_directory(geo_dir, 'states.geojson')
+        return send_cache_file(geo_dir, 'states.geojson', mimetype='application/geo+json')
     except Exception as e:
         return jsonify({"error": str(e)}), 404
 
@@ -125,7 +339,7 @@ def get_city_lookup():
     """Serve static city lookup JSON for fast coordinate-to-name mapping."""
     try:
         cache_dir = os.path.join(DATA_DIR, 'cache')
-        return send_from_directory(cache_dir, 'city_lookup.json')
+        return send_cache_file(cache_dir, 'city_lookup.json')
     except Exception as e:
         return jsonify({"error": str(e)}), 404
 
@@ -133,22 +347,28 @@ def get_city_lookup():
 def get_corona_data():
     """Get aggregated 2020 fuel price data for Corona crisis analysis."""
     try:
-        file_path = os.path.join(DATA_DIR, 'data_daily_2020.parquet')
-        if not os.path.exists(file_path):
+        if not datasets.exists('daily', 2020):
             return jsonify({"error": "2020 data not found"}), 404
+
+        v = validators(datasets.files('daily', 2020), request_variant(negotiate_format()))
+        if is_fresh(v):
+            return not_modified(v)
         
-        df = pd.read_parquet(file_path)
+        with phase('load'):
+            df = datasets.frame('daily', 2020, columns=['date', 'fuel', 'price_mean', 'brent_oil_eur'])
         
         # Aggregate by date and fuel type (average across all regions)
-        agg = df.groupby(['date', 'fuel']).agg({
-            'price_mean': 'mean',
-            'brent_oil_eur': 'first'
-        }).reset_index()
+        with phase('compute'):
+            agg = df.groupby(['date', 'fuel']).agg({
+                'price_mean': 'mean',
+                'brent_oil_eur': 'first'
+            }).reset_index()
         
         # Convert date to string for JSON
         agg['date'] = agg['date'].dt.strftime('%Y-%m-%d')
         
-        return jsonify(agg.to_dict(orient='records'))
+        with phase('serialize'):
+            return stamp(tabular_response(agg), v)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -156,28 +376,31 @@ def get_corona_data():
 def get_ukraine_data():
     """Get aggregated 2022 fuel price data for Ukraine crisis analysis."""
     try:
-        file_path = os.path.join(DATA_DIR, 'data_daily_2022.parquet')
-        if not os.path.exists(file_path):
+        if not datasets.exists('daily', 2022):
             return jsonify({"error": "2022 data not found"}), 404
+
+        v = validators(datasets.files('daily', 2022), request_variant(negotiate_format()))
+        if is_fresh(v):
+            return not_modified(v)
         
-        df = pd.read_parquet(file_path)
+        with phase('load'):
+            df = datasets.frame('daily', 2022, columns=['date', 'fuel', 'price_mean', 'brent_oil_eur'])
         
         # Aggregate by date and fuel type
-        agg = df.groupby(['date', 'fuel']).agg({
-            'price_mean': 'mean',
-            'brent_oil_eur': 'first'
-        }).reset_index()
+        with phase('compute'):
+            agg = df.groupby(['date', 'fuel']).agg({
+                'price_mean': 'mean',
+                'brent_oil_eur': 'first'
+            }).reset_index()
         
         # Convert date to string
         agg['date'] = agg['date'].dt.strftime('%Y-%m-%d')
         
-        return jsonify(agg.to_dict(orient='records'))
+        with phase('serialize'):
+            return stamp(tabular_response(agg), v)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# Cache for loaded parquet files
-_parquet_cache = {}
-
 @app.route('/api/data/history')
 def get_region_history():
     try:
@@ -190,42 +413,21 @@ def get_region_history():
         if not year:
             year = 2024  # default year
             
-        file_path = os.path.join(DATA_DIR, f'data_daily_{year}.parquet')
-        if not os.path.exists(file_path):
+        if not datasets.exists('daily', year):
             return jsonify({"error": f"Data for year {year} not found"}), 404
-        
-        cache_key = f'daily_{year}'
-        if cache_key not in _parquet_cache:
-            cols = ['lat', 'lon', 'date', 'fuel', 'price_mean']
-            _parquet_cache[cache_key] = pd.read_parquet(file_path, columns=cols)
-            _parquet_cache[cache_key]['date'] = pd.to_datetime(_parquet_cache[cache_key]['date'])
-        
-        df = _parquet_cache[cache_key]
-    
-        bbox_size = 1.0 
-        df = df[
-            (df['lat'] >= lat - bbox_size) & (df['lat'] <= lat + bbox_size) &
-            (df['lon'] >= lon - bbox_size) & (df['lon'] <= lon + bbox_size)
-        ]
-        
-        if df.empty:
-            return jsonify([])
-        
-        df = df.copy()
-        df['dist'] = ((df['lat'] - lat)**2 + (df['lon'] - lon)**2)**0.5
-        
-        min_dist = df['dist'].min()
-        tolerance = max(0.5, min_dist + 0.1)
-        df = df[df['dist'] <= tolerance]
-
-        if df.empty:
-            return jsonify([])
 
-        df['month'] = df['date'].dt.month
-        agg = df.groupby(['month', 'fuel'])['price_mean'].mean().reset_index()
-        pivot = agg.pivot(index='month', columns='fuel', values='price_mean').reset_index()
+        v = validators(datasets.files('daily', year), request_variant(negotiate_format()))
+        if is_fresh(v):
+            return not_modified(v)
+        
+        # Nearest-centroid lookup + slice of the precomputed month x fuel aggregates
+        with phase('load'):
+            index = region_indexes.get(year)
+        with phase('compute'):
+            pivot = index.query(lat, lon)
         
-        return jsonify(pivot.to_dict(orient='records'))
+        with phase('serialize'):
+            return stamp(tabular_response(pivot), v)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -236,41 +438,93 @@ def get_market_phases_route():
         fuel = request.args.get('fuel', default='e10', type=str)
         region = request.args.get('region', type=str) # Optional PLZ3
 
+        # Optional detection parameters (window sizes, thresholds, percentiles, ...)
+        try:
+            params = normalize_params({k: v for k, v in request.args.items() if k in DEFAULT_PARAMS})
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        default_params = params == DEFAULT_PARAMS
+
+        # Optional view: date range, downsampling, field selection, column layout
+        try:
+            view = {
+                'date_from': _date_arg('from'),
+                'date_to': _date_arg('to'),
+                'max_points': _int_arg('max_points', MIN_POINTS),
+                'columns': _split_arg('columns'),
+                'layout': request.args.get('layout', default='records', type=str),
+            }
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        for key in ('date_from', 'date_to'):
+            if view[key] is not None:
+                view[key] = view[key].isoformat()
+        full_view = view['layout'] == 'records' and all(
+            view[key] is None for key in ('date_from', 'date_to', 'max_points', 'columns')
+        )
+
+        def respond(result, v):
+            try:
+                if not full_view:
+                    with phase('compute'):
+                        result = shape_result(result, **view)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            with phase('serialize'):
+                return stamp(jsonify(result), v)
+
         # Try cache first (only for Germany-wide requests without region)
-        if not region or region == '':
-            cache_file = os.path.join(DATA_DIR, 'cache', f'market_phases_{fuel}.json')
+        if default_params and (not region or region == ''):
+            cache_dir = os.path.join(DATA_DIR, 'cache')
+            cache_file = os.path.join(cache_dir, f'market_phases_{fuel}.json')
             if os.path.exists(cache_file):
-                print(f"Serving market phases from cache: {cache_file}")
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return jsonify(json.load(f))
+                log.debug("market_phases source=cache file=%s", cache_file)
+                if full_view:
+                    return send_cache_file(cache_dir, f'market_phases_{fuel}.json')
+                v = validators([cache_file], request_variant())
+                if is_fresh(v):
+                    return not_modified(v)
+                with phase('load'):
+                    result = market_phase_files.load(cache_file)
+                return respond(result, v)
 
-        # Fallback: Calculate for specific region
-        print(f"Calculating market phases (region: {region})")
-        
-        # Load all available years (2019-2024)
-        years = [2019, 2020, 2021, 2022, 2023, 2024]
-        dfs = []
-        
-        for year in years:
-            file_path = os.path.join(DATA_DIR, f'data_daily_{year}.parquet')
-            if os.path.exists(file_path):
-                df_year = pd.read_parquet(file_path)
-                dfs.append(df_year)
-        
-        if not dfs:
+        # Precomputed region x fuel cube (scripts/generate_market_phases_cube.py)
+        if default_params and region and market_phase_cube.available(fuel):
+            v = validators(market_phase_cube.paths(fuel), request_variant())
+            if is_fresh(v):
+                return not_modified(v)
+            with phase('load'):
+                result = market_phase_cube.lookup(fuel, region)
+            if result is not None:
+                return respond(result, v)
+
+        # Fallback: live calculation, memoized per parameter set and data version
+        paths = market_phase_memo.paths()
+        if not paths:
             return jsonify({"error": "No data files found"}), 404
+
+        v = validators(paths, request_variant())
+        if is_fresh(v):
+            return not_modified(v)
+
+        # A finished job whose result was evicted since is answered inline: the client
+        # already waited for it and must not be sent into another 202 round
+        key = ('market-phases', fuel, region or None, tuple(sorted(params.items())))
+        pending = not market_phase_memo.cached(fuel, region, params) and not heavy_jobs.done(key)
+        if pending and not profiling.active():
+            log.info("market_phases source=job fuel=%s region=%s", fuel, region or '-')
+            return _run_as_job(key, lambda: market_phase_memo.get(fuel, region, params))
+
+        with phase('load'):
+            result = market_phase_memo.get(fuel, region, params)
         
-        # Combine all years
-        df = pd.concat(dfs, ignore_index=True)
-        
-        # Calculate Phases
-        result = calculate_market_phases(df, fuel=fuel, region=region)
-        
-        return jsonify(result)
+        return respond(result, v)
     except Exception as e:
-        print(f"Error in market phases: {e}") 
+        log.exception("market_phases error")
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    print("Starting Flask Server on Port 5000...")
+    # Dev server loads lazily on first request (production mode: serve.py)
+    ready.set()
+    log.info("Starting Flask Server on Port 5000...")
     app.run(debug=True, port=5000, host='0.0.0.0')
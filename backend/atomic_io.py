@@ -0,0 +1,32 @@
+"""
+Atomares Schreiben von Cache- und Datendateien
+
+Geschrieben wird in eine eindeutige temp-Datei im Zielverzeichnis, die danach
+per os.replace an die Zielstelle rückt: Leser (auch in anderen Prozessen)
+sehen immer entweder die alte oder die vollständige neue Datei, parallele
+Schreiber kommen sich mit ihren temp-Dateien nicht in die Quere. Schlägt das
+Schreiben fehl, wird die temp-Datei wieder entfernt.
+"""
+
+import os
+import tempfile
+from typing import Callable
+
+
+def atomic_write(path: str, write: Callable[[str], None], suffix: str = '.tmp', prefix: str = 'tmp'):
+    """
+    write(tmp_path) schreibt den Inhalt, danach ersetzt die Datei path.
+    prefix='.' versteckt die temp-Datei vor Verzeichnis-Scans.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=suffix)
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,201 @@
+"""
+Durchsatz-Benchmark für scripts/ingest_data.py auf synthetischen Rohdaten
+
+    python backend/benchmarks/bench_ingest.py                          # 2000 Stationen, 31 Tage
+    python backend/benchmarks/bench_ingest.py --stations 15000 --days 365 --events 10
+    python backend/benchmarks/bench_ingest.py --raw-root /data/raw --keep   # vorhandene Rohdaten nutzen
+
+Ablauf:
+1. synthetic_raw.py schreibt stations/ und prices/ für ein Jahr in ein
+   temporäres Verzeichnis (oder --raw-root wird direkt genutzt)
+2. Der Ingest läuft in einem eigenen Prozess (ingest_year), damit der
+   Spitzen-RSS nur den Ingest misst; die Parquet-Ausgabe geht ins Temp-Verzeichnis
+3. Ausgegeben werden Dateien/s, Zeilen/s, Spitzen-RSS (Hauptprozess und
+   größter Worker) und die Wandzeit je Stufe; mit --json zusätzlich als Datei
+
+Mit --append-days N werden danach N weitere Tage erzeugt und der Ingest
+erneut gestartet; er verarbeitet dank Manifest nur die neuen Dateien
+(inkrementeller Tageslauf).
+
+Die Makrodaten (Öl, Wechselkurs) werden standardmäßig wie in process_year.py
+simuliert, damit der Benchmark offline und reproduzierbar läuft (--macro fetch
+für den echten Abruf).
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'scripts')
+sys.path.insert(0, BENCH_DIR)
+
+
+def _max_rss_bytes(who) -> int:
+    import resource
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_child(args):
+    """Im Kindprozess: Ingest ausführen und Messwerte als JSON ablegen."""
+    sys.path.insert(0, SCRIPTS_DIR)
+    import ingest_data
+    import resource
+
+    macro = None
+    if args.macro == 'simulated':
+        import process_year
+        macro = process_year.generate_macro_data
+
+    timings = {}
+    start = time.perf_counter()
+    outputs = ingest_data.ingest_year(
+        args.year, raw_root=args.raw_root, output_dir=args.output_dir,
+        macro=macro, workers=args.workers, timings=timings
+    )
+    total = time.perf_counter() - start
+    with open(args.child, 'w', encoding='utf-8') as f:
+        json.dump({
+            'total_seconds': total,
+            'stages': timings,
+            'outputs': {os.path.relpath(p, args.output_dir): os.path.getsize(p) for p in outputs},
+            'peak_rss_main': _max_rss_bytes(resource.RUSAGE_SELF),
+            'peak_rss_worker': _max_rss_bytes(resource.RUSAGE_CHILDREN),
+        }, f)
+
+
+def ingest(args, work_dir, raw_root, output_dir, name):
+    """Startet den Ingest im Kindprozess und liefert dessen Messwerte."""
+    result_file = os.path.join(work_dir, f'{name}.json')
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', result_file,
+           '--year', str(args.year), '--raw-root', raw_root, '--output-dir', output_dir,
+           '--macro', args.macro]
+    if args.workers:
+        cmd += ['--workers', str(args.workers)]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    with open(result_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def count_raw(raw_root: str, year: int):
+    """Anzahl Preisdateien, Datenzeilen und Bytes unter raw_root/prices/year."""
+    files = glob.glob(os.path.join(raw_root, 'prices', str(year), '**', '*-prices.csv'), recursive=True)
+    rows = size = 0
+    for path in files:
+        size += os.path.getsize(path)
+        with open(path, 'rb') as f:
+            rows += max(sum(1 for _ in f) - 1, 0)
+    return {'price_files': len(files), 'price_rows': rows, 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Tankerkoenig ingest on synthetic raw data.')
+    parser.add_argument('--year', type=int, default=2030, help='Synthetic year (default: 2030)')
+    parser.add_argument('--stations', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=31, help='Days from Jan 1 (default: 31)')
+    parser.add_argument('--events', type=float, default=8.0, help='Mean price changes per station and day')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help='Ingest worker processes (default: all cores)')
+    parser.add_argument('--append-days', type=int, default=0,
+                        help='Afterwards add N days and time the incremental re-run')
+    parser.add_argument('--raw-root', help='Use an existing raw tree instead of generating one')
+    parser.add_argument('--macro', choices=['simulated', 'fetch'], default='simulated')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary directory')
+    parser.add_argument('--json', metavar='PATH', help='Also write the report as JSON')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--output-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.append_days and args.raw_root:
+        parser.error('--append-days needs generated raw data (without --raw-root)')
+
+    if args.child:
+        run_child(args)
+        return
+
+    import synthetic_raw
+
+    work_dir = tempfile.mkdtemp(prefix='tankdaten-ingest-')
+    try:
+        raw_root = args.raw_root
+        if raw_root is None:
+            raw_root = os.path.join(work_dir, 'raw')
+            print(f'Generating {args.days} days x {args.stations} stations '
+                  f'(~{args.events:g} changes/station/day)...')
+            start = time.perf_counter()
+            raw = synthetic_raw.write_raw_year(raw_root, args.year, args.stations, args.days, args.events, args.seed)
+            print(f'  generated in {time.perf_counter() - start:.1f}s')
+        else:
+            raw = count_raw(raw_root, args.year)
+
+        output_dir = os.path.join(work_dir, 'out')
+        os.makedirs(output_dir)
+        result = ingest(args, work_dir, raw_root, output_dir, 'result')
+
+        incremental = None
+        if args.append_days:
+            # Same seed -> the existing days are rewritten unchanged, only the new ones differ
+            synthetic_raw.write_raw_year(raw_root, args.year, args.stations, args.days + args.append_days,
+                                         args.events, args.seed)
+            incremental = ingest(args, work_dir, raw_root, output_dir, 'incremental')
+    finally:
+        if args.keep:
+            print(f'Kept {work_dir}')
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    prices_seconds = result['stages'].get('prices', 0.0)
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'workers': args.workers or os.cpu_count(),
+        },
+        'input': raw,
+        'total_seconds': result['total_seconds'],
+        'files_per_second': raw['price_files'] / result['total_seconds'],
+        'rows_per_second': raw['price_rows'] / result['total_seconds'],
+        'price_stage_files_per_second': raw['price_files'] / prices_seconds if prices_seconds else None,
+        'price_stage_rows_per_second': raw['price_rows'] / prices_seconds if prices_seconds else None,
+        'peak_rss_main': result['peak_rss_main'],
+        'peak_rss_worker': result['peak_rss_worker'],
+        'stages': result['stages'],
+        'outputs': result['outputs'],
+        'incremental': incremental and {
+            'append_days': args.append_days,
+            'total_seconds': incremental['total_seconds'],
+            'stages': incremental['stages'],
+        },
+    }
+
+    mb = 1024 * 1024
+    print(f"\nInput:   {raw['price_files']} files, {raw['price_rows']:,} rows, {raw['bytes'] / mb:.1f} MB")
+    print(f"Total:   {report['total_seconds']:.2f}s  "
+          f"{report['files_per_second']:.1f} files/s  {report['rows_per_second']:,.0f} rows/s")
+    if prices_seconds:
+        print(f"Prices:  {prices_seconds:.2f}s  {report['price_stage_files_per_second']:.1f} files/s  "
+              f"{report['price_stage_rows_per_second']:,.0f} rows/s")
+    print(f"Peak RSS: main {report['peak_rss_main'] / mb:.0f} MB, largest worker {report['peak_rss_worker'] / mb:.0f} MB")
+    print('\nStage            seconds   share')
+    for name, seconds in result['stages'].items():
+        print(f'{name:<16} {seconds:>7.2f}  {seconds / result["total_seconds"]:>6.1%}')
+    if incremental:
+        print(f"\nIncremental (+{args.append_days} days): {incremental['total_seconds']:.2f}s  "
+              + '  '.join(f'{k} {v:.2f}s' for k, v in incremental['stages'].items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nSaved report: {args.json}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+"""
+Lasttest: spielt Seitenaufrufe des Dashboards gegen einen laufenden Server ab
+
+    python backend/benchmarks/load_test.py --url http://localhost:5000 --users 20 --duration 60
+    python backend/benchmarks/load_test.py --serve --workers 4 --synthetic --users 50 --json load.json
+
+Jeder virtuelle Nutzer ruft in einer Schleife Seiten auf (gewichtet nach
+--mix) und wartet dazwischen eine exponentiell verteilte Denkzeit. Eine Seite
+besteht aus Wellen von Anfragen, die wie im Browser parallel abgeschickt
+werden (Keep-Alive, bis zu 6 Verbindungen je Nutzer):
+
+    regional:       regional + geo/states + geo/city_lookup, dann 2x history (Regionsvergleich)
+    market_phases:  plz3_cities.json, dann market-phases (wie MarketPhasesPage,
+                    202-Jobs werden wie im Frontend abgefragt und nachgeladen)
+    crisis:         data/corona
+    ukraine:        data/ukraine
+
+Ausgegeben werden Durchsatz (Anfragen/s, Seiten/s), p50/p95/p99 je Route und
+der RSS des Servers über die Zeit (Prozessbaum aus /proc bei --serve bzw.
+--server-pid, sonst process_resident_bytes aus /api/metrics).
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+PAGES = ('regional', 'market_phases', 'crisis', 'ukraine')
+DEFAULT_MIX = 'regional=4,market_phases=4,crisis=1,ukraine=1'
+FUELS = ('e5', 'e10', 'diesel')
+CHART_COLUMNS = 'price_mean,price_ma7,price_std,brent_oil_eur'
+BROWSER_CONNECTIONS = 6
+JOB_POLL_SECONDS = 0.5
+
+# Germany bounding box for the region comparison clicks
+LAT_RANGE = (47.5, 54.8)
+LON_RANGE = (6.0, 15.0)
+
+
+def route_name(path: str) -> str:
+    """Pfad ohne Query; Job-IDs werden zu einer Route zusammengefasst."""
+    route = urlsplit(path).path
+    if route.startswith('/api/jobs/'):
+        return '/api/jobs/<id>/events' if route.endswith('/events') else '/api/jobs/<id>'
+    return route
+
+
+class Recorder:
+    """Latenzen, Status und Bytes je Route (threadsicher)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.bytes: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.pages: Dict[str, List[float]] = defaultdict(list)
+
+    def request(self, route: str, seconds: float, status: int, size: int):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+            self.bytes[route] += size
+
+    def error(self, route: str):
+        with self._lock:
+            self.errors[route] += 1
+
+    def page(self, name: str, seconds: float):
+        with self._lock:
+            self.pages[name].append(seconds)
+
+
+class User:
+    """Ein virtueller Browser: eigene Session, bis zu 6 parallele Anfragen."""
+
+    def __init__(self, base_url: str, recorder: Recorder, rng: random.Random, years: List[int],
+                 regions: List[str], region_share: float):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.rng = rng
+        self.years = years
+        self.regions = regions
+        self.region_share = region_share
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=BROWSER_CONNECTIONS))
+        self.pool = ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        self.session.close()
+
+    def get(self, path: str) -> Optional[requests.Response]:
+        route = route_name(path)
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url + path, timeout=120)
+            size = len(response.content)
+        except requests.RequestException:
+            self.recorder.error(route)
+            return None
+        self.recorder.request(route, time.perf_counter() - start, response.status_code, size)
+        return response
+
+    def get_with_jobs(self, path: str) -> Optional[requests.Response]:
+        """Wie fetchWithJobs im Frontend: 202 -> Job abfragen -> URL erneut laden; 503 -> Retry-After."""
+        busy = 0
+        while True:
+            response = self.get(path)
+            if response is None:
+                return None
+            if response.status_code == 202:
+                job = response.json()
+                while True:
+                    time.sleep(JOB_POLL_SECONDS)
+                    status = self.get(job['status_url'])
+                    if status is None:
+                        return None
+                    # Unbekannter Job: nicht erneut einreichen, als Fehler zählen
+                    if status.status_code == 404:
+                        return status
+                    job = status.json()
+                    if job['status'] == 'error':
+                        return status
+                    if job['status'] == 'done':
+                        break
+                continue
+            if response.status_code == 503 and busy < 5:
+                busy += 1
+                time.sleep(int(response.headers.get('Retry-After', 5)))
+                continue
+            return response
+
+    def wave(self, fetch, paths: List[str]):
+        """Anfragen einer Welle parallel, wartet auf alle."""
+        list(self.pool.map(fetch, paths))
+
+    def page(self, name: str):
+        start = time.perf_counter()
+        getattr(self, f'page_{name}')()
+        self.recorder.page(name, time.perf_counter() - start)
+
+    def page_regional(self):
+        year = self.rng.choice(self.years)
+        self.wave(self.get_with_jobs, [f'/api/data/regional?year={year}', '/api/geo/states', '/api/geo/city_lookup'])
+        # Zwei Regionen anklicken, dann Vergleich öffnen
+        time.sleep(self.rng.uniform(0.2, 1.0))
+        points = [(self.rng.uniform(*LAT_RANGE), self.rng.uniform(*LON_RANGE)) for _ in range(2)]
+        self.wave(self.get, [f'/api/data/history?year={year}&lat={lat:.4f}&lon={lon:.4f}' for lat, lon in points])
+
+    def page_market_phases(self):
+        self.get('/js/data/plz3_cities.json')
+        query = f'fuel={self.rng.choice(FUELS)}'
+        if self.regions and self.rng.random() < self.region_share:
+            query += f'&region={self.rng.choice(self.regions)}'
+        self.get_with_jobs(f'/api/data/market-phases?{query}&max_points=800'
+                           f'&columns={CHART_COLUMNS}&layout=columns')
+
+    def page_crisis(self):
+        self.get('/api/data/corona')
+
+    def page_ukraine(self):
+        self.get('/api/data/ukraine')
+
+
+# --- Server-RSS ------------------------------------------------------------
+
+def _children(pid: int) -> List[int]:
+    result = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                result += [int(c) for c in f.read().split()]
+    except OSError:
+        pass
+    return result
+
+
+def tree_rss(pid: int) -> Optional[int]:
+    """Summe der RSS von pid und allen Nachfahren (Linux /proc)."""
+    total, stack, found = 0, [pid], False
+    page = os.sysconf('SC_PAGE_SIZE')
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f'/proc/{p}/statm') as f:
+                total += int(f.read().split()[1]) * page
+            found = True
+        except (OSError, ValueError, IndexError):
+            continue
+        stack += _children(p)
+    return total if found else None
+
+
+def metrics_rss(base_url: str) -> Optional[int]:
+    """RSS laut /api/metrics (nur der Worker, der die Anfrage beantwortet)."""
+    try:
+        text = requests.get(base_url.rstrip('/') + '/api/metrics', timeout=5).text
+    except requests.RequestException:
+        return None
+    for line in text.splitlines():
+        if line.startswith('tankdaten_process_resident_bytes '):
+            return int(float(line.split()[1]))
+    return None
+
+
+def sample_rss(base_url: str, pid: Optional[int], stop: threading.Event, samples: List[Tuple[float, int]],
+               interval: float = 1.0):
+    start = time.perf_counter()
+    while not stop.is_set():
+        rss = tree_rss(pid) if pid else metrics_rss(base_url)
+        if rss is not None:
+            samples.append((round(time.perf_counter() - start, 1), rss))
+        stop.wait(interval)
+
+
+# --- Server starten --------------------------------------------------------
+
+def start_server(port: int, workers: int, threads: int, data_dir: Optional[str]) -> subprocess.Popen:
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    if data_dir:
+        env['DATA_DIR'] = data_dir
+        env['DATA_MMAP_DIR'] = os.path.join(data_dir, 'arrow')
+    cmd = [sys.executable, os.path.join(BACKEND_DIR, 'serve.py'), '--host', '127.0.0.1',
+           '--port', str(port), '--workers', str(workers), '--threads', str(threads)]
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+def wait_ready(base_url: str, server: Optional[subprocess.Popen], timeout: float = 300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server is not None and server.poll() is not None:
+            sys.exit('Server exited during startup (is gunicorn installed?)')
+        try:
+            if requests.get(base_url.rstrip('/') + '/api/ready', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    sys.exit(f'Server at {base_url} not ready after {timeout:.0f}s')
+
+
+def synthetic_data_dir(work_dir: str, n_regions: int) -> str:
+    """Eingecheckte Dateien verlinkt + synthetische Tagesdaten (wie run_benchmarks.py)."""
+    from run_benchmarks import prepare_data_dir
+    return prepare_data_dir(work_dir, n_regions, seed=0)
+
+
+# --- Auswertung ------------------------------------------------------------
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in PAGES:
+            raise SystemExit(f"Unknown page '{name}' in --mix (expected {', '.join(PAGES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def summarize(recorder: Recorder, elapsed: float, rss: List[Tuple[float, int]]) -> Dict:
+    routes = {}
+    for route, values in sorted(recorder.latencies.items()):
+        arr = np.array(values) * 1000
+        routes[route] = {
+            'requests': len(values),
+            'throughput': len(values) / elapsed,
+            'p50_ms': float(np.percentile(arr, 50)),
+            'p95_ms': float(np.percentile(arr, 95)),
+            'p99_ms': float(np.percentile(arr, 99)),
+            'max_ms': float(arr.max()),
+            'bytes': recorder.bytes[route],
+            'status': {str(k): v for k, v in sorted(recorder.statuses[route].items())},
+            'errors': recorder.errors.get(route, 0),
+        }
+    pages = {
+        name: {
+            'count': len(values),
+            'p50_ms': float(np.percentile(np.array(values) * 1000, 50)),
+            'p95_ms': float(np.percentile(np.array(values) * 1000, 95)),
+        }
+        for name, values in sorted(recorder.pages.items())
+    }
+    total = sum(r['requests'] for r in routes.values())
+    return {
+        'duration_seconds': elapsed,
+        'requests': total,
+        'requests_per_second': total / elapsed,
+        'pages_per_second': sum(p['count'] for p in pages.values()) / elapsed,
+        'errors': sum(recorder.errors.values()),
+        'routes': routes,
+        'pages': pages,
+        'server_rss': [{'t': t, 'bytes': b} for t, b in rss],
+        'server_rss_max': max((b for _, b in rss), default=None),
+    }
+
+
+def print_report(report: Dict):
+    mb = 1024 * 1024
+    print(f"\n{report['requests']} requests in {report['duration_seconds']:.1f}s: "
+          f"{report['requests_per_second']:.1f} req/s, {report['pages_per_second']:.2f} pages/s, "
+          f"{report['errors']} errors")
+    print(f"\n{'route':<34} {'reqs':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  status")
+    for route, r in report['routes'].items():
+        status = ' '.join(f'{k}:{v}' for k, v in r['status'].items())
+        print(f"{route:<34} {r['requests']:>7} {r['throughput']:>7.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}  {status}")
+    print(f"\n{'page':<34} {'count':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, p in report['pages'].items():
+        print(f"{name:<34} {p['count']:>7} {p['p50_ms']:>8.1f} {p['p95_ms']:>8.1f}")
+    if report['server_rss']:
+        series = report['server_rss']
+        step = max(1, len(series) // 10)
+        trace = ', '.join(f"{s['t']:.0f}s {s['bytes'] / mb:.0f}MB" for s in series[::step])
+        print(f"\nServer RSS: max {report['server_rss_max'] / mb:.0f} MB ({trace})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay dashboard page sessions against the API.')
+    parser.add_argument('--url', default='http://localhost:5000', help='Server base URL')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Test duration in seconds')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Seconds until all users are started')
+    parser.add_argument('--think-time', type=float, default=2.0, help='Mean pause between pages (seconds)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Page weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--years', default='2024', help='Years used by the regional page (comma separated)')
+    parser.add_argument('--region-share', type=float, default=0.3,
+                        help='Share of market-phase pages that select a PLZ3 region')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--server-pid', type=int, help='Sample RSS of this process tree (Linux)')
+    parser.add_argument('--serve', action='store_true', help='Start backend/serve.py for the test')
+    parser.add_argument('--port', type=int, default=5055, help='Port for --serve')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes for --serve')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker for --serve')
+    parser.add_argument('--synthetic', action='store_true',
+                        help='With --serve: synthetic daily data instead of backend/data')
+    parser.add_argument('--regions', type=int, default=100, help='Regions in the synthetic daily data')
+    parser.add_argument('--json', metavar='PATH', help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    years = [int(y) for y in args.years.split(',')]
+    base_url = args.url
+    server = None
+    work_dir = None
+    pid = args.server_pid
+
+    try:
+        if args.serve:
+            base_url = f'http://127.0.0.1:{args.port}'
+            data_dir = None
+            if args.synthetic:
+                work_dir = tempfile.mkdtemp(prefix='tankdaten-load-')
+                print('Generating synthetic daily data...')
+                data_dir = synthetic_data_dir(work_dir, args.regions)
+            server = start_server(args.port, args.workers, args.threads, data_dir)
+            pid = server.pid
+            print(f'Started server (pid {pid}), waiting for /api/ready...')
+        wait_ready(base_url, server)
+
+        regions = []
+        try:
+            regions = sorted(requests.get(base_url.rstrip('/') + '/js/data/plz3_cities.json', timeout=10).json())
+        except (requests.RequestException, ValueError):
+            pass
+
+        recorder = Recorder()
+        rss: List[Tuple[float, int]] = []
+        stop = threading.Event()
+        sampler = threading.Thread(target=sample_rss, args=(base_url, pid, stop, rss), daemon=True)
+        sampler.start()
+
+        names, weights = zip(*mix.items())
+        start = time.perf_counter()
+        deadline = start + args.duration
+
+        def run_user(i: int):
+            rng = random.Random(args.seed * 100003 + i)
+            time.sleep(args.ramp_up * i / max(args.users, 1))
+            user = User(base_url, recorder, rng, years, regions, args.region_share)
+            try:
+                while time.perf_counter() < deadline:
+                    user.page(rng.choices(names, weights)[0])
+                    time.sleep(min(rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0,
+                                   max(deadline - time.perf_counter(), 0)))
+            finally:
+                user.close()
+
+        print(f'Running {args.users} users for {args.duration:.0f}s against {base_url}...')
+        threads = [threading.Thread(target=run_user, args=(i,), daemon=True) for i in range(args.users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        sampler.join()
+
+        report = summarize(recorder, elapsed, rss)
+        report['config'] = {k: v for k, v in vars(args).items() if k != 'json'}
+        print_report(report)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f'\nSaved report: {args.json}')
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(server.pid, signal.SIGKILL)
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Microbenchmarks für die Marktphasen-Pipeline und die API-Routen
+
+    python backend/benchmarks/run_benchmarks.py                     # alles messen, Tabelle ausgeben
+    python backend/benchmarks/run_benchmarks.py --save main         # als baselines/main.json speichern
+    python backend/benchmarks/run_benchmarks.py --compare main      # gegen Baseline prüfen (Exit 1 bei Regression)
+    python backend/benchmarks/run_benchmarks.py --only stages --filter lag
+
+Gemessen wird:
+- stage/*: jeder Schritt von calculate_market_phases einzeln (Log-Returns,
+  Glättung, Z-Scores, Volatilität, Lag-Korrelation, Klassifikation, Intervalle,
+  Fusion, ...) auf der deutschlandweiten Tagesreihe, dazu die Gesamtfunktion
+- route/*: jede Flask-Route über den Test-Client, mit den eingecheckten
+  Wochen-/Monatsdateien und synthetischen Tagesdaten (synthetic.py) in einem
+  temporären Datenverzeichnis
+
+Pro Benchmark wird so oft wiederholt, dass eine Messung mindestens --min-time
+dauert; gespeichert werden Median, Minimum, Mittelwert und Streuung pro Aufruf.
+Verglichen wird der Median: Regression, wenn er um mehr als --threshold
+(relativ) und mehr als --min-delta (absolut) über der Baseline liegt.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import market_phases as mp
+import synthetic
+
+REPO_DATA_DIR = os.path.join(BACKEND_DIR, 'data')
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+SYNTHETIC_YEARS = [2020, 2021, 2022, 2023, 2024]
+
+Benchmark = Tuple[str, Callable[[], object]]
+
+
+def measure(fn: Callable[[], object], repeat: int, min_time: float) -> Dict:
+    """Sekunden pro Aufruf über repeat Messungen (je Messung mindestens min_time)."""
+    fn()  # Aufwärmen (Imports, Caches, JIT-freie Erstinitialisierung)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+# --- Pipeline-Stufen -------------------------------------------------------
+
+def stage_benchmarks(data_dir: str, fuel: str = 'e10') -> List[Benchmark]:
+    """Jede Stufe von calculate_market_phases mit den Eingaben, die sie dort bekommt."""
+    df = pd.concat(
+        [pd.read_parquet(os.path.join(data_dir, f'data_daily_{y}.parquet'),
+                         columns=['date', 'fuel', 'region_plz3'] + mp.DAILY_COLUMNS[1:])
+         for y in SYNTHETIC_YEARS],
+        ignore_index=True
+    )
+    params = mp.normalize_params()
+    daily = mp.aggregate_daily(df, fuel=fuel)
+    metrics = mp.compute_phase_metrics(daily.copy(), **mp.metric_params(params))
+
+    rp = metrics['rp']
+    zp, zo = metrics['zp'], metrics['zo']
+    vp_high = metrics['vp'].quantile(params['vp_percentile'] / 100)
+    vo_low = metrics['vo'].quantile(params['vo_percentile'] / 100)
+    thresholds = {k: params[k] for k in ('asymmetry_threshold', 'correlation_threshold', 'vol_ratio_threshold')}
+
+    classified = metrics.copy()
+    classified['phase'] = mp.classify_phases(classified, vp_high, vo_low, **thresholds)
+    intervals = mp.group_phases_to_intervals(classified)
+    merged = mp.merge_close_intervals(intervals, max_gap=params['max_gap'])
+    region = df['region_plz3'].iloc[0]
+
+    return [
+        ('stage/aggregate_daily', lambda: mp.aggregate_daily(df, fuel=fuel)),
+        ('stage/log_returns', lambda: mp.calculate_log_returns(daily['price_mean'])),
+        ('stage/smoothing', lambda: mp.smooth_returns(rp, window=params['smooth_window'])),
+        ('stage/zscore', lambda: mp.calculate_zscore(metrics['rp_smooth'])),
+        ('stage/volatility', lambda: mp.calculate_rolling_volatility(rp, window=params['vol_window'])),
+        ('stage/best_lag_correlation', lambda: mp.find_best_lag_correlation(
+            zp, zo, window=params['corr_window'], max_lag=params['max_lag'])),
+        ('stage/classify_phases', lambda: mp.classify_phases(metrics, vp_high, vo_low, **thresholds)),
+        ('stage/group_phases_to_intervals', lambda: mp.group_phases_to_intervals(classified)),
+        ('stage/merge_close_intervals', lambda: mp.merge_close_intervals(intervals, max_gap=params['max_gap'])),
+        ('stage/filter_short_intervals', lambda: mp.filter_short_intervals(merged, min_days=params['min_days'])),
+        ('stage/compute_phase_metrics', lambda: mp.compute_phase_metrics(daily.copy(), **mp.metric_params(params))),
+        ('stage/build_phase_result', lambda: mp.build_phase_result(metrics.copy(), **mp.classification_params(params))),
+        ('stage/calculate_market_phases', lambda: mp.calculate_market_phases(df, fuel=fuel)),
+        ('stage/calculate_market_phases_region', lambda: mp.calculate_market_phases(df, fuel=fuel, region=region)),
+    ]
+
+
+# --- API-Routen ------------------------------------------------------------
+
+def prepare_data_dir(work_dir: str, n_regions: int, seed: int) -> str:
+    """Temporäres Datenverzeichnis: eingecheckte Dateien verlinkt, Tagesdaten synthetisch."""
+    data_dir = os.path.join(work_dir, 'data')
+    os.makedirs(os.path.join(data_dir, 'cache'), exist_ok=True)
+    for name in os.listdir(REPO_DATA_DIR):
+        if name.startswith(('data_weekly_', 'data_monthly_')) and name.endswith('.parquet'):
+            os.symlink(os.path.join(REPO_DATA_DIR, name), os.path.join(data_dir, name))
+    os.symlink(os.path.join(REPO_DATA_DIR, 'geometries'), os.path.join(data_dir, 'geometries'))
+    for name in ('city_lookup.json', 'market_phases_e10.json'):
+        source = os.path.join(REPO_DATA_DIR, 'cache', name)
+        if os.path.exists(source):
+            shutil.copy(source, os.path.join(data_dir, 'cache', name))
+    synthetic.write_daily(data_dir, SYNTHETIC_YEARS, n_regions=n_regions, seed=seed)
+    return data_dir
+
+
+def route_benchmarks(data_dir: str) -> List[Benchmark]:
+    """GET-Anfragen wie vom Frontend, über den Flask-Test-Client (ohne Netzwerk)."""
+    os.environ['DATA_DIR'] = data_dir
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import app as backend
+
+    client = backend.app.test_client()
+    year = SYNTHETIC_YEARS[-1]
+    region = synthetic.regions(1)['region_plz3'].iloc[0]
+
+    # Caches füllen, die im Betrieb ein Hintergrund-Job anlegt
+    backend.regional_grids.ensure(year)
+    backend.market_phase_memo.get('e10', region)
+
+    urls = [
+        f'/api/data/weekly?year={year}',
+        f'/api/data/weekly?year={year}&fuel=e10&region={region}',
+        f'/api/data/monthly?year={year}',
+        f'/api/data/monthly?year={year}&format=arrow',
+        f'/api/data/daily?year={year}&fuel=e10',
+        f'/api/data/daily?year={year}&format=ndjson',
+        f'/api/data/regional?year={year}',
+        '/api/geo/states',
+        '/api/geo/city_lookup',
+        f'/api/data/history?year={year}&lat=48.78&lon=9.18',
+        '/api/data/corona',
+        '/api/data/ukraine',
+        '/api/data/market-phases?fuel=e10',
+        '/api/data/market-phases?fuel=e10&max_points=800&layout=columns'
+        '&columns=price_mean,price_ma7,price_std,brent_oil_eur',
+        f'/api/data/market-phases?fuel=e10&region={region}',
+    ]
+
+    def get(url):
+        def run():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url}: HTTP {response.status_code}')
+            # Gestreamte Antworten vollständig erzeugen
+            return len(response.get_data())
+        return run
+
+    return [(f'route{url}', get(url)) for url in urls]
+
+
+# --- Baselines -------------------------------------------------------------
+
+def environment(args) -> Dict:
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'regions': args.regions,
+        'seed': args.seed,
+    }
+
+
+def baseline_path(name: str) -> str:
+    """Name (baselines/<name>.json) oder Pfad."""
+    if name.endswith('.json') or os.sep in name:
+        return name
+    return os.path.join(BASELINE_DIR, f'{name}.json')
+
+
+def compare(current: Dict, baseline: Dict, threshold: float, min_delta: float, partial: bool = False) -> List[str]:
+    """Tabelle Baseline vs. aktuell; liefert die Namen der Regressionen (partial: Auswahl gemessen)."""
+    regressions = []
+    print(f"\n{'benchmark':<70} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f'{name:<70} {"-":>10} {_ms(result["median"]):>10}      new')
+            continue
+        ratio = result['median'] / base['median'] if base['median'] else float('inf')
+        regressed = ratio > 1 + threshold and result['median'] - base['median'] > min_delta
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{name:<70} {_ms(base["median"]):>10} {_ms(result["median"]):>10} {ratio - 1:>+7.1%}{flag}')
+        if regressed:
+            regressions.append(name)
+    for name in baseline['results']:
+        if not partial and name not in current['results']:
+            print(f'{name:<70} {_ms(baseline["results"][name]["median"]):>10} {"-":>10}  missing')
+
+    for key in ('regions', 'seed', 'python', 'pandas', 'numpy', 'pyarrow'):
+        if baseline['environment'].get(key) != current['environment'].get(key):
+            print(f"Note: {key} differs from baseline "
+                  f"({baseline['environment'].get(key)} -> {current['environment'].get(key)})")
+    return regressions
+
+
+def _ms(seconds: float) -> str:
+    return f'{seconds * 1000:.3f}ms'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark market-phase stages and API routes.')
+    parser.add_argument('--only', choices=['stages', 'routes'], help='Run only one group')
+    parser.add_argument('--filter', help='Run only benchmarks whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=7, help='Measurements per benchmark (default: 7)')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='Minimum seconds per measurement, calls are batched up to it (default: 0.05)')
+    parser.add_argument('--regions', type=int, default=100, help='PLZ3 regions in the synthetic daily data')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic daily data')
+    parser.add_argument('--save', metavar='NAME', help='Store results as baselines/NAME.json (or a path)')
+    parser.add_argument('--compare', metavar='NAME', help='Compare against baselines/NAME.json (or a path)')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative slowdown of the median that counts as regression (default: 0.2)')
+    parser.add_argument('--min-delta', type=float, default=0.00002,
+                        help='Ignore slowdowns below this many seconds (default: 0.00002)')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='tankdaten-bench-')
+    try:
+        print(f'Generating synthetic daily data ({args.regions} regions, {len(SYNTHETIC_YEARS)} years)...')
+        data_dir = prepare_data_dir(work_dir, args.regions, args.seed)
+
+        benchmarks: List[Benchmark] = []
+        if args.only in (None, 'stages'):
+            benchmarks += stage_benchmarks(data_dir)
+        if args.only in (None, 'routes'):
+            benchmarks += route_benchmarks(data_dir)
+        if args.filter:
+            benchmarks = [(name, fn) for name, fn in benchmarks if args.filter in name]
+
+        results = {}
+        for name, fn in benchmarks:
+            results[name] = measure(fn, args.repeat, args.min_time)
+            r = results[name]
+            print(f'{name:<70} {_ms(r["median"]):>12} (min {_ms(r["min"])}, x{r["number"]})')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    current = {'environment': environment(args), 'results': results}
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f'\nSaved baseline: {path}')
+
+    if args.compare:
+        with open(baseline_path(args.compare), 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.min_delta,
+                              partial=bool(args.only or args.filter))
+        if regressions:
+            print(f'\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}:')
+            for name in regressions:
+                print(f'  {name}')
+            sys.exit(1)
+        print('\nNo regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Synthetische Tagesdaten (data_daily_{year}.parquet) für Benchmarks
+
+Die echten Tagesdateien sind zu groß für das Repository. Erzeugt werden Dateien
+mit demselben Schema wie scripts/ingest_data.py: Regionen und Koordinaten aus
+den eingecheckten Wochendateien, ein Brent-Verlauf als Random Walk und je
+Kraftstoff ein nationaler Preis, der dem Ölpreis verzögert folgt, plus
+regionalem Aufschlag und Tagesrauschen. Gleicher seed -> gleiche Dateien.
+"""
+
+import os
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+FUELS = {'diesel': 1.62, 'e10': 1.72, 'e5': 1.78}
+EXCHANGE_RATE = 1.10
+OIL_LAG_DAYS = 5
+LITRES_PER_BARREL = 159
+
+
+def regions(n: Optional[int] = None, data_dir: str = DATA_DIR) -> pd.DataFrame:
+    """PLZ3-Regionen mit Koordinaten aus einer Wochendatei (region_plz3, lat, lon)."""
+    weekly = sorted(
+        f for f in os.listdir(data_dir) if f.startswith('data_weekly_') and f.endswith('.parquet')
+    )
+    if weekly:
+        df = pd.read_parquet(os.path.join(data_dir, weekly[-1]), columns=['region_plz3', 'lat', 'lon'])
+        centroids = df.groupby('region_plz3')[['lat', 'lon']].first().reset_index()
+    else:
+        # Ohne Wochendateien: Raster über Deutschland
+        codes = [f'{i:03d}' for i in range(10, 1000)]
+        centroids = pd.DataFrame({
+            'region_plz3': codes,
+            'lat': np.linspace(47.5, 54.5, len(codes)),
+            'lon': np.resize(np.linspace(6.0, 15.0, 37), len(codes)),
+        })
+    if n is not None and n < len(centroids):
+        # Gleichmäßig über alle Leitregionen verteilt statt nur die ersten n
+        centroids = centroids.iloc[np.linspace(0, len(centroids) - 1, n).astype(int)]
+    return centroids.reset_index(drop=True)
+
+
+def brent_eur(dates: pd.DatetimeIndex, rng: np.random.Generator, start: float = 60.0) -> np.ndarray:
+    """Brent in EUR/Barrel als Random Walk mit seltenen Sprüngen."""
+    steps = rng.normal(0, 0.9, len(dates))
+    shocks = rng.random(len(dates)) < 0.01
+    steps[shocks] += rng.normal(0, 8, shocks.sum())
+    return np.clip(start + np.cumsum(steps), 15, None)
+
+
+def daily_frame(year: int, centroids: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Ein Jahr Tageswerte je Region und Kraftstoff im Schema von ingest_data.py."""
+    rng = np.random.default_rng([seed, year])
+    dates = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
+    n_days, n_regions = len(dates), len(centroids)
+
+    oil = np.round(brent_eur(dates, rng), 2)
+    oil_per_litre = np.r_[np.full(OIL_LAG_DAYS, oil[0]), oil[:-OIL_LAG_DAYS]] / LITRES_PER_BARREL
+    region_offset = rng.normal(0, 0.03, n_regions)
+
+    frames: List[pd.DataFrame] = []
+    for fuel, base in FUELS.items():
+        national = base + 1.2 * (oil_per_litre - oil_per_litre[0]) + np.cumsum(rng.normal(0, 0.004, n_days))
+        price = national[:, None] + region_offset[None, :] + rng.normal(0, 0.012, (n_days, n_regions))
+        spread = np.abs(rng.normal(0.06, 0.02, (n_days, n_regions)))
+        frames.append(pd.DataFrame({
+            'region_plz3': np.tile(centroids['region_plz3'].to_numpy(), n_days),
+            'fuel': fuel,
+            'price_mean': price.ravel(),
+            'price_std': (spread / 2).ravel(),
+            'price_min': (price - spread).ravel(),
+            'price_max': (price + spread).ravel(),
+            'date': np.repeat(dates.to_numpy(), n_regions),
+        }))
+
+    df = pd.concat(frames, ignore_index=True)
+    df.sort_values(['date', 'region_plz3', 'fuel'], inplace=True)
+    df = df.merge(centroids, on='region_plz3', how='left')
+
+    macro = pd.DataFrame({
+        'date': dates,
+        'brent_oil_usd': oil * EXCHANGE_RATE,
+        'exchange_rate_eur_usd': EXCHANGE_RATE,
+        'brent_oil_eur': oil,
+    })
+    df = df.merge(macro, on='date', how='left')
+
+    grouped = df.groupby(['region_plz3', 'fuel'])['price_mean']
+    df['ma_7d'] = grouped.transform(lambda x: x.rolling(window=7, min_periods=1).mean())
+    df['trend_slope'] = grouped.diff(7).fillna(0)
+    return df.reset_index(drop=True)
+
+
+def write_daily(out_dir: str, years: Iterable[int], n_regions: Optional[int] = 100, seed: int = 0) -> List[str]:
+    """Schreibt data_daily_{year}.parquet für alle Jahre nach out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    centroids = regions(n_regions)
+    paths = []
+    for year in years:
+        path = os.path.join(out_dir, f'data_daily_{year}.parquet')
+        daily_frame(year, centroids, seed).to_parquet(path, index=False)
+        paths.append(path)
+    return paths
@@ -0,0 +1,157 @@
+"""
+Synthetische Tankerkönig-Rohdaten (stations/ + prices/) für Ingest-Benchmarks
+
+Erzeugt dasselbe Layout, das scripts/ingest_data.py und process_year.py lesen:
+
+    <root>/stations/<year>/<MM>/<YYYY-MM-DD>-stations.csv
+    <root>/prices/<year>/<MM>/<YYYY-MM-DD>-prices.csv
+
+Tankstellen werden auf die echten PLZ3-Leitregionen verteilt (Koordinaten um
+den Regionsschwerpunkt gestreut). Jede Tankstelle meldet pro Tag im Mittel
+`events` Preisänderungen (Poisson); die Preise folgen einem gemeinsamen
+Tagesverlauf je Kraftstoff plus Stations-Aufschlag. Ein Teil der Stationen
+führt kein Diesel bzw. kein E10 (Preis 0.000 wie im Original).
+
+    python backend/benchmarks/synthetic_raw.py --out /tmp/raw --year 2030 --stations 2000 --days 31
+"""
+
+import argparse
+import os
+import sys
+import uuid
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import FUELS, regions
+
+STATION_COLUMNS = [
+    'uuid', 'name', 'brand', 'street', 'house_number', 'post_code', 'city',
+    'latitude', 'longitude', 'first_active', 'openingtimes_json'
+]
+PRICE_COLUMNS = ['date', 'station_uuid', 'diesel', 'e5', 'e10', 'dieselchange', 'e5change', 'e10change']
+BRANDS = ['ARAL', 'Shell', 'ESSO', 'TotalEnergies', 'AVIA', 'JET', 'STAR', 'Raiffeisen', 'bft', '']
+UTC_OFFSET = '+01'
+
+
+def _day_path(root: str, kind: str, day: pd.Timestamp) -> str:
+    folder = os.path.join(root, kind, f'{day.year}', f'{day.month:02d}')
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{day.strftime('%Y-%m-%d')}-{kind}.csv")
+
+
+def make_stations(n_stations: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Stammdaten im Format der *-stations.csv."""
+    centroids = regions()
+    region = rng.integers(0, len(centroids), n_stations)
+    plz3 = centroids['region_plz3'].to_numpy()[region]
+    suffix = rng.integers(0, 100, n_stations)
+    ids = [str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(n_stations)]
+    brand = np.array(BRANDS)[rng.integers(0, len(BRANDS), n_stations)]
+    return pd.DataFrame({
+        'uuid': ids,
+        'name': [f'{b or "Freie"} Tankstelle {i}' for i, b in enumerate(brand)],
+        'brand': brand,
+        'street': 'Hauptstraße',
+        'house_number': rng.integers(1, 200, n_stations).astype(str),
+        'post_code': [f'{p}{s:02d}' for p, s in zip(plz3, suffix)],
+        'city': [f'Ort {p}' for p in plz3],
+        'latitude': centroids['lat'].to_numpy()[region] + rng.normal(0, 0.05, n_stations),
+        'longitude': centroids['lon'].to_numpy()[region] + rng.normal(0, 0.08, n_stations),
+        'first_active': '1970-01-01 01:00:00+01',
+        'openingtimes_json': '{}',
+    }, columns=STATION_COLUMNS)
+
+
+def make_prices(
+    day: pd.Timestamp,
+    stations: pd.DataFrame,
+    levels: Dict[str, float],
+    offsets: np.ndarray,
+    sells: Dict[str, np.ndarray],
+    events: float,
+    rng: np.random.Generator
+) -> pd.DataFrame:
+    """Alle Preisänderungen eines Tages im Format der *-prices.csv (nach Zeit sortiert)."""
+    counts = rng.poisson(events, len(stations))
+    station = np.repeat(np.arange(len(stations)), counts)
+    seconds = rng.integers(0, 86400, len(station))
+    order = np.argsort(seconds, kind='stable')
+    station, seconds = station[order], seconds[order]
+
+    stamps = (day + pd.to_timedelta(seconds, unit='s')).strftime('%Y-%m-%d %H:%M:%S') + UTC_OFFSET
+    df = pd.DataFrame({'date': stamps, 'station_uuid': stations['uuid'].to_numpy()[station]})
+    # Tagesverlauf: morgens teuer, abends günstig
+    intraday = 0.06 * np.cos(2 * np.pi * seconds / 86400)
+    for fuel in ('diesel', 'e5', 'e10'):
+        price = levels[fuel] + offsets[station] + intraday + rng.normal(0, 0.01, len(station))
+        # Preise enden wie an der Zapfsäule auf 9
+        price = np.floor(price * 100) / 100 + 0.009
+        df[fuel] = np.where(sells[fuel][station], price, 0.0)
+    for fuel in ('diesel', 'e5', 'e10'):
+        df[f'{fuel}change'] = np.where(sells[fuel][station], rng.integers(0, 2, len(station)), 0)
+    return df[PRICE_COLUMNS]
+
+
+def write_raw_year(
+    root: str,
+    year: int,
+    n_stations: int = 2000,
+    days: Optional[int] = None,
+    events: float = 8.0,
+    seed: int = 0
+) -> Dict:
+    """
+    Schreibt Stammdaten und Preisdateien für year (days=None: ganzes Jahr).
+    Liefert Anzahl Dateien, Zeilen und Bytes.
+    """
+    rng = np.random.default_rng([seed, year])
+    dates = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
+    if days is not None:
+        dates = dates[:days]
+
+    stations = make_stations(n_stations, rng)
+    stations_file = _day_path(root, 'stations', dates[-1])
+    stations.to_csv(stations_file, index=False)
+
+    offsets = rng.normal(0, 0.04, n_stations)
+    sells = {
+        'e5': np.ones(n_stations, dtype=bool),
+        'e10': rng.random(n_stations) > 0.05,
+        'diesel': rng.random(n_stations) > 0.02,
+    }
+    levels = dict(FUELS)
+    stats = {'price_files': 0, 'price_rows': 0, 'bytes': os.path.getsize(stations_file)}
+    for day in dates:
+        for fuel in levels:
+            levels[fuel] += rng.normal(0, 0.008)
+        df = make_prices(day, stations, levels, offsets, sells, events, rng)
+        path = _day_path(root, 'prices', day)
+        df.to_csv(path, index=False, float_format='%.3f')
+        stats['price_files'] += 1
+        stats['price_rows'] += len(df)
+        stats['bytes'] += os.path.getsize(path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic Tankerkoenig stations/prices CSV files.')
+    parser.add_argument('--out', required=True, help='Root directory (like data/tankerkoenig_historic)')
+    parser.add_argument('--year', type=int, required=True)
+    parser.add_argument('--stations', type=int, default=2000, help='Number of stations (default: 2000)')
+    parser.add_argument('--days', type=int, help='Number of days from Jan 1 (default: whole year)')
+    parser.add_argument('--events', type=float, default=8.0,
+                        help='Mean price changes per station and day (default: 8)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    stats = write_raw_year(args.out, args.year, args.stations, args.days, args.events, args.seed)
+    print(f"Wrote {stats['price_files']} price files, {stats['price_rows']:,} rows, "
+          f"{stats['bytes'] / 1024 / 1024:.1f} MB to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
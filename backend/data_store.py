@@ -0,0 +1,280 @@
+"""
+Prozessweiter Datenspeicher für die Parquet-Datensätze
+
+Lädt jedes Jahr einer Granularität (Partitionen unter data/dataset/ bzw. die
+Einzeldatei data_{daily,weekly,monthly}_{year}.parquet, siehe dataset_layout)
+höchstens einmal und hält es als Arrow-Tabelle (spaltenorientiert, Strings dictionary-kodiert)
+im Speicher. Übersteigt der Gesamtverbrauch das Byte-Budget, werden die am
+längsten nicht genutzten Jahre verdrängt.
+
+scan() liest dagegen jahresübergreifend direkt aus den Dateien, gefiltert
+nach Kraftstoff, Region und Datum, ohne ganze Jahre in den Cache zu laden.
+
+Mit mmap_dir werden die Parquet-Dateien einmalig in unkomprimierte Arrow-IPC-
+Dateien umgewandelt und nur noch read-only gemappt: alle Worker-Prozesse teilen
+sich dieselben Seiten im Page-Cache, der Heap wächst nicht mit der Worker-Zahl.
+"""
+
+import os
+import threading
+from datetime import date
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import dataset_layout
+from atomic_io import atomic_write
+from single_flight import SingleFlight
+
+GRANULARITIES = ('daily', 'weekly', 'monthly')
+
+# Spalten mit wenigen unterschiedlichen Werten -> Dictionary-Encoding
+DICTIONARY_COLUMNS = ['region_plz3', 'fuel', 'year_week', 'year_month']
+
+
+class DatasetStore:
+    """LRU-Cache für Arrow-Tabellen mit Byte-Budget (optional speicherabgebildet)."""
+
+    def __init__(self, data_dir: str, max_bytes: int, mmap_dir: Optional[str] = None):
+        self.data_dir = data_dir
+        self.max_bytes = max_bytes
+        self.mmap_dir = mmap_dir
+        self._tables: "OrderedDict[Tuple[str, int], Tuple[pa.Table, Tuple[int, int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def files(self, granularity: str, year: int) -> List[str]:
+        """Parquet-Dateien eines Jahres (Partitionen oder Einzeldatei, leer wenn keine Daten)."""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        return dataset_layout.year_files(self.data_dir, granularity, year)
+
+    def exists(self, granularity: str, year: int) -> bool:
+        return bool(self.files(granularity, year))
+
+    def available_years(self, granularity: str, years: Optional[Iterable[int]] = None) -> List[int]:
+        """Jahre mit Daten: aus years, ohne years alle im Datenverzeichnis vorhandenen."""
+        if years is None:
+            if granularity not in GRANULARITIES:
+                raise ValueError(f"Unknown granularity: {granularity}")
+            return dataset_layout.available_years(self.data_dir, granularity)
+        return [y for y in years if self.exists(granularity, y)]
+
+    def version(self, granularity: str, year: int) -> Tuple[int, int]:
+        """(neueste mtime_ns, Gesamtgröße) der Quelldateien - ändert sich, sobald neu geschrieben wurde."""
+        stats = [os.stat(path) for path in self.files(granularity, year)]
+        if not stats:
+            raise FileNotFoundError(f'No {granularity} data for {year}')
+        return max(st.st_mtime_ns for st in stats), sum(st.st_size for st in stats)
+
+    def table(self, granularity: str, year: int) -> pa.Table:
+        """Liefert die komplette Tabelle eines Jahres (lädt bei Bedarf)."""
+        key = (granularity, year)
+        version = self.version(granularity, year)
+
+        with self._lock:
+            entry = self._tables.get(key)
+            if entry is not None and entry[1] == version:
+                self._tables.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        # Parallele Anfragen für dieselbe Datei(-version) laden nur einmal
+        return self._flights.do((key, version), lambda: self._store(key, version))
+
+    def _store(self, key: Tuple[str, int], version: Tuple[int, int]) -> pa.Table:
+        with self._lock:
+            # Inzwischen von einem gerade beendeten Aufruf geladen?
+            entry = self._tables.get(key)
+            if entry is not None and entry[1] == version:
+                return entry[0]
+            self.misses += 1
+        table = self._load(*key)
+
+        with self._lock:
+            self._tables[key] = (table, version)
+            self._tables.move_to_end(key)
+            self._evict(keep=key)
+        return table
+
+    def frame(
+        self,
+        granularity: str,
+        year: int,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Tabelle eines Jahres als DataFrame (optional nur ausgewählte Spalten)."""
+        table = self.table(granularity, year)
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return to_pandas(table)
+
+    def query(
+        self,
+        granularity: str,
+        year: int,
+        fuels: Optional[List[str]] = None,
+        regions: Optional[List[str]] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        columns: Optional[List[str]] = None
+    ) -> pa.Table:
+        """
+        Gefilterte Sicht auf ein Jahr: Filter und Spaltenauswahl laufen auf der
+        Arrow-Tabelle, nicht passende Zeilen werden nie nach Pandas/JSON gewandelt.
+        """
+        table = self.table(granularity, year)
+
+        expr = None
+        for cond in (
+            pc.field('fuel').isin(fuels) if fuels else None,
+            pc.field('region_plz3').isin(regions) if regions else None,
+            pc.field('date') >= date_from if date_from else None,
+            pc.field('date') <= date_to if date_to else None,
+        ):
+            if cond is not None:
+                expr = cond if expr is None else expr & cond
+        if expr is not None:
+            table = table.filter(expr)
+
+        if columns is not None:
+            unknown = [c for c in columns if c not in table.column_names]
+            if unknown:
+                raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+            table = table.select(columns)
+        return table
+
+    def scan(
+        self,
+        granularity: str,
+        years: Optional[Iterable[int]] = None,
+        fuels: Optional[List[str]] = None,
+        regions: Optional[List[str]] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        columns: Optional[List[str]] = None
+    ) -> Optional[pa.Table]:
+        """
+        Jahresübergreifender Scan direkt auf den Dateien (am Cache vorbei):
+        gelesen werden nur die Partitionen der Kraftstoffe, die Row-Groups im
+        Datumsbereich und die angefragten Spalten. Ohne years alle vorhandenen
+        Jahre, None wenn keine Daten.
+        """
+        if years is None:
+            years = self.available_years(granularity)
+        return dataset_layout.read(
+            self.data_dir, granularity, years, fuels=fuels, regions=regions,
+            date_from=date_from, date_to=date_to, columns=columns,
+            dictionary_columns=DICTIONARY_COLUMNS
+        )
+
+    def concat_frames(
+        self,
+        granularity: str,
+        years: Optional[Iterable[int]] = None,
+        columns: Optional[List[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        """Alle verfügbaren Jahre (bzw. die aus years) zu einem DataFrame zusammengefügt (None wenn keine Daten)."""
+        dfs = [self.frame(granularity, y, columns) for y in self.available_years(granularity, years)]
+        if not dfs:
+            return None
+        return pd.concat(dfs, ignore_index=True)
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(t.nbytes for t, _ in self._tables.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': [f'{g}_{y}' for g, y in self._tables.keys()],
+                'bytes': sum(t.nbytes for t, _ in self._tables.values()),
+                'max_bytes': self.max_bytes,
+                'mapped': self.mmap_dir is not None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self._flights.shared,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+    def arrow_path(self, granularity: str, year: int) -> str:
+        return os.path.join(self.mmap_dir, f'data_{granularity}_{year}.arrow')
+
+    def ensure_arrow(self, granularity: str, year: int) -> str:
+        """
+        Arrow-IPC-Datei zur Parquet-Quelle (neu geschrieben, sobald die Quelle
+        neuer ist). Atomar, parallele Prozesse sehen nie eine halbe Datei.
+        """
+        target = self.arrow_path(granularity, year)
+        try:
+            if os.stat(target).st_mtime_ns >= self.version(granularity, year)[0]:
+                return target
+        except OSError:
+            pass
+
+        table = self._read_parquet(granularity, year)
+
+        def write(tmp_path):
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        atomic_write(target, write, suffix='.arrow.tmp')
+        return target
+
+    def _load(self, granularity: str, year: int) -> pa.Table:
+        if self.mmap_dir is None:
+            return self._read_parquet(granularity, year)
+        source = pa.memory_map(self.ensure_arrow(granularity, year), 'r')
+        # Zero-Copy: die Puffer der Tabelle zeigen direkt in die gemappte Datei
+        return pa.ipc.open_file(source).read_all()
+
+    def _read_parquet(self, granularity: str, year: int) -> pa.Table:
+        table = dataset_layout.read(self.data_dir, granularity, [year], dictionary_columns=DICTIONARY_COLUMNS)
+        if dataset_layout.is_partitioned(self.data_dir, granularity, year):
+            # Partitionen liegen je Kraftstoff vor: Zeilenfolge der Einzeldateien wiederherstellen
+            period = [c for c in ('year_week', 'year_month') if c in table.column_names] or ['date']
+            keys = period + ['region_plz3', 'fuel']
+            # Dictionary-Spalten lassen sich nicht direkt sortieren: Reihenfolge über die Werte bestimmen
+            order = pc.sort_indices(to_plain(table.select(keys)), sort_keys=[(c, 'ascending') for c in keys])
+            table = table.take(order)
+        # Kein Pandas-Index mitschleppen, Chunks zusammenfassen für schnelle Slices
+        return table.replace_schema_metadata(None).combine_chunks()
+
+    def _evict(self, keep: Tuple[str, int]):
+        """Verdrängt LRU-Einträge, bis das Budget eingehalten wird (Lock muss gehalten werden)."""
+        if self.mmap_dir is not None:
+            # Gemappte Tabellen liegen im gemeinsamen Page-Cache, nicht im Heap
+            return
+        total = sum(t.nbytes for t, _ in self._tables.values())
+        for key in list(self._tables.keys()):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            table, _ = self._tables.pop(key)
+            total -= table.nbytes
+            self.evictions += 1
+
+
+def to_plain(table: pa.Table) -> pa.Table:
+    """Dictionary-Spalten wieder als normale Spalten ihres Werttyps."""
+    fields = [
+        pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+        for f in table.schema
+    ]
+    return table.cast(pa.schema(fields))
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Arrow -> Pandas, Dictionary-Spalten wieder als normale Strings."""
+    return to_plain(table).to_pandas()
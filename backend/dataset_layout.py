@@ -0,0 +1,168 @@
+"""
+Partitioniertes Parquet-Layout für die Preisdaten
+
+    data/dataset/granularity={daily,weekly,monthly}/year={year}/fuel={fuel}/part-0.parquet
+
+Jede Datei ist nach Datum und Region sortiert und in Row-Groups von
+ROW_GROUP_ROWS Zeilen geschrieben; über die Min/Max-Statistiken der
+Row-Groups überspringt ein Datumsfilter alle nicht betroffenen Blöcke. Die
+Spalte fuel bleibt zusätzlich in der Datei, damit Partitionen und die alten
+Einzeldateien dasselbe Schema haben und gemeinsam gelesen werden können.
+
+Fehlt eine Partition, wird auf data_{granularity}_{year}.parquet
+zurückgegriffen (eingecheckte Wochen-/Monatsdateien, synthetische
+Benchmark-Daten). read() öffnet alle betroffenen Jahre als ein Dataset:
+Jahr und Kraftstoff werden über die Verzeichnisse ausgewählt, Datum und
+Region über die Row-Group-Statistiken, gelesen werden nur die nötigen Spalten.
+"""
+
+import glob
+import os
+import shutil
+from datetime import date
+from typing import Iterable, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from atomic_io import atomic_write
+
+DATASET_DIR = 'dataset'
+ROW_GROUP_ROWS = 32 * 1024
+SORT_KEYS = ['date', 'region_plz3']
+
+
+def granularity_dir(data_dir: str, granularity: str) -> str:
+    return os.path.join(data_dir, DATASET_DIR, f'granularity={granularity}')
+
+
+def partition_dir(data_dir: str, granularity: str, year: int, fuel: Optional[str] = None) -> str:
+    path = os.path.join(granularity_dir(data_dir, granularity), f'year={year}')
+    return os.path.join(path, f'fuel={fuel}') if fuel is not None else path
+
+
+def legacy_path(data_dir: str, granularity: str, year: int) -> str:
+    return os.path.join(data_dir, f'data_{granularity}_{year}.parquet')
+
+
+def year_files(data_dir: str, granularity: str, year: int, fuels: Optional[List[str]] = None) -> List[str]:
+    """
+    Dateien eines Jahres: die Partitionen (mit fuels nur diese Kraftstoffe),
+    sonst die Einzeldatei (leer, wenn keine Daten).
+    """
+    if is_partitioned(data_dir, granularity, year):
+        files = sorted(glob.glob(os.path.join(partition_dir(data_dir, granularity, year), 'fuel=*', '*.parquet')))
+        if fuels:
+            files = [f for f in files if os.path.basename(os.path.dirname(f))[len('fuel='):] in fuels]
+        return files
+    path = legacy_path(data_dir, granularity, year)
+    return [path] if os.path.exists(path) else []
+
+
+def available_years(data_dir: str, granularity: str) -> List[int]:
+    """Alle Jahre mit Daten (Partitionen oder Einzeldatei), aufsteigend."""
+    years = set()
+    for path in glob.glob(os.path.join(granularity_dir(data_dir, granularity), 'year=*')):
+        years.add(os.path.basename(path)[len('year='):])
+    prefix = f'data_{granularity}_'
+    for path in glob.glob(os.path.join(data_dir, f'{prefix}*.parquet')):
+        years.add(os.path.basename(path)[len(prefix):-len('.parquet')])
+    return [int(y) for y in sorted(years) if y.isdigit() and year_files(data_dir, granularity, int(y))]
+
+
+def is_partitioned(data_dir: str, granularity: str, year: int) -> bool:
+    return os.path.isdir(partition_dir(data_dir, granularity, year))
+
+
+def write_year(
+    data: Union[pd.DataFrame, pa.Table],
+    data_dir: str,
+    granularity: str,
+    year: int,
+    row_group_rows: int = ROW_GROUP_ROWS
+) -> List[str]:
+    """
+    Schreibt ein Jahr als eine Datei je Kraftstoff. Jede Datei wird atomar
+    ersetzt; Kraftstoffe, die nicht mehr vorkommen, werden entfernt.
+    """
+    table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+    # large_string (Pandas-Strings) wie in den Einzeldateien als string ablegen
+    table = table.replace_schema_metadata(None).cast(pa.schema([
+        pa.field(f.name, pa.string()) if pa.types.is_large_string(f.type) else f for f in table.schema
+    ]))
+    keys = [(c, 'ascending') for c in SORT_KEYS if c in table.column_names]
+
+    paths = []
+    fuels = sorted(set(table.column('fuel').to_pylist()))
+    for fuel in fuels:
+        part = table.filter(pc.equal(table.column('fuel'), fuel))
+        if keys:
+            part = part.sort_by(keys)
+        folder = partition_dir(data_dir, granularity, year, fuel)
+        path = os.path.join(folder, 'part-0.parquet')
+        # Punkt-Präfix: unvollständige Dateien tauchen in keinem Verzeichnis-Scan auf
+        atomic_write(path, lambda p: pq.write_table(part, p, row_group_size=row_group_rows),
+                     suffix='.parquet.tmp', prefix='.')
+        paths.append(path)
+
+    for folder in glob.glob(os.path.join(partition_dir(data_dir, granularity, year), 'fuel=*')):
+        if folder.split('fuel=', 1)[1] not in fuels:
+            shutil.rmtree(folder, ignore_errors=True)
+    return paths
+
+
+def dataset(
+    data_dir: str,
+    granularity: str,
+    years: Iterable[int],
+    fuels: Optional[List[str]] = None,
+    dictionary_columns: Optional[List[str]] = None
+) -> Optional[ds.Dataset]:
+    """
+    Die Dateien aller vorhandenen Jahre als ein Dataset (None, wenn kein Jahr
+    vorhanden ist). Jahr und Kraftstoff werden über die Partitionsverzeichnisse
+    ausgewählt, nicht betroffene Dateien gehören gar nicht erst zum Dataset.
+    """
+    files = [f for year in years for f in year_files(data_dir, granularity, year, fuels)]
+    if not files:
+        return None
+    fmt = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=dictionary_columns or []))
+    return ds.dataset(files, format=fmt)
+
+
+def read(
+    data_dir: str,
+    granularity: str,
+    years: Iterable[int],
+    fuels: Optional[List[str]] = None,
+    regions: Optional[List[str]] = None,
+    date_from: Optional[Union[date, pd.Timestamp]] = None,
+    date_to: Optional[Union[date, pd.Timestamp]] = None,
+    columns: Optional[List[str]] = None,
+    dictionary_columns: Optional[List[str]] = None
+) -> Optional[pa.Table]:
+    """Gefilterter Scan über mehrere Jahre (ohne columns: alle Spalten)."""
+    years = list(years)
+    if date_from is not None:
+        years = [y for y in years if y >= date_from.year]
+    if date_to is not None:
+        years = [y for y in years if y <= date_to.year]
+    data = dataset(data_dir, granularity, years, fuels, dictionary_columns)
+    if data is None:
+        return None
+
+    expr = None
+    for cond in (
+        # Die Einzeldateien enthalten alle Kraftstoffe, dort filtert erst die Spalte
+        ds.field('fuel').isin(fuels) if fuels else None,
+        ds.field('region_plz3').isin(regions) if regions else None,
+        ds.field('date') >= date_from if date_from is not None else None,
+        ds.field('date') <= date_to if date_to is not None else None,
+    ):
+        if cond is not None:
+            expr = cond if expr is None else expr & cond
+
+    return data.to_table(columns=columns, filter=expr)
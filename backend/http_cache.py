@@ -0,0 +1,110 @@
+"""
+HTTP-Caching für Daten- und Geo-Routen
+
+- Starke ETags aus mtime und Größe der Quelldateien (+ Anfrage-Variante)
+- 304 Not Modified bei If-None-Match / If-Modified-Since
+- Cache-Dateien werden als Rohbytes ausgeliefert, bei Accept-Encoding: gzip
+  als vorkomprimierte .gz-Datei daneben (wird bei Bedarf erzeugt)
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Tuple
+
+from flask import Response, request, send_file
+
+from atomic_io import atomic_write
+
+Validators = Tuple[str, datetime]
+
+
+def validators(paths: Iterable[str], variant: str = '') -> Validators:
+    """(ETag, Last-Modified) für eine Antwort, die aus den gegebenen Dateien entsteht."""
+    h = hashlib.sha1()
+    latest = 0.0
+    for path in paths:
+        st = os.stat(path)
+        h.update(f'{os.path.basename(path)}:{st.st_mtime_ns}:{st.st_size};'.encode())
+        latest = max(latest, st.st_mtime)
+    h.update(variant.encode())
+    last_modified = datetime.fromtimestamp(int(latest), tz=timezone.utc)
+    return h.hexdigest()[:32], last_modified
+
+
+def request_variant(*parts: str) -> str:
+    """Query-String + weitere Merkmale (z.B. Antwortformat) als Teil des ETags."""
+    return '|'.join((request.query_string.decode(),) + parts)
+
+
+def is_fresh(v: Validators) -> bool:
+    """True, wenn der Client die aktuelle Version bereits hat."""
+    etag, last_modified = v
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return request.if_modified_since >= last_modified
+    return False
+
+
+def stamp(response: Response, v: Validators) -> Response:
+    """Setzt ETag/Last-Modified auf erfolgreiche Antworten."""
+    if response.status_code == 200:
+        response.set_etag(v[0])
+        response.last_modified = v[1]
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+    return response
+
+
+def not_modified(v: Validators) -> Response:
+    response = Response(status=304)
+    response.set_etag(v[0])
+    response.last_modified = v[1]
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def ensure_gzip(path: str) -> Optional[str]:
+    """Erzeugt/aktualisiert die .gz-Datei neben path (atomar). Gibt ihren Pfad zurück."""
+    gz_path = path + '.gz'
+    try:
+        if os.path.getmtime(gz_path) >= os.path.getmtime(path):
+            return gz_path
+    except OSError:
+        pass
+
+    def compress(tmp_path):
+        with open(tmp_path, 'wb') as raw, open(path, 'rb') as src:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=9, mtime=0) as gz:
+                shutil.copyfileobj(src, gz)
+    try:
+        atomic_write(gz_path, compress, suffix='.gz.tmp')
+    except OSError:
+        # z.B. schreibgeschütztes Verzeichnis oder Platte voll -> unkomprimiert ausliefern
+        return None
+    return gz_path
+
+
+def send_cache_file(directory: str, filename: str, mimetype: str = 'application/json') -> Response:
+    """Liefert eine Cache-Datei als Rohbytes aus (konditional, ggf. gzip-vorkomprimiert)."""
+    path = os.path.join(directory, filename)
+    if not os.path.isfile(path):
+        return Response(status=404)
+
+    gz_path = ensure_gzip(path) if 'gzip' in request.accept_encodings else None
+    if gz_path:
+        v = validators([path], 'gzip')
+        response = send_file(gz_path, mimetype=mimetype, etag=v[0],
+                             last_modified=v[1], conditional=True)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        v = validators([path])
+        response = send_file(path, mimetype=mimetype, etag=v[0],
+                             last_modified=v[1], conditional=True)
+
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
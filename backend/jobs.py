@@ -0,0 +1,372 @@
+"""
+Begrenzter Hintergrund-Pool für teure Berechnungen (Marktphasen, Regional-Raster)
+
+Ein Cache-Miss rechnet nicht mehr im Request-Thread: die Route reicht die
+Berechnung hier ein und antwortet sofort mit 202 + Job-ID. Der Client fragt
+/api/jobs/<id> ab (oder folgt /api/jobs/<id>/events per Server-Sent Events)
+und lädt nach Abschluss die ursprüngliche URL erneut - dann aus dem Cache.
+
+- workers:     höchstens so viele Berechnungen gleichzeitig
+- max_queued:  höchstens so viele wartende Jobs, darüber JobQueueFull (-> 503)
+- Gleicher Schlüssel = gleicher Job: parallele Anfragen teilen sich einen Job
+- Beendete Jobs bleiben keep_seconds abrufbar (done(key): die erneute Anfrage
+  nach einem abgeschlossenen Job wird direkt beantwortet, nicht neu eingereiht)
+
+Alle Grenzen gelten serverweit: Status und Locks liegen in state_dir, das sich
+alle Worker-Prozesse (serve.py / gunicorn) teilen:
+
+    {id}.json       Status samt Verlauf, bei jedem Wechsel atomar ersetzt
+    {id}.lock       flock des ausführenden Prozesses, solange der Job wartet/läuft
+    slot-{i}.lock   eine laufende Berechnung je Slot, i < workers
+    queue.lock      serialisiert das Einreichen (Zählen + Anlegen)
+
+Die Job-ID ergibt sich aus dem Schlüssel, daher beantwortet jeder Prozess
+/api/jobs/<id>, und eine Anfrage mit demselben Schlüssel schließt sich dem
+Job an, egal welcher Prozess sie annimmt. Die Ergebnisse selbst schreiben die
+Jobs in gemeinsame Cache-Dateien (regional_{year}.json, Marktphasen-Memo).
+Stirbt der ausführende Prozess, gibt das Betriebssystem seine Locks frei: der
+Job wird als fehlgeschlagen gemeldet und beim nächsten Einreichen neu gestartet.
+
+Die Worker-Threads starten erst beim ersten Job im jeweiligen Prozess, damit
+sie einen fork (gunicorn preload) nicht verpassen. Ohne fcntl (Windows,
+Entwicklungsserver mit einem Prozess) gelten die Grenzen nur prozessweit.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from atomic_io import atomic_write
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+FINISHED = (DONE, ERROR)
+
+JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+# Abfrageintervall für Statuswechsel aus anderen Prozessen (SSE, freie Slots)
+POLL_SECONDS = 0.1
+
+
+class JobQueueFull(Exception):
+    """Warteschlange voll; retry_after = geschätzte Wartezeit in Sekunden."""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Too many pending computations, retry later')
+        self.retry_after = retry_after
+
+
+class Job:
+    """Stand eines Jobs, wie er in {id}.json steht (für Polling und SSE)."""
+
+    def __init__(self, jobs: 'JobQueue', info: Dict):
+        self._jobs = jobs
+        self.info = info
+
+    @property
+    def id(self) -> str:
+        return self.info['job_id']
+
+    @property
+    def status(self) -> str:
+        return self.info['status']
+
+    def to_dict(self) -> Dict:
+        return describe(self.info)
+
+    def wait(self, seen: int, timeout: float) -> List[Dict]:
+        """Ereignisse ab Index seen; wartet bis zu timeout Sekunden, falls keine neuen vorliegen."""
+        deadline = time.time() + timeout
+        while True:
+            job = self._jobs.get(self.id)
+            if job is None:
+                return []
+            events = job.info['events']
+            if len(events) > seen or job.status in FINISHED or time.time() >= deadline:
+                return events[seen:]
+            time.sleep(POLL_SECONDS)
+
+
+def describe(info: Dict) -> Dict:
+    """Öffentliche Sicht auf einen Job (ohne Verlauf)."""
+    job_id = info['job_id']
+    result = {
+        'job_id': job_id,
+        'status': info['status'],
+        'status_url': f'/api/jobs/{job_id}',
+        'events_url': f'/api/jobs/{job_id}/events',
+        'result_url': info['result_url'],
+        'queued_seconds': round((info['started'] or time.time()) - info['created'], 3),
+    }
+    if info['started'] is not None:
+        result['running_seconds'] = round((info['finished'] or time.time()) - info['started'], 3)
+    if info['error'] is not None:
+        result['error'] = info['error']
+    return result
+
+
+class _Task:
+    """Ein Job, den dieser Prozess ausführt (hält den Lock auf {id}.lock)."""
+
+    def __init__(self, info: Dict, fn: Callable[[], Any], lock_fd: Optional[int]):
+        self.info = info
+        self.fn = fn
+        self.lock_fd = lock_fd
+
+
+class JobQueue:
+    """Worker-Threads je Prozess, Slots und Warteschlange serverweit über state_dir."""
+
+    def __init__(self, state_dir: str, workers: int = 2, max_queued: int = 8, keep_seconds: int = 300):
+        self.state_dir = state_dir
+        self.workers = max(1, workers)
+        self.max_queued = max(0, max_queued)
+        self.keep_seconds = keep_seconds
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._local: Dict[str, _Task] = {}
+        self._queue: "queue.Queue[_Task]" = queue.Queue()
+        self._pid = None
+        self.submitted = 0
+        self.shared = 0
+        self.rejected = 0
+        self.failed = 0
+        os.makedirs(state_dir, exist_ok=True)
+
+    @staticmethod
+    def job_id(key: Hashable) -> str:
+        return hashlib.sha1(repr(key).encode()).hexdigest()[:32]
+
+    def _path(self, job_id: str, ext: str) -> str:
+        return os.path.join(self.state_dir, f'{job_id}.{ext}')
+
+    # --- Dateien und Locks ----------------------------------------------------
+
+    def _read(self, job_id: str) -> Optional[Dict]:
+        try:
+            with open(self._path(job_id, 'json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, info: Dict):
+        def dump(p):
+            with open(p, 'w', encoding='utf-8') as f:
+                json.dump(info, f)
+        atomic_write(self._path(info['job_id'], 'json'), dump, suffix='.json.tmp', prefix='.')
+
+    def _infos(self) -> List[Dict]:
+        infos = []
+        for path in glob.glob(os.path.join(self.state_dir, '*.json')):
+            info = self._read(os.path.basename(path)[:-len('.json')])
+            if info is not None:
+                infos.append(info)
+        return infos
+
+    def _held(self, job_id: str) -> bool:
+        """True, solange ein lebender Prozess den Job wartend/laufend hält."""
+        with self._lock:
+            if job_id in self._local:
+                return True
+        if fcntl is None:
+            return False
+        try:
+            fd = os.open(self._path(job_id, 'lock'), os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def _lock_file(self, name: str, blocking: bool = True) -> Optional[int]:
+        """Geöffneter und gesperrter Lock; None, wenn nicht blockierend und belegt."""
+        fd = os.open(os.path.join(self.state_dir, name), os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    @contextmanager
+    def _submitting(self) -> Iterator[None]:
+        with self._submit_lock:
+            fd = self._lock_file('queue.lock')
+            try:
+                yield
+            finally:
+                os.close(fd)
+
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        """Einer von workers Slots, serverweit (wartet, bis einer frei ist)."""
+        while True:
+            for i in range(self.workers):
+                fd = self._lock_file(f'slot-{i}.lock', blocking=False)
+                if fd is not None:
+                    try:
+                        yield
+                    finally:
+                        os.close(fd)
+                    return
+            time.sleep(POLL_SECONDS)
+
+    def _live(self, info: Dict) -> bool:
+        return info['status'] not in FINISHED and self._held(info['job_id'])
+
+    def _expire(self, now: float):
+        """Entfernt beendete und verwaiste Jobs, die älter als keep_seconds sind."""
+        for info in self._infos():
+            ended = info['finished'] or info['created']
+            if now - ended < self.keep_seconds or self._live(info):
+                continue
+            for ext in ('json', 'lock'):
+                try:
+                    os.remove(self._path(info['job_id'], ext))
+                except FileNotFoundError:
+                    pass
+
+    # --- Ausführung -----------------------------------------------------------
+
+    def _start(self):
+        # Threads überleben keinen fork: pro Prozess neu starten
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._local = {}
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True).start()
+
+    def _event(self, task: _Task, status: str, error: Optional[str] = None):
+        info = task.info
+        info['status'] = status
+        info['error'] = error
+        if status == RUNNING:
+            info['started'] = time.time()
+        elif status in FINISHED:
+            info['finished'] = time.time()
+        info['events'].append(describe(info))
+        self._write(info)
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            try:
+                with self._slot():
+                    self._event(task, RUNNING)
+                    try:
+                        task.fn()
+                    except Exception as e:
+                        with self._lock:
+                            self.failed += 1
+                        self._event(task, ERROR, str(e))
+                    else:
+                        self._event(task, DONE)
+            finally:
+                task.fn = None
+                with self._lock:
+                    self._local.pop(task.info['job_id'], None)
+                if task.lock_fd is not None:
+                    os.close(task.lock_fd)
+
+    # --- API ------------------------------------------------------------------
+
+    def retry_after(self) -> int:
+        """Geschätzte Sekunden bis ein Platz frei wird (mittlere Laufzeit x Wartende / Worker)."""
+        infos = self._infos()
+        finished = sorted((i for i in infos if i['status'] in FINISHED and i['started']), key=lambda i: i['finished'])
+        durations = [i['finished'] - i['started'] for i in finished[-20:]]
+        mean = sum(durations) / len(durations) if durations else 5.0
+        queued = sum(1 for i in infos if i['status'] == QUEUED and self._live(i))
+        return max(1, round(mean * (queued + 1) / self.workers))
+
+    def submit(self, key: Hashable, fn: Callable[[], Any], result_url: Optional[str] = None) -> Job:
+        """
+        Job für key einreihen, oder den bereits wartenden/laufenden Job mit
+        demselben key zurückgeben (auch aus einem anderen Prozess).
+        Warteschlange voll -> JobQueueFull.
+        """
+        job_id = self.job_id(key)
+        with self._submitting():
+            now = time.time()
+            self._expire(now)
+            info = self._read(job_id)
+            if info is not None and self._live(info):
+                with self._lock:
+                    self.shared += 1
+                return Job(self, info)
+
+            queued = sum(1 for i in self._infos() if i['status'] == QUEUED and self._live(i))
+            full = queued >= self.max_queued
+            if not full:
+                with self._lock:
+                    self._start()
+                    self.submitted += 1
+                info = {
+                    'job_id': job_id, 'key': repr(key), 'result_url': result_url,
+                    'status': QUEUED, 'error': None,
+                    'created': now, 'started': None, 'finished': None, 'events': [],
+                }
+                task = _Task(info, fn, self._lock_file(f'{job_id}.lock') if fcntl is not None else None)
+                with self._lock:
+                    self._local[job_id] = task
+                self._event(task, QUEUED)
+                self._queue.put(task)
+        if full:
+            with self._lock:
+                self.rejected += 1
+            raise JobQueueFull(self.retry_after())
+        return Job(self, info)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Job aus einem beliebigen Prozess (None, wenn unbekannt oder abgelaufen)."""
+        if not JOB_ID.match(job_id):
+            return None
+        info = self._read(job_id)
+        if info is None:
+            return None
+        if info['status'] not in FINISHED and not self._held(job_id):
+            # Ausführender Prozess beendet, ohne den Job abzuschließen
+            info.update(status=ERROR, error='Job abandoned, the worker process exited', finished=time.time())
+            info['events'].append(describe(info))
+        return Job(self, info)
+
+    def done(self, key: Hashable) -> bool:
+        """Ob der Job für key erfolgreich beendet und noch abrufbar ist (aus einem beliebigen Prozess)."""
+        info = self._read(self.job_id(key))
+        return info is not None and info['status'] == DONE
+
+    def stats(self) -> Dict:
+        """Wartende/laufende Jobs serverweit, Zähler für diesen Prozess."""
+        live = [i for i in self._infos() if self._live(i)]
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'queued': sum(1 for i in live if i['status'] == QUEUED),
+                'running': sum(1 for i in live if i['status'] == RUNNING),
+                'submitted': self.submitted,
+                'shared': self.shared,
+                'rejected': self.rejected,
+                'failed': self.failed,
+            }
@@ -0,0 +1,319 @@
+"""
+Marktphasen-Würfel: Region × Kraftstoff, vorab berechnet
+
+Berechnet die Marktphasen für alle PLZ3-Regionen eines Kraftstoffs auf einmal
+(Regionen als Spalten einer Datum × Region-Matrix, verteilt auf einen
+Prozess-Pool) und legt sie kompakt ab:
+
+    cache/market_phases_cube_{fuel}-{version}.parquet   Zeitreihen, sortiert nach Region/Datum
+    cache/market_phases_cube_{fuel}.json                Phasen + Meta je Region, Name der Parquet-Datei
+
+Die API liest daraus direkt (Parquet mit Region-Filter über Row-Group-Statistiken),
+so dass Regionsanfragen keine Live-Berechnung mehr auslösen. Jede Generierung
+schreibt eine neue Parquet-Datei und tauscht erst danach das JSON aus, das auf
+sie verweist: ein Leser bekommt immer Index und Zeitreihen derselben Version.
+Der Zustand je Region (market_phase_state) erlaubt es, den Würfel später nur
+um neue Tage zu erweitern (update_cube).
+"""
+
+import concurrent.futures
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from atomic_io import atomic_write
+from market_phases import (
+    STATE_COLUMNS,
+    TIMESERIES_COLUMNS,
+    aggregate_daily,
+    build_phase_result,
+    compute_phase_metrics_batch,
+    update_market_phases,
+)
+
+FUELS = ['e5', 'e10', 'diesel']
+REGIONS_PER_TASK = 32
+# Regionen je Row-Group -> Region-Filter liest nur einen Bruchteil der Datei
+REGIONS_PER_ROW_GROUP = 8
+
+INPUT_COLUMNS = ['date', 'region_plz3', 'fuel', 'price_mean', 'brent_oil_eur', 'price_std']
+METRIC_COLUMNS = ['rp', 'ro', 'rp_smooth', 'ro_smooth', 'zp', 'zo', 'vp', 'vo',
+                  'vol_ratio', 'best_correlation', 'best_lag', 'zo_lagged']
+
+
+def index_path(cache_dir: str, fuel: str) -> str:
+    return os.path.join(cache_dir, f'market_phases_cube_{fuel}.json')
+
+
+def read_index(cache_dir: str, fuel: str) -> Dict:
+    """{'timeseries_file': Parquet-Dateiname oder None, 'regions': {region: Phasen/Meta}}"""
+    with open(index_path(cache_dir, fuel), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def cube_files(cache_dir: str, fuel: str) -> List[str]:
+    """Index und die Parquet-Datei, auf die er verweist (leer, wenn kein Würfel existiert)."""
+    try:
+        index = read_index(cache_dir, fuel)
+    except FileNotFoundError:
+        return []
+    files = [index_path(cache_dir, fuel)]
+    if index['timeseries_file']:
+        files.append(os.path.join(cache_dir, index['timeseries_file']))
+    return files
+
+
+# --- Berechnung -------------------------------------------------------------
+
+def _with_region(states: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Zustände aller Regionen als eine Tabelle (Spalte region_plz3)."""
+    frames = [state.assign(region_plz3=region) for region, state in states.items()]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=STATE_COLUMNS)
+
+
+def _batch_results(
+    dates: np.ndarray,
+    regions: List[str],
+    price: np.ndarray,
+    oil: np.ndarray,
+    std: np.ndarray
+) -> Tuple[Dict[str, Dict], pd.DataFrame]:
+    """Worker: Marktphasen für einen Block vollständiger Regionen (Spalten)."""
+    price_df = pd.DataFrame(price, columns=regions)
+    oil_df = pd.DataFrame(oil, columns=regions)
+    metrics = compute_phase_metrics_batch(price_df, oil_df)
+
+    results, states = {}, {}
+    for k, region in enumerate(regions):
+        daily = pd.DataFrame({
+            'date': dates,
+            'price_mean': price[:, k],
+            'brent_oil_eur': oil[:, k],
+            'price_std': std[:, k],
+        })
+        for col in METRIC_COLUMNS:
+            daily[col] = metrics[col][:, k]
+        results[region] = build_phase_result(daily)
+        states[region] = daily[STATE_COLUMNS]
+    return results, _with_region(states)
+
+
+def _single_results(
+    region_frames: Dict[str, pd.DataFrame],
+    fuel: str,
+    region_states: Optional[Dict[str, pd.DataFrame]] = None,
+    since: Optional[pd.Timestamp] = None
+) -> Tuple[Dict[str, Dict], pd.DataFrame]:
+    """
+    Worker: Regionen einzeln rechnen - ohne Zustand komplett (Regionen mit
+    Lücken, eigene Datumsachse), mit Zustand nur neue oder geänderte Tage
+    (ab since neu gelesen, siehe update_market_phases).
+    """
+    region_states = region_states or {}
+    results, states = {}, {}
+    for region in sorted(region_frames.keys() | region_states.keys()):
+        state = region_states.get(region)
+        frame = region_frames.get(region)
+        if frame is None:
+            new_days = state.iloc[:0]
+        else:
+            new_days = aggregate_daily(frame, fuel=fuel, region=region)
+        results[region], states[region] = update_market_phases(state, new_days, since=since)
+    return results, _with_region(states)
+
+
+def _collect(tasks) -> Tuple[Dict[str, Dict], pd.DataFrame]:
+    results, states = {}, []
+    for task in concurrent.futures.as_completed(tasks):
+        chunk_results, chunk_state = task.result()
+        results.update(chunk_results)
+        states.append(chunk_state)
+    state = pd.concat(states, ignore_index=True) if states else pd.DataFrame(columns=STATE_COLUMNS)
+    if not state.empty:
+        state = state.sort_values(['region_plz3', 'date'], kind='stable').reset_index(drop=True)
+    return dict(sorted(results.items())), state
+
+
+def build_cube(
+    df: pd.DataFrame,
+    fuel: str,
+    workers: Optional[int] = None
+) -> Tuple[Dict[str, Dict], pd.DataFrame]:
+    """
+    Berechnet calculate_market_phases(df, fuel, region) für alle Regionen,
+    dazu den Zustand für spätere inkrementelle Updates.
+
+    Regionen mit Werten an allen Tagen werden als Matrix gebündelt gerechnet;
+    Regionen mit fehlenden Tagen (eigene, kürzere Zeitachse) einzeln.
+    """
+    filtered = df.loc[df['fuel'] == fuel, INPUT_COLUMNS]
+    grouped = filtered.groupby(['date', 'region_plz3'])
+    agg = grouped.agg({'price_mean': 'mean', 'brent_oil_eur': 'first', 'price_std': 'mean'})
+    present = grouped.size().unstack('region_plz3').notna()
+    wide = agg.unstack('region_plz3').sort_index()
+    present = present.reindex(wide.index)
+
+    dates = wide.index.to_numpy()
+    complete = present.all(axis=0)
+    has_oil = wide['brent_oil_eur'].notna().any(axis=0)
+    batchable = [r for r in present.columns if complete[r] and has_oil[r]] if len(dates) >= 14 else []
+    single = [r for r in present.columns if r not in set(batchable)]
+
+    tasks = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for i in range(0, len(batchable), REGIONS_PER_TASK):
+            chunk = batchable[i:i + REGIONS_PER_TASK]
+            tasks.append(executor.submit(
+                _batch_results, dates, chunk,
+                wide['price_mean'][chunk].to_numpy(dtype=float),
+                wide['brent_oil_eur'][chunk].to_numpy(dtype=float),
+                wide['price_std'][chunk].to_numpy(dtype=float),
+            ))
+        if single:
+            single_df = filtered[filtered['region_plz3'].isin(single)]
+            frames = dict(tuple(single_df.groupby('region_plz3')))
+            for i in range(0, len(single), REGIONS_PER_TASK):
+                chunk = single[i:i + REGIONS_PER_TASK]
+                tasks.append(executor.submit(_single_results, {r: frames[r] for r in chunk}, fuel))
+
+        return _collect(tasks)
+
+
+def update_cube(
+    state: pd.DataFrame,
+    df_new: pd.DataFrame,
+    fuel: str,
+    since: pd.Timestamp,
+    workers: Optional[int] = None
+) -> Tuple[Dict[str, Dict], pd.DataFrame]:
+    """
+    Erweitert einen gespeicherten Würfel-Zustand (df_new enthält alle Zeilen
+    ab since). Pro Region werden nur die Tage ab der ersten Abweichung vom
+    Zustand bzw. die neuen Tage und die globale Klassifikation neu berechnet.
+    """
+    filtered = df_new.loc[df_new['fuel'] == fuel, INPUT_COLUMNS]
+    frames = dict(tuple(filtered.groupby('region_plz3')))
+    states = dict(tuple(state.groupby('region_plz3', sort=False)))
+    regions = sorted(frames.keys() | states.keys())
+
+    tasks = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for i in range(0, len(regions), REGIONS_PER_TASK):
+            chunk = regions[i:i + REGIONS_PER_TASK]
+            tasks.append(executor.submit(
+                _single_results,
+                {r: frames[r] for r in chunk if r in frames},
+                fuel,
+                {r: states[r] for r in chunk if r in states},
+                since,
+            ))
+        return _collect(tasks)
+
+
+# --- Speicherung ------------------------------------------------------------
+
+def write_cube(results: Dict[str, Dict], cache_dir: str, fuel: str):
+    """
+    Zeitreihen als neue Parquet-Datei (nach Region sortiert), danach Phasen/Meta
+    als JSON mit Verweis darauf. Von den älteren Parquet-Dateien bleibt nur die
+    des vorherigen Index liegen, für Leser, die ihn gerade noch verwenden.
+    """
+    previous = [os.path.basename(p) for p in cube_files(cache_dir, fuel)[1:]]
+    timeseries_file = None
+
+    frames = []
+    index = {}
+    n_days = 0
+    for region, result in results.items():
+        if 'error' in result.get('meta', {}):
+            # Sonderfälle (zu wenig Daten / kein Öl) komplett im JSON ablegen
+            index[region] = json.loads(json.dumps(result, default=str))
+            continue
+        ts = pd.DataFrame(result['timeseries'], columns=TIMESERIES_COLUMNS)
+        ts.insert(0, 'region_plz3', region)
+        frames.append(ts)
+        n_days = max(n_days, len(ts))
+        index[region] = {'phases': result['phases'], 'meta': result['meta']}
+
+    if frames:
+        table = pa.Table.from_pandas(pd.concat(frames, ignore_index=True), preserve_index=False)
+        table = table.cast(pa.schema([
+            pa.field(f.name, pa.float64()) if f.name not in ('region_plz3', 'date', 'phase') else f
+            for f in table.schema
+        ]))
+        row_group_size = max(1, n_days * REGIONS_PER_ROW_GROUP)
+        timeseries_file = f'market_phases_cube_{fuel}-{time.time_ns():x}.parquet'
+        atomic_write(os.path.join(cache_dir, timeseries_file), lambda p: pq.write_table(
+            table, p, row_group_size=row_group_size, use_dictionary=['region_plz3', 'date', 'phase']
+        ))
+
+    def dump(p):
+        with open(p, 'w', encoding='utf-8') as f:
+            json.dump({'timeseries_file': timeseries_file, 'regions': index}, f, ensure_ascii=False)
+    atomic_write(index_path(cache_dir, fuel), dump)
+
+    keep = set(previous) | {timeseries_file}
+    for path in glob.glob(os.path.join(cache_dir, f'market_phases_cube_{fuel}*.parquet')):
+        if os.path.basename(path) not in keep:
+            os.remove(path)
+
+
+# --- Lesen (API) ------------------------------------------------------------
+
+class MarketPhaseCube:
+    """Liest vorab berechnete Regions-Marktphasen aus dem Cache-Verzeichnis."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, Dict]] = {}
+
+    def paths(self, fuel: str) -> List[str]:
+        return cube_files(self.cache_dir, fuel)
+
+    def available(self, fuel: str) -> bool:
+        return os.path.exists(index_path(self.cache_dir, fuel))
+
+    def _cube_index(self, fuel: str) -> Dict:
+        mtime = os.stat(index_path(self.cache_dir, fuel)).st_mtime_ns
+        with self._lock:
+            entry = self._index.get(fuel)
+            if entry is not None and entry[0] == mtime:
+                return entry[1]
+        index = read_index(self.cache_dir, fuel)
+        with self._lock:
+            self._index[fuel] = (mtime, index)
+        return index
+
+    def lookup(self, fuel: str, region: str) -> Optional[Dict]:
+        """Ergebnis wie calculate_market_phases(df, fuel, region) oder None."""
+        if not self.available(fuel):
+            return None
+        # Region und Zeitreihen-Datei aus demselben Index: passen immer zusammen
+        index = self._cube_index(fuel)
+        entry = index['regions'].get(region)
+        if entry is None:
+            return None
+        if 'timeseries' in entry:
+            return entry
+
+        table = pq.read_table(
+            os.path.join(self.cache_dir, index['timeseries_file']),
+            columns=TIMESERIES_COLUMNS,
+            filters=[('region_plz3', '=', region)]
+        )
+        timeseries = table.to_pandas().astype(object)
+        timeseries = timeseries.where(timeseries.notna(), None)
+        return {
+            'timeseries': timeseries.to_dict(orient='records'),
+            'phases': entry['phases'],
+            'meta': entry['meta'],
+        }
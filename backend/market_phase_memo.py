@@ -0,0 +1,281 @@
+"""
+Memoisierte Marktphasen-Berechnung für parametrisierte API-Anfragen
+
+Drei Stufen mit eigenen LRU-Caches, begrenzt durch ein Byte-Budget (geschätzter
+Speicherbedarf der Einträge) und jeweils gebunden an die Datenversion (Hash
+über mtime/Größe aller Tagesdateien):
+
+    Tagesreihe   (Version, fuel, region)                 Aggregation über alle Jahre
+    Metriken     + Fenster/Lag-Parameter                 Returns, Z-Scores, Volatilität, Lag
+    Ergebnis     + Schwellen/Perzentile/Intervalle       Klassifikation + Intervalle
+
+Wird nur eine Schwelle verändert, läuft damit nur die günstige Klassifikation.
+Parallele Anfragen mit demselben Schlüssel rechnen jede Stufe nur einmal
+(SingleFlight).
+
+Mit results_dir werden Ergebnisse zusätzlich als JSON-Datei abgelegt (Name aus
+Datenversion + Hash über fuel/region/Parameter). Alle Worker-Prozesse lesen
+sie von dort: ein Ergebnis, das ein Hintergrund-Job in einem Prozess
+berechnet hat, beantwortet die erneute Anfrage in jedem anderen.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from atomic_io import atomic_write
+from data_store import to_pandas
+from single_flight import SingleFlight
+from market_phases import (
+    DAILY_COLUMNS,
+    aggregate_daily,
+    build_phase_result,
+    check_daily,
+    classification_params,
+    compute_phase_metrics,
+    metric_params,
+    normalize_params,
+)
+
+INPUT_COLUMNS = ['fuel', 'region_plz3'] + DAILY_COLUMNS
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def result_bytes(result: Dict) -> int:
+    """
+    Geschätzter Speicherbedarf eines Ergebnis-Dicts: die Zeitreihen-Records
+    dominieren, hochgerechnet aus dem ersten Record (Dict + Werte).
+    """
+    def records_bytes(records: List[Dict]) -> int:
+        if not records:
+            return sys.getsizeof(records)
+        first = records[0]
+        per_record = sys.getsizeof(first) + sum(sys.getsizeof(v) for v in first.values())
+        return sys.getsizeof(records) + len(records) * per_record
+
+    return 1024 + records_bytes(result.get('timeseries') or []) + records_bytes(result.get('phases') or [])
+
+
+class _LRU:
+    """Kleiner threadsicherer LRU-Cache mit Byte-Budget (Größe je Eintrag über sizeof)."""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int]):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Wie get, aber ohne Statistik und LRU-Reihenfolge."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, value: Any):
+        """Speichert value; ein einzelner Eintrag über dem Budget wird gar nicht erst gehalten."""
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def _params_key(params: Mapping[str, Any]) -> Tuple:
+    return tuple(sorted(params.items()))
+
+
+class MarketPhaseMemo:
+    """
+    Marktphasen je (Parameter, fuel, region), neu berechnet sobald sich die Daten ändern.
+    Ein Ergebnis (~2.200 Records) belegt rund 1,7 MB, eine Metrik-Tabelle einige 100 KB.
+    """
+
+    def __init__(
+        self,
+        datasets,
+        max_result_bytes: int = 64 * 1024 * 1024,
+        max_metric_bytes: int = 16 * 1024 * 1024,
+        max_series_bytes: int = 8 * 1024 * 1024,
+        results_dir: Optional[str] = None,
+        max_result_files: int = 256
+    ):
+        self.datasets = datasets
+        self.results_dir = results_dir
+        self.max_result_files = max_result_files
+        self._series = _LRU(max_series_bytes, frame_bytes)
+        self._metrics = _LRU(max_metric_bytes, frame_bytes)
+        self._results = _LRU(max_result_bytes, result_bytes)
+        self._flights = SingleFlight()
+
+    def years(self) -> List[int]:
+        return self.datasets.available_years('daily')
+
+    def paths(self) -> List[str]:
+        return [path for y in self.years() for path in self.datasets.files('daily', y)]
+
+    def data_version(self) -> str:
+        """Hash über Version (mtime, Größe) aller Tagesdateien."""
+        h = hashlib.sha1()
+        for year in self.years():
+            h.update(f'{year}:{self.datasets.version("daily", year)};'.encode())
+        return h.hexdigest()[:16]
+
+    def _result_path(self, version: str, fuel: str, region: Optional[str], params: Dict) -> Optional[str]:
+        if self.results_dir is None:
+            return None
+        digest = hashlib.sha1(repr((fuel, region, _params_key(params))).encode()).hexdigest()[:24]
+        return os.path.join(self.results_dir, f'{version}_{digest}.json')
+
+    def _load_result(self, path: Optional[str]) -> Optional[Dict]:
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _store_result(self, path: str, version: str, result: Dict):
+        """Schreibt das Ergebnis; entfernt ältere Datenversionen und die ältesten über max_result_files."""
+        def dump(p):
+            with open(p, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+        atomic_write(path, dump, suffix='.json.tmp', prefix='.')
+
+        files = []
+        for other in glob.glob(os.path.join(self.results_dir, '*.json')):
+            if os.path.basename(other).startswith(f'{version}_'):
+                files.append(other)
+            else:
+                _remove(other)
+        if len(files) > self.max_result_files:
+            files.sort(key=_mtime)
+            for other in files[:len(files) - self.max_result_files]:
+                _remove(other)
+
+    def _cached(self, cache: _LRU, stage: str, key: Tuple, compute) -> Any:
+        """LRU-Treffer oder einmalige (koaleszierte) Berechnung der Stufe."""
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        def run():
+            # Inzwischen von einem gerade beendeten Aufruf gefüllt?
+            value = cache.peek(key)
+            if value is None:
+                value = compute()
+                cache.put(key, value)
+            return value
+        return self._flights.do((stage,) + key, run)
+
+    def _daily(self, version: str, fuel: str, region: Optional[str]) -> pd.DataFrame:
+        def compute():
+            # Ein Scan über alle Jahre: nur die Partition des Kraftstoffs und die
+            # benötigten Spalten werden gelesen, nur passende Zeilen werden zu Pandas
+            df = to_pandas(self.datasets.scan(
+                'daily', self.years(), fuels=[fuel], regions=[region] if region else None,
+                columns=INPUT_COLUMNS
+            ))
+            return aggregate_daily(df, fuel=fuel, region=region)
+        return self._cached(self._series, 'series', (version, fuel, region), compute)
+
+    def _phase_metrics(self, version: str, fuel: str, region: Optional[str], params: Dict) -> pd.DataFrame:
+        metric = metric_params(params)
+
+        def compute():
+            return compute_phase_metrics(self._daily(version, fuel, region).copy(), **metric)
+        return self._cached(self._metrics, 'metrics', (version, fuel, region, _params_key(metric)), compute)
+
+    def get(self, fuel: str, region: Optional[str] = None, params: Optional[Mapping[str, Any]] = None) -> Dict:
+        """Wie calculate_market_phases(df, fuel, region, params) über alle Tagesdateien."""
+        params = normalize_params(params)
+        region = region or None
+        version = self.data_version()
+
+        path = self._result_path(version, fuel, region, params)
+
+        def compute():
+            # Von einem anderen Prozess berechnet?
+            result = self._load_result(path)
+            if result is not None:
+                return result
+            daily = self._daily(version, fuel, region)
+            result = check_daily(daily.copy())
+            if result is None:
+                metrics = self._phase_metrics(version, fuel, region, params)
+                result = build_phase_result(metrics.copy(), **classification_params(params))
+            else:
+                # Sonderfälle enthalten Timestamps: wie aus der Datei gelesen ausliefern
+                result = json.loads(json.dumps(result, default=str))
+            if path is not None:
+                self._store_result(path, version, result)
+            return result
+        return self._cached(self._results, 'results', (version, fuel, region, _params_key(params)), compute)
+
+    def cached(self, fuel: str, region: Optional[str] = None, params: Optional[Mapping[str, Any]] = None) -> bool:
+        """True, wenn get() ohne Berechnung antworten kann (Ergebnis-Cache oder Ergebnis-Datei)."""
+        params = normalize_params(params)
+        region = region or None
+        version = self.data_version()
+        if self._results.peek((version, fuel, region, _params_key(params))) is not None:
+            return True
+        path = self._result_path(version, fuel, region, params)
+        return path is not None and os.path.exists(path)
+
+    def stats(self) -> Dict:
+        return {
+            'series': self._series.stats(),
+            'metrics': self._metrics.stats(),
+            'results': self._results.stats(),
+            'coalesced': self._flights.shared,
+        }
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
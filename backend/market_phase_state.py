@@ -0,0 +1,115 @@
+"""
+Zustand für inkrementelle Marktphasen-Updates
+
+Speichert je Kraftstoff die Tagesreihen samt fensterbasierter Metriken
+(market_phases.STATE_COLUMNS), damit ein nächtlicher Lauf nur die neuen Tage
+einlesen und anhängen muss statt die komplette Historie neu zu rechnen:
+
+    cache/market_phases_state_{fuel}.parquet        Deutschland gesamt
+    cache/market_phases_cube_state_{fuel}.parquet   je PLZ3-Region (Spalte region_plz3)
+
+In den Metadaten der Datei steht die Version (mtime, Größe) der Tagesdateien
+jedes Jahres zum Zeitpunkt der Berechnung. Hat sich ein Jahr seither geändert
+(z.B. eine korrigierte Preisdatei neu eingelesen), wird es komplett neu
+gelesen und mit dem Zustand verglichen, siehe reread_from.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import dataset_layout
+from atomic_io import atomic_write
+
+VERSIONS_KEY = b'tankdaten_data_versions'
+
+
+def state_path(cache_dir: str, fuel: str, regional: bool = False) -> str:
+    name = 'market_phases_cube_state' if regional else 'market_phases_state'
+    return os.path.join(cache_dir, f'{name}_{fuel}.parquet')
+
+
+def data_versions(data_dir: str, years: List[int]) -> Dict[str, str]:
+    """Version der Tagesdateien je Jahr: neueste mtime_ns und Gesamtgröße."""
+    versions = {}
+    for year in years:
+        stats = [os.stat(path) for path in dataset_layout.year_files(data_dir, 'daily', year)]
+        if stats:
+            versions[str(year)] = f'{max(st.st_mtime_ns for st in stats)}:{sum(st.st_size for st in stats)}'
+    return versions
+
+
+def load_state(path: str) -> Optional[pd.DataFrame]:
+    """Gespeicherter Zustand oder None (dann muss komplett gerechnet werden)."""
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def load_versions(path: str) -> Optional[Dict[str, str]]:
+    """Datenversionen, mit denen der Zustand berechnet wurde (None, wenn unbekannt)."""
+    if not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    if VERSIONS_KEY not in metadata:
+        return None
+    return json.loads(metadata[VERSIONS_KEY])
+
+
+def save_state(state: pd.DataFrame, path: str, versions: Dict[str, str]):
+    """Schreibt atomar (temp-Datei + rename), zusammen mit den Datenversionen."""
+    table = pa.Table.from_pandas(state, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[VERSIONS_KEY] = json.dumps(versions).encode()
+    table = table.replace_schema_metadata(metadata)
+    atomic_write(path, lambda p: pq.write_table(table, p), suffix='.parquet.tmp')
+
+
+def last_date(state: Optional[pd.DataFrame]) -> Optional[pd.Timestamp]:
+    """Letzter enthaltener Tag (None ohne Zustand)."""
+    if state is None or state.empty:
+        return None
+    return state['date'].max()
+
+
+def reread_from(
+    last: pd.Timestamp,
+    stored: Optional[Dict[str, str]],
+    current: Dict[str, str]
+) -> pd.Timestamp:
+    """
+    Erster Tag, ab dem die Tagesdaten gelesen werden müssen: der Tag nach dem
+    Zustand, oder der 1. Januar des ersten Jahres bis einschließlich last,
+    dessen Dateien sich seit der Berechnung geändert haben (ohne gespeicherte
+    Versionen: alle Jahre).
+    """
+    start = last + pd.Timedelta(days=1)
+    if stored is None:
+        changed = [int(y) for y in current]
+    else:
+        changed = [int(y) for y in stored.keys() | current.keys() if stored.get(y) != current.get(y)]
+    changed = [y for y in changed if y <= last.year]
+    if changed:
+        start = min(start, pd.Timestamp(year=min(changed), month=1, day=1))
+    return start
+
+
+def read_daily(
+    data_dir: str,
+    years: List[int],
+    columns: List[str],
+    start: Optional[pd.Timestamp] = None,
+    fuels: Optional[List[str]] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Liest die Tagesdaten aller Jahre als ein Dataset, optional nur Tage ab
+    `start` und nur bestimmte Kraftstoffe (None, wenn keine Daten vorhanden).
+    """
+    table = dataset_layout.read(
+        data_dir, 'daily', years, fuels=fuels, date_from=start, columns=columns
+    )
+    return table.to_pandas() if table is not None else None
@@ -0,0 +1,154 @@
+"""
+Ausschnitt, Ausdünnung und Spaltenformat für Marktphasen-Antworten
+
+Die vollständige Antwort enthält ~2.200 Tageswerte mit je 11 Feldern. Für die
+Darstellung reicht meist ein Zeitraum mit wenigen hundert Punkten:
+
+- from/to:     Tage außerhalb des Zeitraums entfallen; Phasen-Intervalle, die
+               den Zeitraum berühren, bleiben unverändert (exakte Grenzen)
+- max_points:  Largest-Triangle-Three-Buckets auf price_mean, erhält Spitzen
+               und Verlauf der Kurve
+- columns:     nur ausgewählte Zeitreihen-Felder
+- layout=columns: Zeitreihe spaltenweise, Datum als start + count (+ offsets
+               in Tagen, falls nicht jeder Tag enthalten ist)
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from market_phases import TIMESERIES_COLUMNS
+
+LAYOUTS = ('records', 'columns')
+MIN_POINTS = 3
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indizes der von Largest-Triangle-Three-Buckets gewählten Punkte (aufsteigend)."""
+    n = len(x)
+    if n_out >= n or n_out < MIN_POINTS:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Fläche des Dreiecks (letzter Punkt, Kandidat, Mittel des nächsten Buckets)
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        out[i + 1] = a
+    out[-1] = n - 1
+    return out
+
+
+def _day_numbers(dates: List[str]) -> np.ndarray:
+    return np.array(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def _overlaps(interval: Dict, date_from: Optional[str], date_to: Optional[str]) -> bool:
+    if date_from and interval['end_date'] < date_from:
+        return False
+    if date_to and interval['start_date'] > date_to:
+        return False
+    return True
+
+
+def shape_result(
+    result: Dict,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    max_points: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+    layout: str = 'records'
+) -> Dict:
+    """
+    Wendet Zeitraum, Ausdünnung, Feldauswahl und Layout auf ein Ergebnis von
+    calculate_market_phases an. Ungültige Angaben -> ValueError.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout} (expected one of {', '.join(LAYOUTS)})")
+    if max_points is not None and max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    if columns is not None:
+        unknown = [c for c in columns if c not in TIMESERIES_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    fields = ['date'] + [c for c in (columns or TIMESERIES_COLUMNS) if c != 'date']
+
+    # Sonderfälle (zu wenig Daten / kein Öl) unverändert
+    if 'error' in result.get('meta', {}):
+        return result
+
+    records = result['timeseries']
+    if date_from or date_to:
+        records = [
+            r for r in records
+            if (not date_from or r['date'] >= date_from) and (not date_to or r['date'] <= date_to)
+        ]
+    phases = [p for p in result['phases'] if _overlaps(p, date_from, date_to)]
+
+    if max_points is not None and len(records) > max_points:
+        price = np.array([r['price_mean'] for r in records], dtype=float)
+        valid = np.flatnonzero(np.isfinite(price))
+        x = _day_numbers([records[i]['date'] for i in valid]).astype(float)
+        keep = valid[lttb_indices(x, price[valid], max_points)]
+        records = [records[i] for i in keep]
+
+    meta = dict(result['meta'])
+    meta['n_points'] = len(records)
+
+    if layout == 'records':
+        if fields != TIMESERIES_COLUMNS:
+            records = [{f: r[f] for f in fields} for r in records]
+        return {'timeseries': records, 'phases': phases, 'meta': meta}
+
+    timeseries = {'start': records[0]['date'] if records else None, 'count': len(records)}
+    if records:
+        days = _day_numbers([r['date'] for r in records])
+        offsets = days - days[0]
+        if not np.array_equal(offsets, np.arange(len(records))):
+            timeseries['offsets'] = offsets.tolist()
+    for f in fields[1:]:
+        timeseries[f] = [r[f] for r in records]
+    meta['layout'] = 'columns'
+    return {'timeseries': timeseries, 'phases': phases, 'meta': meta}
+
+
+class ResultFiles:
+    """Geparste Ergebnis-Dateien (market_phases_{fuel}.json), neu gelesen bei Änderung."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[int, Dict]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str) -> Dict:
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry[0] == mtime:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        with self._lock:
+            self._files[path] = (mtime, result)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._files), 'hits': self.hits, 'misses': self.misses}
@@ -6,9 +6,81 @@ Berechnet zeitliche Marktphasen basierend auf Tank- und Ölpreisdynamik:
 - INTERNE_FAKTOREN: Preisänderungen durch regionale oder interne Faktoren (hohe Volatilität)
 """
 
+import warnings
+
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Optional, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Any, List, Dict, Mapping, Optional, Tuple
+
+# Standard-Parameter der Erkennung (überschreibbar über die API)
+DEFAULT_PARAMS = {
+    'smooth_window': 7,             # Glättung der Returns (Tage)
+    'vol_window': 14,               # Rollende Volatilität (Tage)
+    'corr_window': 14,              # Fenster der Lag-Korrelation (Tage)
+    'max_lag': 7,                   # Größter geprüfter Lag (Tage)
+    'asymmetry_threshold': 1.3,     # |zp - zo_lagged| ab dem ASYMMETRIE gilt
+    'correlation_threshold': 0.5,   # Korrelation unter der INTERNE_FAKTOREN möglich sind
+    'vol_ratio_threshold': 2.0,     # vp / vo ab dem INTERNE_FAKTOREN gelten
+    'vp_percentile': 80,            # Perzentil "hohe Tankpreis-Volatilität"
+    'vo_percentile': 40,            # Perzentil "ruhiger Ölpreis"
+    'max_gap': 2,                   # Intervalle mit Abstand <= max_gap Tage fusionieren
+    'min_days': 5,                  # Kürzere Intervalle verwerfen
+}
+
+# Parameter der Metrik-Stufe (Returns, Z-Scores, Volatilität, Lag-Korrelation);
+# alle übrigen betreffen nur die günstige Klassifikation
+METRIC_PARAMS = ('smooth_window', 'vol_window', 'corr_window', 'max_lag')
+
+PARAM_RANGES = {
+    'smooth_window': (2, 90),
+    'vol_window': (2, 90),
+    'corr_window': (3, 90),
+    'max_lag': (0, 30),
+    'asymmetry_threshold': (0.0, 10.0),
+    'correlation_threshold': (-1.0, 1.0),
+    'vol_ratio_threshold': (0.0, 100.0),
+    'vp_percentile': (0, 100),
+    'vo_percentile': (0, 100),
+    'max_gap': (0, 60),
+    'min_days': (1, 365),
+}
+
+
+def normalize_params(values: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Vollständiger, typisierter Parametersatz (Defaults + Überschreibungen).
+    Unbekannte Schlüssel werden ignoriert, ungültige Werte -> ValueError.
+    """
+    params = dict(DEFAULT_PARAMS)
+    for name, value in (values or {}).items():
+        if name not in DEFAULT_PARAMS or value is None or value == '':
+            continue
+        kind = type(DEFAULT_PARAMS[name])
+        try:
+            number = float(value)
+            if kind is int:
+                if not number.is_integer():
+                    raise ValueError
+                number = int(number)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {name}: {value!r}")
+        low, high = PARAM_RANGES[name]
+        if not low <= number <= high:
+            raise ValueError(f"{name} must be between {low} and {high}")
+        params[name] = number
+
+    if params['max_lag'] > params['corr_window'] - 2:
+        raise ValueError("max_lag must be at most corr_window - 2")
+    return params
+
+
+def metric_params(params: Mapping[str, Any]) -> Dict[str, Any]:
+    return {name: params[name] for name in METRIC_PARAMS}
+
+
+def classification_params(params: Mapping[str, Any]) -> Dict[str, Any]:
+    return {name: value for name, value in params.items() if name not in METRIC_PARAMS}
 
 
 def calculate_log_returns(series: pd.Series) -> pd.Series:
@@ -34,6 +106,73 @@ def calculate_rolling_volatility(returns: pd.Series, window: int = 14) -> pd.Ser
     return returns.rolling(window=window, min_periods=window).std()
 
 
+def rolling_pearson(a: np.ndarray, b: np.ndarray, window: int) -> np.ndarray:
+    """
+    Rollende Pearson-Korrelation über alle Fenster der Länge `window` (entlang Achse 0).
+
+    Ergebnis[e] = Korrelation von a[e-window+1:e+1] und b[e-window+1:e+1] (NaN für
+    e < window-1). Rechnet exakt wie np.corrcoef (Mittelwert, Skalarprodukt per
+    BLAS, Division durch die Standardabweichungen), daher bitgleich zu Series.corr.
+    Fenster mit NaN werden wie in Series.corr paarweise bereinigt.
+    """
+    n = a.shape[0]
+    out = np.full(a.shape, np.nan)
+    if n < window:
+        return out
+
+    # (n-window+1, [k,] window), zusammenhängend für identische Summationsreihenfolge
+    wa = np.ascontiguousarray(sliding_window_view(a, window, axis=0))
+    wb = np.ascontiguousarray(sliding_window_view(b, window, axis=0))
+
+    fact = np.true_divide(1, window - 1.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ca = wa - wa.mean(axis=-1, keepdims=True)
+        cb = wb - wb.mean(axis=-1, keepdims=True)
+        c_ab = np.matmul(ca[..., None, :], cb[..., :, None])[..., 0, 0] * fact
+        c_aa = np.matmul(ca[..., None, :], ca[..., :, None])[..., 0, 0] * fact
+        c_bb = np.matmul(cb[..., None, :], cb[..., :, None])[..., 0, 0] * fact
+        rho = np.clip(c_ab / np.sqrt(c_aa) / np.sqrt(c_bb), -1, 1)
+
+    # Fenster mit fehlenden Werten: paarweise bereinigt wie pandas' nancorr
+    has_nan = np.isnan(wa).any(axis=-1) | np.isnan(wb).any(axis=-1)
+    for pos in zip(*np.nonzero(has_nan)):
+        xa, xb = wa[pos], wb[pos]
+        valid = ~np.isnan(xa) & ~np.isnan(xb)
+        if not valid.any():
+            rho[pos] = np.nan
+            continue
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            rho[pos] = np.corrcoef(xa[valid], xb[valid])[0, 1]
+
+    out[window - 1:] = rho
+    return out
+
+
+def rolling_lag_correlations(
+    zp: np.ndarray,
+    zo: np.ndarray,
+    window: int = 14,
+    max_lag: int = 7
+) -> np.ndarray:
+    """
+    Korrelationen für alle Lags auf einmal: Ergebnis[lag, t].
+
+    Wie die ursprüngliche Schleife mit Series.corr: die Fenster zp[t-13:t] und
+    zo[t-13-lag:t-lag] werden über den Index ausgerichtet, korreliert wird also
+    zp mit zo über die Überlappung [t-window+1, t-lag] (Länge window-lag).
+    """
+    n = zp.shape[0]
+    out = np.full((max_lag + 1,) + zp.shape, np.nan)
+    for lag in range(0, max_lag + 1):
+        length = window - lag
+        if length < 1:
+            continue
+        rho = rolling_pearson(zp, zo, length)
+        out[lag, lag:] = rho[:n - lag]
+    return out
+
+
 def find_best_lag_correlation(
     zp: pd.Series, 
     zo: pd.Series, 
@@ -44,132 +183,140 @@ def find_best_lag_correlation(
     Findet für jeden Zeitpunkt den Lag mit maximaler Korrelation.
     Returns: (best_correlation, best_lag)
     """
-    n = len(zp)
-    best_corr = pd.Series(np.nan, index=zp.index)
-    best_lag = pd.Series(np.nan, index=zp.index)
-    
-    for i in range(window + max_lag, n):
-        max_rho = -np.inf
-        max_l = 0
-        
-        for lag in range(0, max_lag + 1):
-            # zp[t-13:t] korreliert mit zo[t-13-lag:t-lag]
-            zp_window = zp.iloc[i - window + 1:i + 1]
-            zo_window = zo.iloc[i - window + 1 - lag:i + 1 - lag]
-            
-            if len(zp_window) == window and len(zo_window) == window:
-                rho = zp_window.corr(zo_window)
-                if not pd.isna(rho) and rho > max_rho:
-                    max_rho = rho
-                    max_l = lag
-        
-        if max_rho > -np.inf:
-            best_corr.iloc[i] = max_rho
-            best_lag.iloc[i] = max_l
-    
+    corr, lag = best_lag_arrays(
+        zp.to_numpy(dtype=float), zo.to_numpy(dtype=float), window, max_lag
+    )
+    return pd.Series(corr, index=zp.index), pd.Series(lag, index=zp.index)
+
+
+def best_lag_arrays(
+    zp: np.ndarray,
+    zo: np.ndarray,
+    window: int = 14,
+    max_lag: int = 7
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Array-Variante von find_best_lag_correlation (1D oder 2D mit Regionen als Spalten).
+    Bei Gleichstand gewinnt der kleinste Lag, NaN-Korrelationen werden ignoriert.
+    """
+    n = zp.shape[0]
+    best_corr = np.full(zp.shape, np.nan)
+    best_lag = np.full(zp.shape, np.nan)
+    start = window + max_lag
+    if n <= start:
+        return best_corr, best_lag
+
+    corr = rolling_lag_correlations(zp, zo, window, max_lag)[:, start:]
+    valid = ~np.isnan(corr)
+    any_valid = valid.any(axis=0)
+    # argmax liefert den ersten (kleinsten) Lag mit maximalem Wert
+    lag = np.argmax(np.where(valid, corr, -np.inf), axis=0)
+    rho = np.take_along_axis(corr, lag[None, ...], axis=0)[0]
+
+    best_corr[start:] = np.where(any_valid, rho, np.nan)
+    best_lag[start:] = np.where(any_valid, lag, np.nan)
     return best_corr, best_lag
 
 
-def classify_phase(
-    row: pd.Series,
-    vp_percentile_80: float,
-    vo_percentile_40: float
-) -> str:
+def lagged_values(zo: np.ndarray, best_lag: np.ndarray) -> np.ndarray:
+    """zo_lagged[t] = zo[t - best_lag[t]] (NaN ohne Lag oder vor Reihenbeginn)"""
+    n = len(zo)
+    valid = ~np.isnan(best_lag)
+    src = np.arange(n) - np.where(valid, best_lag, 0).astype(np.int64)
+    valid &= src >= 0
+    out = np.full(n, np.nan)
+    out[valid] = zo[src[valid]]
+    return out
+
+
+def classify_phases(
+    df: pd.DataFrame,
+    vp_high: float,
+    vo_low: float,
+    asymmetry_threshold: float = 1.3,
+    correlation_threshold: float = 0.5,
+    vol_ratio_threshold: float = 2.0
+) -> np.ndarray:
     """
-    Klassifiziert Marktphase basierend auf Metriken.
+    Klassifiziert Marktphasen für alle Tage auf einmal.
     Priorität: ASYMMETRIE > INTERNE_FAKTOREN > KEINE
     """
-    # Extrahiere Werte
-    rho = row.get('best_correlation', np.nan)
-    lag = row.get('best_lag', np.nan)
-    zp = row.get('zp', np.nan)
-    zo_lagged = row.get('zo_lagged', np.nan)
-    vp = row.get('vp', np.nan)
-    vo = row.get('vo', np.nan)
-    vol_ratio = row.get('vol_ratio', np.nan)
-    
-    # Prüfe auf fehlende Werte
-    if pd.isna(vp) or pd.isna(vo):
-        return 'KEINE'
-    
+    rho = df['best_correlation'].to_numpy(dtype=float)
+    zp = df['zp'].to_numpy(dtype=float)
+    zo_lagged = df['zo_lagged'].to_numpy(dtype=float)
+    vp = df['vp'].to_numpy(dtype=float)
+    vo = df['vo'].to_numpy(dtype=float)
+    vol_ratio = df['vol_ratio'].to_numpy(dtype=float)
+
+    # Fehlende Werte -> KEINE
+    missing = np.isnan(vp) | np.isnan(vo)
+
     # 0. Sicherheits-Check Korrelation
-    if pd.isna(rho):
-        rho = 0
-    
-    # 1. ASYMMETRIE
-    if not pd.isna(zp) and not pd.isna(zo_lagged):
-        diff = zp - zo_lagged
-        if abs(diff) >= 1.3:  # Höhere Schwelle für weniger Rauschen
-            return 'ASYMMETRIE'
-    
-    # 2. INTERNE_FAKTOREN 
-    # Wenn die Korrelation sinkt UND der Tankpreis springt (oder Öl stabil ist)
-    if rho < 0.5:
-        if vol_ratio >= 2.0 or (vp >= vp_percentile_80 and vo <= vo_percentile_40):
-            return 'INTERNE_FAKTOREN'
-    
-    return 'KEINE'
+    rho = np.where(np.isnan(rho), 0, rho)
+
+    with np.errstate(invalid='ignore'):
+        # 1. ASYMMETRIE (höhere Schwelle für weniger Rauschen)
+        asymmetry = np.abs(zp - zo_lagged) >= asymmetry_threshold
+
+        # 2. INTERNE_FAKTOREN
+        # Wenn die Korrelation sinkt UND der Tankpreis springt (oder Öl stabil ist)
+        internal = (rho < correlation_threshold) & (
+            (vol_ratio >= vol_ratio_threshold) | ((vp >= vp_high) & (vo <= vo_low))
+        )
+
+    return np.select(
+        [missing, asymmetry, internal],
+        ['KEINE', 'ASYMMETRIE', 'INTERNE_FAKTOREN'],
+        default='KEINE'
+    ).astype(object)
+
+
+def _format_dates(dates: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates.dt.strftime('%Y-%m-%d').to_numpy()
+    return dates.astype(str).to_numpy()
 
 
 def group_phases_to_intervals(df: pd.DataFrame) -> List[Dict]:
-    """Gruppiert aufeinanderfolgende Tage gleicher Phase zu Intervallen"""
+    """Gruppiert aufeinanderfolgende Tage gleicher Phase zu Intervallen (Run-Length-Encoding)"""
     if df.empty or 'phase' not in df.columns:
         return []
-    
+
+    phase = df['phase'].to_numpy()
+    n = len(phase)
+    boundaries = np.flatnonzero(phase[1:] != phase[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [n]))
+
+    keep = phase[starts] != 'KEINE'
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return []
+
+    dates = _format_dates(df['date'])
+
+    # NaN zählt nicht zur Summe (x + 0.0 == x), Summation wie gehabt sequentiell
+    metrics = {}
+    for key, col in (('correlation', 'best_correlation'), ('lag', 'best_lag'), ('vol_ratio', 'vol_ratio')):
+        if col in df.columns:
+            values = df[col].to_numpy(dtype=float)
+            metrics[key] = np.where(np.isnan(values), 0.0, values)
+        else:
+            metrics[key] = np.zeros(n)
+
     intervals = []
-    current_phase = None
-    start_date = None
-    end_date = None
-    metrics_sum = {'correlation': 0, 'lag': 0, 'vol_ratio': 0}
-    count = 0
-    
-    for idx, row in df.iterrows():
-        date = row['date']
-        phase = row['phase']
-        
-        if phase != current_phase:
-            # Speichere vorheriges Intervall
-            if current_phase is not None and current_phase != 'KEINE':
-                intervals.append({
-                    'phase': current_phase,
-                    'start_date': start_date.strftime('%Y-%m-%d') if hasattr(start_date, 'strftime') else str(start_date),
-                    'end_date': end_date.strftime('%Y-%m-%d') if hasattr(end_date, 'strftime') else str(end_date),
-                    'duration_days': count,
-                    'avg_correlation': metrics_sum['correlation'] / max(count, 1),
-                    'avg_lag': metrics_sum['lag'] / max(count, 1),
-                    'avg_vol_ratio': metrics_sum['vol_ratio'] / max(count, 1)
-                })
-            
-            # Starte neues Intervall
-            current_phase = phase
-            start_date = date
-            end_date = date
-            metrics_sum = {'correlation': 0, 'lag': 0, 'vol_ratio': 0}
-            count = 0
-        
-        end_date = date
-        count += 1
-        
-        # Sammle Metriken
-        if not pd.isna(row.get('best_correlation')):
-            metrics_sum['correlation'] += row.get('best_correlation', 0)
-        if not pd.isna(row.get('best_lag')):
-            metrics_sum['lag'] += row.get('best_lag', 0)
-        if not pd.isna(row.get('vol_ratio')):
-            metrics_sum['vol_ratio'] += row.get('vol_ratio', 0)
-    
-    # Letztes Intervall
-    if current_phase is not None and current_phase != 'KEINE':
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        count = e - s
         intervals.append({
-            'phase': current_phase,
-            'start_date': start_date.strftime('%Y-%m-%d') if hasattr(start_date, 'strftime') else str(start_date),
-            'end_date': end_date.strftime('%Y-%m-%d') if hasattr(end_date, 'strftime') else str(end_date),
+            'phase': phase[s],
+            'start_date': dates[s],
+            'end_date': dates[e - 1],
             'duration_days': count,
-            'avg_correlation': metrics_sum['correlation'] / max(count, 1),
-            'avg_lag': metrics_sum['lag'] / max(count, 1),
-            'avg_vol_ratio': metrics_sum['vol_ratio'] / max(count, 1)
+            'avg_correlation': np.cumsum(metrics['correlation'][s:e])[-1] / count,
+            'avg_lag': np.cumsum(metrics['lag'][s:e])[-1] / count,
+            'avg_vol_ratio': np.cumsum(metrics['vol_ratio'][s:e])[-1] / count
         })
-    
+
     return intervals
 
 
@@ -177,22 +324,25 @@ def merge_close_intervals(intervals: List[Dict], max_gap: int = 1) -> List[Dict]
     """Fusioniert Intervalle gleicher Phase, deren Abstand <= max_gap Tage beträgt"""
     if len(intervals) < 2:
         return intervals
-    
+
+    # Tage als Integer (Tage seit Epoche) statt wiederholtem Datums-Parsing
+    start_days = np.array([i['start_date'] for i in intervals], dtype='datetime64[D]').astype(np.int64)
+    end_days = np.array([i['end_date'] for i in intervals], dtype='datetime64[D]').astype(np.int64)
+
     merged = []
     current = intervals[0].copy()
+    current_end = end_days[0]
     
     for i in range(1, len(intervals)):
         next_interval = intervals[i]
         
         if next_interval['phase'] == current['phase']:
-            # Berechne Abstand
-            current_end = pd.to_datetime(current['end_date'])
-            next_start = pd.to_datetime(next_interval['start_date'])
-            gap = (next_start - current_end).days
+            gap = start_days[i] - current_end
             
             if gap <= max_gap + 1:  # +1 weil end_date inklusive
                 # Fusionieren
                 current['end_date'] = next_interval['end_date']
+                current_end = end_days[i]
                 total_days = current['duration_days'] + next_interval['duration_days']
                 # Gewichteter Durchschnitt der Metriken
                 w1 = current['duration_days']
@@ -205,6 +355,7 @@ def merge_close_intervals(intervals: List[Dict], max_gap: int = 1) -> List[Dict]
         
         merged.append(current)
         current = next_interval.copy()
+        current_end = end_days[i]
     
     merged.append(current)
     return merged
@@ -215,23 +366,18 @@ def filter_short_intervals(intervals: List[Dict], min_days: int = 5) -> List[Dic
     return [i for i in intervals if i['duration_days'] >= min_days]
 
 
-def calculate_market_phases(
+TIMESERIES_COLUMNS = [
+    'date', 'price_mean', 'price_std', 'price_ma7', 'brent_oil_eur', 'phase',
+    'vp', 'vo', 'vol_ratio', 'best_correlation', 'best_lag'
+]
+
+
+def aggregate_daily(
     df: pd.DataFrame,
     fuel: str = 'e10',
     region: Optional[str] = None
-) -> Dict:
-    """
-    Hauptfunktion: Berechnet Marktphasen für gegebene Daten.
-    
-    Args:
-        df: DataFrame mit date, fuel, price_mean, brent_oil_eur
-        fuel: Kraftstoffart (e5, e10, diesel)
-        region: Optional PLZ3-Region
-    
-    Returns:
-        Dict mit timeseries, phases, meta
-    """
-    # 1. Daten filtern
+) -> pd.DataFrame:
+    """Filtert Kraftstoff/Region und aggregiert auf eine Zeile pro Tag."""
     filtered = df[df['fuel'] == fuel].copy()
     if region:
         filtered = filtered[filtered['region_plz3'] == region]
@@ -243,8 +389,11 @@ def calculate_market_phases(
         'price_std': 'mean'
     }).reset_index()
     
-    daily = daily.sort_values('date').reset_index(drop=True)
-    
+    return daily.sort_values('date').reset_index(drop=True)
+
+
+def check_daily(daily: pd.DataFrame) -> Optional[Dict]:
+    """Ergebnis für unzureichende Daten, sonst None."""
     # Prüfe Mindestdaten
     if len(daily) < 14:
         return {
@@ -262,60 +411,242 @@ def calculate_market_phases(
             'phases': [],
             'meta': {'oil_available': False, 'error': 'Keine Ölpreisdaten verfügbar'}
         }
-    
+    return None
+
+
+def compute_phase_metrics(
+    daily: pd.DataFrame,
+    smooth_window: int = 7,
+    vol_window: int = 14,
+    corr_window: int = 14,
+    max_lag: int = 7
+) -> pd.DataFrame:
+    """Schritte 2-6: Returns, Glättung, Z-Scores, Volatilität, Lag-Korrelation."""
     # 2. Log-Returns berechnen
     daily['rp'] = calculate_log_returns(daily['price_mean'])
     daily['ro'] = calculate_log_returns(daily['brent_oil_eur'])
     
     # 3. Glätten (7 Tage)
-    daily['rp_smooth'] = smooth_returns(daily['rp'], window=7)
-    daily['ro_smooth'] = smooth_returns(daily['ro'], window=7)
+    daily['rp_smooth'] = smooth_returns(daily['rp'], window=smooth_window)
+    daily['ro_smooth'] = smooth_returns(daily['ro'], window=smooth_window)
     
     # 4. Z-Scores
     daily['zp'] = calculate_zscore(daily['rp_smooth'])
     daily['zo'] = calculate_zscore(daily['ro_smooth'])
     
     # 5. Rollende Volatilität (14 Tage)
-    daily['vp'] = calculate_rolling_volatility(daily['rp'], window=14)
-    daily['vo'] = calculate_rolling_volatility(daily['ro'], window=14)
+    daily['vp'] = calculate_rolling_volatility(daily['rp'], window=vol_window)
+    daily['vo'] = calculate_rolling_volatility(daily['ro'], window=vol_window)
     daily['vol_ratio'] = daily['vp'] / (daily['vo'] + 0.0001)
     
     # 6. Lag-Korrelation
-    best_corr, best_lag = find_best_lag_correlation(daily['zp'], daily['zo'], window=14, max_lag=7)
+    best_corr, best_lag = find_best_lag_correlation(
+        daily['zp'], daily['zo'], window=corr_window, max_lag=max_lag
+    )
     daily['best_correlation'] = best_corr
     daily['best_lag'] = best_lag
     
     # Berechne zo_lagged basierend auf bestem Lag
-    daily['zo_lagged'] = daily.apply(
-        lambda row: daily['zo'].shift(int(row['best_lag'])).loc[row.name] 
-        if not pd.isna(row['best_lag']) else np.nan,
-        axis=1
+    daily['zo_lagged'] = lagged_values(daily['zo'].to_numpy(dtype=float), best_lag.to_numpy())
+    return daily
+
+
+def compute_phase_metrics_batch(
+    price: pd.DataFrame,
+    oil: pd.DataFrame
+) -> Dict[str, np.ndarray]:
+    """
+    Schritte 2-6 für viele Regionen gleichzeitig (Datum x Region, eine Spalte je Region).
+
+    Rolling-Fenster und Lag-Korrelation laufen gebündelt über alle Spalten;
+    globale Größen (Std der Z-Scores) werden spaltenweise wie bei einer
+    einzelnen Reihe berechnet, das Ergebnis ist daher identisch zu
+    compute_phase_metrics pro Region.
+    """
+    rp = calculate_log_returns(price)
+    ro = calculate_log_returns(oil)
+    rp_smooth = smooth_returns(rp, window=7)
+    ro_smooth = smooth_returns(ro, window=7)
+
+    zp = pd.DataFrame({c: calculate_zscore(rp_smooth[c]) for c in rp_smooth.columns})
+    zo = pd.DataFrame({c: calculate_zscore(ro_smooth[c]) for c in ro_smooth.columns})
+
+    vp = calculate_rolling_volatility(rp, window=14)
+    vo = calculate_rolling_volatility(ro, window=14)
+    vol_ratio = vp / (vo + 0.0001)
+
+    zp_arr = zp.to_numpy(dtype=float)
+    zo_arr = zo.to_numpy(dtype=float)
+    best_corr, best_lag = best_lag_arrays(zp_arr, zo_arr, window=14, max_lag=7)
+    zo_lagged = np.column_stack([
+        lagged_values(zo_arr[:, k], best_lag[:, k]) for k in range(zo_arr.shape[1])
+    ]) if zo_arr.shape[1] else np.empty(zo_arr.shape)
+
+    return {
+        'rp': rp.to_numpy(dtype=float),
+        'ro': ro.to_numpy(dtype=float),
+        'rp_smooth': rp_smooth.to_numpy(dtype=float),
+        'ro_smooth': ro_smooth.to_numpy(dtype=float),
+        'zp': zp_arr,
+        'zo': zo_arr,
+        'vp': vp.to_numpy(dtype=float),
+        'vo': vo.to_numpy(dtype=float),
+        'vol_ratio': vol_ratio.to_numpy(dtype=float),
+        'best_correlation': best_corr,
+        'best_lag': best_lag,
+        'zo_lagged': zo_lagged,
+    }
+
+
+DAILY_COLUMNS = ['date', 'price_mean', 'brent_oil_eur', 'price_std']
+
+# Gespeicherter Zustand für inkrementelle Updates (zp/zo/zo_lagged werden daraus abgeleitet)
+STATE_COLUMNS = DAILY_COLUMNS + [
+    'rp', 'ro', 'rp_smooth', 'ro_smooth', 'vp', 'vo', 'vol_ratio', 'best_correlation', 'best_lag'
+]
+
+# Vorlauf für die Neuberechnung am Ende: Lag-Fenster (14 + 7) auf
+# geglätteten Returns (7) aus Log-Returns (1)
+INCREMENTAL_CONTEXT_DAYS = 14 + 7 + 7 + 1
+
+
+def extend_phase_metrics(daily: pd.DataFrame, new_days: pd.DataFrame) -> pd.DataFrame:
+    """
+    Inkrementelle Variante von compute_phase_metrics: hängt neue Tage an einen
+    gespeicherten Zustand (STATE_COLUMNS) an.
+
+    Fensterbasierte Größen (Returns, Glättung, Volatilität, Lag-Korrelation)
+    werden nur für die neuen Tage samt INCREMENTAL_CONTEXT_DAYS Vorlauf
+    berechnet. Die globalen Z-Score-Standardabweichungen werden über die
+    gespeicherten Reihen neu bestimmt; die Korrelation ist skalierungsinvariant,
+    ältere Lag-Ergebnisse bleiben daher gültig.
+
+    Das Ergebnis entspricht compute_phase_metrics über alle Tage bis auf
+    Rundung: die Summationsreihenfolge ändert sich, die Metriken weichen um
+    etwa 1e-13 ab (relativ), die daraus klassifizierten Phasen nicht.
+    """
+    new_days = new_days.loc[new_days['date'] > daily['date'].iloc[-1], DAILY_COLUMNS]
+    n_new = len(new_days)
+
+    tail = pd.concat(
+        [daily[DAILY_COLUMNS].iloc[-INCREMENTAL_CONTEXT_DAYS:], new_days], ignore_index=True
     )
-    
+    tail['rp'] = calculate_log_returns(tail['price_mean'])
+    tail['ro'] = calculate_log_returns(tail['brent_oil_eur'])
+    tail['rp_smooth'] = smooth_returns(tail['rp'], window=7)
+    tail['ro_smooth'] = smooth_returns(tail['ro'], window=7)
+    tail['vp'] = calculate_rolling_volatility(tail['rp'], window=14)
+    tail['vo'] = calculate_rolling_volatility(tail['ro'], window=14)
+    tail['vol_ratio'] = tail['vp'] / (tail['vo'] + 0.0001)
+
+    daily = pd.concat([daily[STATE_COLUMNS], tail.iloc[len(tail) - n_new:]], ignore_index=True)
+    daily['zp'] = calculate_zscore(daily['rp_smooth'])
+    daily['zo'] = calculate_zscore(daily['ro_smooth'])
+
+    zp = daily['zp'].to_numpy(dtype=float)
+    zo = daily['zo'].to_numpy(dtype=float)
+    best_corr, best_lag = best_lag_arrays(zp[-len(tail):], zo[-len(tail):], window=14, max_lag=7)
+    for col, values in (('best_correlation', best_corr), ('best_lag', best_lag)):
+        column = daily[col].to_numpy(dtype=float, copy=True)
+        column[len(daily) - n_new:] = values[len(tail) - n_new:]
+        daily[col] = column
+
+    daily['zo_lagged'] = lagged_values(zo, daily['best_lag'].to_numpy())
+    return daily
+
+
+def first_changed_day(stored: pd.DataFrame, fresh: pd.DataFrame) -> Optional[pd.Timestamp]:
+    """
+    Erster Tag, an dem sich zwei Tagesreihen (DAILY_COLUMNS) unterscheiden:
+    abweichende Werte oder ein Tag, der nur in einer der Reihen vorkommt.
+    None, wenn beide gleich sind.
+    """
+    merged = stored[DAILY_COLUMNS].merge(
+        fresh[DAILY_COLUMNS], on='date', how='outer', suffixes=('_old', '_new'), indicator=True
+    )
+    differs = (merged['_merge'] != 'both').to_numpy(copy=True)
+    for col in DAILY_COLUMNS[1:]:
+        old = merged[f'{col}_old'].to_numpy(dtype=float)
+        new = merged[f'{col}_new'].to_numpy(dtype=float)
+        differs |= ~np.isclose(old, new, rtol=1e-12, atol=0.0, equal_nan=True)
+    if not differs.any():
+        return None
+    return merged.loc[differs, 'date'].min()
+
+
+def update_market_phases(
+    state: Optional[pd.DataFrame],
+    new_days: pd.DataFrame,
+    since: Optional[pd.Timestamp] = None
+) -> Tuple[Dict, pd.DataFrame]:
+    """
+    Ergebnis wie calculate_market_phases über (Zustand + neue Tage), bis auf
+    Rundung der Metriken (siehe extend_phase_metrics), und der neue Zustand. Ohne verwertbaren Zustand (fehlt / zu wenig Daten) wird
+    komplett gerechnet.
+
+    since: new_days enthält alle Tage ab since, neu gelesen. Weichen
+    gespeicherte Tage ab since davon ab (korrigierte oder entfernte Daten),
+    wird der Zustand ab dem ersten abweichenden Tag verworfen und neu gerechnet.
+    """
+    new_days = new_days[DAILY_COLUMNS]
+    if state is not None and since is not None:
+        changed = first_changed_day(state[state['date'] >= since], new_days)
+        if changed is not None:
+            state = state[state['date'] < changed].reset_index(drop=True)
+    if state is not None and check_daily(state[DAILY_COLUMNS]) is None:
+        daily = extend_phase_metrics(state, new_days)
+    else:
+        if state is not None and len(state):
+            new_days = pd.concat(
+                [state[DAILY_COLUMNS], new_days[new_days['date'] > state['date'].iloc[-1]]],
+                ignore_index=True
+            )
+        daily = new_days.sort_values('date').reset_index(drop=True)
+        insufficient = check_daily(daily)
+        if insufficient is not None:
+            return insufficient, daily
+        daily = compute_phase_metrics(daily)
+
+    return build_phase_result(daily), daily[STATE_COLUMNS]
+
+
+def build_phase_result(
+    daily: pd.DataFrame,
+    vp_percentile: float = 80,
+    vo_percentile: float = 40,
+    asymmetry_threshold: float = 1.3,
+    correlation_threshold: float = 0.5,
+    vol_ratio_threshold: float = 2.0,
+    max_gap: int = 2,
+    min_days: int = 5
+) -> Dict:
+    """Schritte 7-13: Klassifikation, Intervalle und JSON-Aufbereitung."""
     # 7. Perzentile für Klassifikation
-    vp_p80 = daily['vp'].quantile(0.80)
-    vo_p40 = daily['vo'].quantile(0.40)
+    vp_p80 = daily['vp'].quantile(vp_percentile / 100)
+    vo_p40 = daily['vo'].quantile(vo_percentile / 100)
     
     # 8. Phasenklassifikation
-    daily['phase'] = daily.apply(
-        lambda row: classify_phase(row, vp_p80, vo_p40),
-        axis=1
+    daily['phase'] = classify_phases(
+        daily, vp_p80, vo_p40,
+        asymmetry_threshold=asymmetry_threshold,
+        correlation_threshold=correlation_threshold,
+        vol_ratio_threshold=vol_ratio_threshold
     )
     
     # 9. Intervalle erstellen
     intervals = group_phases_to_intervals(daily)
     
     # 10. Fusionieren (Abstand ≤ 2 Tage für aggressiveres Merging)
-    intervals = merge_close_intervals(intervals, max_gap=2)
+    intervals = merge_close_intervals(intervals, max_gap=max_gap)
     
     # 11. Kurze Intervalle entfernen (< 5 Tage)
-    intervals = filter_short_intervals(intervals, min_days=5)
+    intervals = filter_short_intervals(intervals, min_days=min_days)
     
     # 12. 7-Tage gleitenden Durchschnitt für Visualisierung berechnen
     daily['price_ma7'] = daily['price_mean'].rolling(window=7, min_periods=1).mean()
     
     # 13. Aufbereiten für JSON-Response
-    timeseries = daily[['date', 'price_mean', 'price_std', 'price_ma7', 'brent_oil_eur', 'phase', 'vp', 'vo', 'vol_ratio', 'best_correlation', 'best_lag']].copy()
+    timeseries = daily[TIMESERIES_COLUMNS].copy()
     timeseries['date'] = timeseries['date'].astype(str)
     
     # NaN durch None ersetzen für JSON
@@ -331,3 +662,33 @@ def calculate_market_phases(
             'vo_percentile_40': float(vo_p40) if not pd.isna(vo_p40) else None
         }
     }
+
+
+def calculate_market_phases(
+    df: pd.DataFrame,
+    fuel: str = 'e10',
+    region: Optional[str] = None,
+    params: Optional[Mapping[str, Any]] = None
+) -> Dict:
+    """
+    Hauptfunktion: Berechnet Marktphasen für gegebene Daten.
+    
+    Args:
+        df: DataFrame mit date, fuel, price_mean, brent_oil_eur
+        fuel: Kraftstoffart (e5, e10, diesel)
+        region: Optional PLZ3-Region
+        params: Optional abweichende Parameter (siehe DEFAULT_PARAMS)
+    
+    Returns:
+        Dict mit timeseries, phases, meta
+    """
+    params = normalize_params(params)
+    # 1. Daten filtern und pro Tag aggregieren
+    daily = aggregate_daily(df, fuel=fuel, region=region)
+    
+    insufficient = check_daily(daily)
+    if insufficient is not None:
+        return insufficient
+    
+    daily = compute_phase_metrics(daily, **metric_params(params))
+    return build_phase_result(daily, **classification_params(params))
@@ -0,0 +1,210 @@
+"""
+Latenz- und Cache-Metriken im Prometheus-Textformat (ohne Zusatzabhängigkeit)
+
+- Histogramme pro Route: Gesamtdauer und Phasen (load / compute / serialize),
+  die Phasen misst die Route selbst mit `with phase('load'): ...`
+- Gesendete Bytes pro Route
+- Collector-Funktionen liefern beim Abruf aktuelle Zählerstände (Cache-Treffer,
+  Verdrängungen, Speicherverbrauch, ...) aus den stats() der Komponenten
+- Eine strukturierte Log-Zeile (key=value) pro Anfrage
+
+Die Werte sind prozesslokal: mit mehreren Worker-Prozessen liefert jeder
+Scrape den Stand des Workers, der die Anfrage beantwortet.
+"""
+
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (Labels, Wert) bzw. eine komplette Metrik-Familie aus einem Collector
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+log = logging.getLogger('tankdaten.requests')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _value(v: float) -> str:
+    if math.isnan(v):
+        return 'NaN'
+    if math.isinf(v):
+        return '+Inf' if v > 0 else '-Inf'
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(dict(zip(self.labelnames, key)))} {_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # key -> (Zähler je Bucket, Summe, Anzahl)
+        self._values: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, key))
+                for bound, n in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{_labels({**labels, "le": _value(bound)})} {n}')
+                lines.append(f'{self.name}_bucket{_labels({**labels, "le": "+Inf"})} {count}')
+                lines.append(f'{self.name}_sum{_labels(labels)} {_value(total)}')
+                lines.append(f'{self.name}_count{_labels(labels)} {count}')
+        return lines
+
+
+class Registry:
+    """Sammlung aller Metriken eines Prozesses."""
+
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(self.prefix + name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(self.prefix + name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[Family]]):
+        """fn() liefert beim Abruf (name, typ, hilfe, [(labels, wert), ...]); als Dekorator nutzbar."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            for name, kind, help, samples in fn():
+                name = self.prefix + name
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(f'{name}{_labels(labels)} {_value(value)}' for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def phase(name: str):
+    """Misst eine Phase der aktuellen Anfrage (mehrfach aufrufbar, Zeiten addieren sich)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = g.setdefault('metric_phases', {})
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def instrument(app: Flask, registry: Registry, path: str = '/api/metrics'):
+    """Misst jede Anfrage der App und stellt die Registry unter path bereit."""
+    duration = registry.histogram(
+        'request_duration_seconds', 'Request latency by route', ('route', 'method', 'status'))
+    phases = registry.histogram(
+        'request_phase_seconds', 'Time spent per request phase (load, compute, serialize)', ('route', 'phase'))
+    sent = registry.counter('response_bytes_total', 'Response body bytes sent by route', ('route',))
+
+    @app.before_request
+    def _start_timer():
+        g.metric_start = time.perf_counter()
+
+    @app.after_request
+    def _record(response: Response) -> Response:
+        start = g.get('metric_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        duration.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        measured = g.get('metric_phases', {})
+        for name, seconds in measured.items():
+            phases.observe(seconds, route=route, phase=name)
+        # Gestreamte Antworten (NDJSON, SSE) haben keine Länge
+        size = response.content_length
+        if size:
+            sent.inc(size, route=route)
+
+        fields = ' '.join(f'{name}_ms={seconds * 1000:.1f}' for name, seconds in measured.items())
+        log.info('request method=%s path=%s route=%s status=%s duration_ms=%.1f bytes=%s %s',
+                 request.method, request.path, route, response.status_code,
+                 elapsed * 1000, size if size is not None else '-', fields)
+        return response
+
+    @app.route(path)
+    def get_metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def process_resident_bytes() -> float:
+    """Resident Set Size des Prozesses (Linux /proc, sonst Spitzenwert via resource, sonst NaN)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+    except ImportError:
+        return float('nan')
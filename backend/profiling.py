@@ -0,0 +1,122 @@
+"""
+Profiling einzelner Anfragen (nur wenn per Umgebung freigeschaltet)
+
+    PROFILE_REQUESTS=1   Schalter; ohne ihn werden ?profile / X-Profile ignoriert
+    PROFILE_DIR=...      optional: jede Messung zusätzlich als .prof-Datei ablegen
+                         (auswertbar mit python -m pstats oder snakeviz)
+    PROFILE_TOP=40       Anzahl der gemeldeten Funktionen
+
+Eine Anfrage mit ?profile=1 oder dem Header X-Profile: 1 läuft unter cProfile.
+Statt der eigentlichen Antwort kommt ein JSON-Bericht mit Status, Größe und den
+Funktionen mit der höchsten kumulierten Zeit zurück (market_phases.py, pandas,
+pyarrow, ...). Teure Berechnungen laufen dabei im Request-Thread statt als
+Hintergrund-Job, damit sie im Profil erscheinen.
+
+Profilierte Anfragen laufen nacheinander (ein Profiler zur Zeit).
+"""
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import Flask, Response, g, jsonify, request
+
+ENABLED = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get('PROFILE_DIR') or None
+TOP = int(os.environ.get('PROFILE_TOP', 40))
+HEADER = 'X-Profile'
+
+_lock = threading.Lock()
+
+
+def requested() -> bool:
+    """True, wenn die aktuelle Anfrage profiliert werden soll (und darf)."""
+    if not ENABLED:
+        return False
+    flag = request.args.get('profile') or request.headers.get(HEADER)
+    return flag is not None and flag.lower() in ('1', 'true', 'yes')
+
+
+def active() -> bool:
+    """True, solange die aktuelle Anfrage unter dem Profiler läuft."""
+    return g.get('profiler') is not None
+
+
+def _short_path(path: str) -> str:
+    marker = 'site-packages' + os.sep
+    if marker in path:
+        return path.split(marker, 1)[1]
+    base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.relpath(path, base) if path.startswith(base) else path
+
+
+def top_frames(stats: pstats.Stats, limit: int = TOP) -> List[Dict]:
+    """Funktionen nach kumulierter Zeit absteigend."""
+    stats.sort_stats('cumulative')
+    frames = []
+    for func in stats.fcn_list[:limit]:
+        primitive, total, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        frames.append({
+            'function': name if filename == '~' else f'{_short_path(filename)}:{line}({name})',
+            'calls': total if total == primitive else f'{total}/{primitive}',
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6),
+        })
+    return frames
+
+
+def _dump(profiler: cProfile.Profile) -> Optional[str]:
+    if not PROFILE_DIR:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unmatched'}-{os.getpid()}.prof"
+    path = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(path)
+    return path
+
+
+def install(app: Flask):
+    """Registriert den Profiler-Hook (ohne PROFILE_REQUESTS ohne Wirkung)."""
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _start_profiler():
+        if not requested():
+            return
+        _lock.acquire()
+        g.profile_start = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @app.after_request
+    def _profile_report(response: Response) -> Response:
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        elapsed = time.perf_counter() - g.profile_start
+        path = _dump(profiler)
+        report = {
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'bytes': response.content_length,
+            'duration_ms': round(elapsed * 1000, 1),
+            'file': path,
+            'frames': top_frames(pstats.Stats(profiler)),
+        }
+        response = jsonify(report)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @app.teardown_request
+    def _release_profiler(exc=None):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+        if g.pop('profile_start', None) is not None:
+            _lock.release()
@@ -0,0 +1,132 @@
+"""
+Räumlicher Index für /api/data/history
+
+Pro Jahr (und Datenversion) einmalig aufgebaut:
+- die eindeutigen PLZ3-Zentroide in einem gleichmäßigen Gitter (Bucket = Bounding-Box-Größe),
+- vorberechnete Summen/Anzahlen von price_mean je Zentroid × Monat × Kraftstoff.
+
+Eine Abfrage ist damit eine Nachbarschaftssuche über wenige Buckets plus ein
+Slice der Aggregate - unabhängig von der Anzahl Tageszeilen.
+"""
+
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from single_flight import SingleFlight
+
+BBOX_SIZE = 1.0        # Grad um den Klickpunkt
+MIN_TOLERANCE = 0.5    # Mindest-Suchradius
+TOLERANCE_MARGIN = 0.1 # Radius = max(MIN_TOLERANCE, nächster Abstand + MARGIN)
+
+COLUMNS = ['lat', 'lon', 'date', 'fuel', 'price_mean']
+
+
+class RegionHistoryIndex:
+    """Zentroid-Gitter + Monats-Aggregate eines Jahres."""
+
+    def __init__(self, df: pd.DataFrame):
+        df = df[COLUMNS].dropna(subset=['lat', 'lon'])
+        month = pd.to_datetime(df['date']).dt.month.to_numpy() - 1
+
+        points, point_idx = np.unique(df[['lat', 'lon']].to_numpy(), axis=0, return_inverse=True)
+        self.fuels, fuel_idx = np.unique(df['fuel'].to_numpy().astype(str), return_inverse=True)
+        self.lat = points[:, 0]
+        self.lon = points[:, 1]
+
+        shape = (len(points), 12, len(self.fuels))
+        flat = np.ravel_multi_index((point_idx.ravel(), month, fuel_idx.ravel()), shape)
+        price = df['price_mean'].to_numpy(dtype=float)
+        valid = ~np.isnan(price)
+        size = int(np.prod(shape))
+
+        # rows: Zeilen überhaupt vorhanden, counts/sums: nur gültige Preise (wie groupby.mean)
+        self.rows = np.bincount(flat, minlength=size).reshape(shape)
+        self.counts = np.bincount(flat[valid], minlength=size).reshape(shape)
+        self.sums = np.bincount(flat[valid], weights=price[valid], minlength=size).reshape(shape)
+
+        self._buckets: Dict[Tuple[int, int], np.ndarray] = {}
+        cells = np.floor(points / BBOX_SIZE).astype(int)
+        order = np.lexsort((cells[:, 1], cells[:, 0]))
+        keys, starts = np.unique(cells[order], axis=0, return_index=True)
+        for key, chunk in zip(map(tuple, keys), np.split(order, starts[1:])):
+            self._buckets[key] = chunk
+
+    def _candidates(self, lat: float, lon: float) -> np.ndarray:
+        """Alle Zentroide innerhalb der Bounding-Box um (lat, lon)."""
+        lat_cells = range(int(np.floor((lat - BBOX_SIZE) / BBOX_SIZE)), int(np.floor((lat + BBOX_SIZE) / BBOX_SIZE)) + 1)
+        lon_cells = range(int(np.floor((lon - BBOX_SIZE) / BBOX_SIZE)), int(np.floor((lon + BBOX_SIZE) / BBOX_SIZE)) + 1)
+        chunks = [self._buckets[(i, j)] for i in lat_cells for j in lon_cells if (i, j) in self._buckets]
+        if not chunks:
+            return np.empty(0, dtype=int)
+        idx = np.concatenate(chunks)
+        in_box = (
+            (self.lat[idx] >= lat - BBOX_SIZE) & (self.lat[idx] <= lat + BBOX_SIZE) &
+            (self.lon[idx] >= lon - BBOX_SIZE) & (self.lon[idx] <= lon + BBOX_SIZE)
+        )
+        return idx[in_box]
+
+    def query(self, lat: float, lon: float) -> pd.DataFrame:
+        """Monatlicher Durchschnittspreis je Kraftstoff der Regionen um (lat, lon)."""
+        idx = self._candidates(lat, lon)
+        if len(idx) == 0:
+            return pd.DataFrame()
+
+        dist = ((self.lat[idx] - lat) ** 2 + (self.lon[idx] - lon) ** 2) ** 0.5
+        tolerance = max(MIN_TOLERANCE, dist.min() + TOLERANCE_MARGIN)
+        idx = idx[dist <= tolerance]
+        if len(idx) == 0:
+            return pd.DataFrame()
+
+        rows = self.rows[idx].sum(axis=0)
+        counts = self.counts[idx].sum(axis=0)
+        sums = self.sums[idx].sum(axis=0)
+
+        months = np.flatnonzero(rows.any(axis=1))
+        fuels = np.flatnonzero(rows.any(axis=0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts, np.nan)
+
+        pivot = pd.DataFrame(means[np.ix_(months, fuels)], columns=self.fuels[fuels].tolist())
+        pivot.insert(0, 'month', months + 1)
+        return pivot
+
+
+class RegionIndexCache:
+    """Ein Index pro Jahr, neu gebaut sobald sich die Quelldatei ändert."""
+
+    def __init__(self, datasets):
+        self.datasets = datasets
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._indexes: Dict[int, Tuple[Tuple[int, int], RegionHistoryIndex]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, year: int) -> RegionHistoryIndex:
+        version = self.datasets.version('daily', year)
+        with self._lock:
+            entry = self._indexes.get(year)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+
+        return self._flights.do((year, version), lambda: self._build(year, version))
+
+    def _build(self, year: int, version: Tuple[int, int]) -> RegionHistoryIndex:
+        with self._lock:
+            entry = self._indexes.get(year)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            self.misses += 1
+        index = RegionHistoryIndex(self.datasets.frame('daily', year, columns=COLUMNS))
+        with self._lock:
+            self._indexes[year] = (version, index)
+        return index
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._indexes), 'hits': self.hits, 'misses': self.misses,
+                    'coalesced': self._flights.shared}
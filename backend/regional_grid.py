@@ -0,0 +1,157 @@
+"""
+Regionales Preis-Raster (Heatmap) für /api/data/regional
+
+Rastert die monatlichen Median-Preise der PLZ3-Zentroide per Nearest Neighbor
+auf ein dichtes 0.1°-Gitter über Deutschland. Wird sowohl vom Skript
+scripts/prepare_regional.py als auch vom API-Server bei einem Cache-Miss
+genutzt (Write-Through nach cache/regional_{year}.json).
+"""
+
+import json
+import os
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from atomic_io import atomic_write
+from http_cache import ensure_gzip
+from single_flight import SingleFlight
+
+# Grid Configuration
+GRID_STEP = 0.1
+MAX_DISTANCE = 0.8  # Grad (~80km), weiter entfernte Zellen bleiben leer
+
+REQUIRED_COLUMNS = ['date', 'price_mean', 'lat', 'lon', 'fuel']
+
+
+def build_regional_grid(df: pd.DataFrame, year: int) -> Optional[List[Dict]]:
+    """Berechnet die dichten Rasterzellen eines Jahres (None, wenn keine Daten)."""
+    if any(c not in df.columns for c in REQUIRED_COLUMNS):
+        return None
+
+    df = df[REQUIRED_COLUMNS].copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df = df[df['date'].dt.year == year]
+    if df.empty:
+        return None
+
+    # 1. Real Data (PLZ-3 Centroids)
+    df['month'] = df['date'].dt.month
+
+    # Aggregate MEDIAN price per location/month/fuel (User requirement)
+    agg_long = df.groupby(['month', 'lat', 'lon', 'fuel'])['price_mean'].median().reset_index()
+
+    # Pivot to Wide
+    real_points_df = agg_long.pivot_table(index=['month', 'lat', 'lon'], columns='fuel', values='price_mean').reset_index()
+
+    # Ensure columns exist
+    for c in ['e5', 'e10', 'diesel']:
+        if c not in real_points_df.columns:
+            real_points_df[c] = None
+
+    # 2. Generate Target Grid (Dense)
+    lat_range = np.arange(47.0, 56.0 + GRID_STEP, GRID_STEP)
+    lon_range = np.arange(5.0, 16.0 + GRID_STEP, GRID_STEP)
+    grid_lat, grid_lon = np.meshgrid(lat_range, lon_range, indexing='ij')
+    flat_glat = grid_lat.ravel()
+    flat_glon = grid_lon.ravel()
+    target_coords = np.column_stack((flat_glat, flat_glon))  # (M, 2)
+
+    final_rows = []
+    months = sorted(real_points_df['month'].unique())
+
+    for m in months:
+        # Get real points for this month
+        mpoints = real_points_df[real_points_df['month'] == m]
+        if mpoints.empty:
+            continue
+
+        # Convert to numpy for fast distance calc
+        src_coords = mpoints[['lat', 'lon']].values
+        src_e5 = mpoints['e5'].values
+        src_e10 = mpoints['e10'].values
+        src_diesel = mpoints['diesel'].values
+
+        dists_sq = np.sum((target_coords[:, np.newaxis, :] - src_coords[np.newaxis, :, :]) ** 2, axis=2)
+        min_indices = np.argmin(dists_sq, axis=1)  # (M,) indices of closest source
+        min_dists = np.sqrt(np.min(dists_sq, axis=1))  # (M,) degrees
+
+        # Filter Max Distance to avoid outlier projection
+        valid_indices = np.where(min_dists < MAX_DISTANCE)[0]
+
+        sel_e5 = src_e5[min_indices]
+        sel_e10 = src_e10[min_indices]
+        sel_diesel = src_diesel[min_indices]
+
+        for idx in valid_indices:
+            # Ensure native types and finite values
+            mlat = float(flat_glat[idx])
+            mlon = float(flat_glon[idx])
+
+            if not np.isfinite(mlat) or not np.isfinite(mlon):
+                continue
+
+            final_rows.append({
+                'month': int(m),
+                'lat': mlat,
+                'lon': mlon,
+                'e5': _finite_or_none(sel_e5[idx]),
+                'e10': _finite_or_none(sel_e10[idx]),
+                'diesel': _finite_or_none(sel_diesel[idx])
+            })
+
+    return final_rows
+
+
+def _finite_or_none(value) -> Optional[float]:
+    if value is None or not np.isfinite(value):
+        return None
+    return float(value)
+
+
+def cache_path(cache_dir: str, year: int) -> str:
+    return os.path.join(cache_dir, f'regional_{year}.json')
+
+
+def write_regional_cache(rows: List[Dict], out_file: str):
+    """Schreibt atomar (temp-Datei + rename), Leser sehen nie eine halbe Datei."""
+    def dump(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(rows, f)
+    atomic_write(out_file, dump, suffix='.json.tmp')
+    ensure_gzip(out_file)
+
+
+class RegionalGridBuilder:
+    """
+    Baut fehlende regional_{year}.json genau einmal. Parallele Anfragen für
+    dasselbe Jahr warten auf den laufenden Build statt selbst zu rechnen.
+    """
+
+    def __init__(self, cache_dir: str, load_daily: Callable[[int], pd.DataFrame]):
+        self.cache_dir = cache_dir
+        self.load_daily = load_daily
+        self._flights = SingleFlight()
+        self.builds = 0
+
+    def ensure(self, year: int) -> Optional[str]:
+        """Pfad der Cache-Datei (None, wenn für das Jahr keine Daten existieren)."""
+        out_file = cache_path(self.cache_dir, year)
+        if os.path.exists(out_file):
+            return out_file
+        return self._flights.do(year, lambda: self._build(year, out_file))
+
+    def _build(self, year: int, out_file: str) -> Optional[str]:
+        # Inzwischen von einem gerade beendeten Build geschrieben?
+        if os.path.exists(out_file):
+            return out_file
+        self.builds += 1
+        rows = build_regional_grid(self.load_daily(year), year)
+        if rows is None:
+            return None
+        write_regional_cache(rows, out_file)
+        return out_file
+
+    def stats(self) -> Dict:
+        return {'builds': self.builds, 'coalesced': self._flights.shared}
@@ -0,0 +1,81 @@
+"""
+Antwortformate für tabellarische API-Routen
+
+- JSON (Standard)
+- NDJSON-Streaming (?format=ndjson bzw. Accept: application/x-ndjson):
+  Record-Batches fester Größe werden nacheinander serialisiert, der
+  Speicherverbrauch bleibt konstant.
+- Arrow IPC Stream (?format=arrow bzw. Accept: application/vnd.apache.arrow.stream):
+  die spaltenorientierten Puffer gehen ohne Umweg über Zeilen-Objekte raus.
+"""
+
+from typing import Iterator, Union
+
+import pandas as pd
+import pyarrow as pa
+from flask import Response, current_app, jsonify, request
+
+from data_store import to_pandas
+
+JSON_MIMETYPE = 'application/json'
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson')
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+NDJSON_BATCH_ROWS = 5000
+
+FORMATS = ('json', 'ndjson', 'arrow')
+
+
+def negotiate_format() -> str:
+    """'json', 'ndjson' oder 'arrow' - ?format hat Vorrang vor dem Accept-Header."""
+    fmt = request.args.get('format', type=str)
+    if fmt and fmt.lower() in FORMATS:
+        return fmt.lower()
+    # JSON zuerst, damit */* beim Standardformat bleibt
+    best = request.accept_mimetypes.best_match(
+        (JSON_MIMETYPE,) + NDJSON_MIMETYPES + (ARROW_STREAM_MIMETYPE,)
+    )
+    if best in NDJSON_MIMETYPES:
+        return 'ndjson'
+    if best == ARROW_STREAM_MIMETYPE:
+        return 'arrow'
+    return 'json'
+
+
+def as_table(data: Union[pa.Table, pd.DataFrame]) -> pa.Table:
+    if isinstance(data, pa.Table):
+        return data
+    return pa.Table.from_pandas(data, preserve_index=False)
+
+
+def iter_ndjson(table: pa.Table, dumps, batch_rows: int = NDJSON_BATCH_ROWS) -> Iterator[str]:
+    """Eine Zeile JSON pro Datensatz, je Batch ein Chunk."""
+    for batch in table.to_batches(max_chunksize=batch_rows):
+        yield ''.join(dumps(row) + '\n' for row in batch.to_pylist())
+
+
+def ndjson_response(data: Union[pa.Table, pd.DataFrame]) -> Response:
+    table = as_table(data)
+    # Serializer jetzt binden - der Generator läuft nach Ende des Request-Kontexts
+    return Response(
+        iter_ndjson(table, current_app.json.dumps),
+        mimetype=NDJSON_MIMETYPES[0]
+    )
+
+
+def arrow_response(data: Union[pa.Table, pd.DataFrame]) -> Response:
+    table = as_table(data)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), mimetype=ARROW_STREAM_MIMETYPE)
+
+
+def tabular_response(data: Union[pa.Table, pd.DataFrame]) -> Response:
+    """Wählt das Antwortformat anhand von ?format bzw. Accept-Header."""
+    fmt = negotiate_format()
+    if fmt == 'ndjson':
+        return ndjson_response(data)
+    if fmt == 'arrow':
+        return arrow_response(data)
+    df = to_pandas(data) if isinstance(data, pa.Table) else data
+    return jsonify(df.to_dict(orient='records'))
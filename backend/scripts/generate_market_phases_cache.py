@@ -3,22 +3,34 @@ Cache-Generator für Marktphasen-Daten
 
 Erstellt vorab-berechnete JSON-Dateien für alle Kraftstoffarten,
 um die Ladezeiten im Frontend drastisch zu reduzieren.
+
+Mit --incremental werden nur die Tage nach dem gespeicherten Zustand
+(cache/market_phases_state_{fuel}.parquet) gelesen und angehängt. Jahre,
+deren Dateien sich seit dem letzten Lauf geändert haben, werden komplett
+neu gelesen; abweichende Tage werden ab dem ersten Unterschied neu berechnet.
 """
 
 import os
 import sys
 import json
+import argparse
+
+import pandas as pd
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pandas as pd
-from market_phases import calculate_market_phases
+from market_phases import DAILY_COLUMNS, aggregate_daily, update_market_phases
+from market_phase_state import (
+    data_versions, last_date, load_state, load_versions, read_daily, reread_from, save_state, state_path
+)
+from http_cache import ensure_gzip
+import dataset_layout
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
 CACHE_DIR = os.path.join(DATA_DIR, 'cache')
 
-def generate_market_phases_cache():
+def generate_market_phases_cache(incremental=False):
     """Generiert Cache-Dateien für alle Kraftstoffarten."""
     
     print("=" * 50)
@@ -28,43 +40,61 @@ def generate_market_phases_cache():
     # Ensure cache directory exists
     os.makedirs(CACHE_DIR, exist_ok=True)
     
-    # Load all years (2019-2024)
-    years = [2019, 2020, 2021, 2022, 2023, 2024]
-    dfs = []
+    fuel_types = ['e5', 'e10', 'diesel']
     
-    print("\n📂 Lade Parquet-Dateien...")
-    for year in years:
-        file_path = os.path.join(DATA_DIR, f'data_daily_{year}.parquet')
-        if os.path.exists(file_path):
-            print(f"  ✓ {year}")
-            df_year = pd.read_parquet(file_path)
-            dfs.append(df_year)
+    # Alle vorhandenen Jahre und ihre aktuelle Version
+    years = dataset_layout.available_years(DATA_DIR, 'daily')
+    versions = data_versions(DATA_DIR, years)
+    
+    # Gespeicherter Zustand: nur neue Tage und geänderte Jahre müssen gelesen werden
+    states = {fuel: None for fuel in fuel_types}
+    since = None
+    if incremental:
+        paths = {fuel: state_path(CACHE_DIR, fuel) for fuel in fuel_types}
+        states = {fuel: load_state(path) for fuel, path in paths.items()}
+        if all(state is not None for state in states.values()):
+            since = min(
+                reread_from(last_date(states[fuel]), load_versions(paths[fuel]), versions)
+                for fuel in fuel_types
+            )
+            print(f"\n♻️  Inkrementell ab {since.date()}")
         else:
-            print(f"  ✗ {year} (nicht gefunden)")
+            print("\n⚠️  Kein vollständiger Zustand gefunden, berechne komplett")
+            states = {fuel: None for fuel in fuel_types}
+    
+    if since is not None:
+        years = [year for year in years if year >= since.year]
     
-    if not dfs:
-        print("\n❌ Keine Daten gefunden!")
-        return
+    print("\n📂 Lade Parquet-Dateien...")
+    for year in years:
+        print(f"  ✓ {year}")
     
-    # Combine all years
-    df = pd.concat(dfs, ignore_index=True)
+    # Alle Jahre als ein Dataset: nur die benötigten Spalten und Tage werden gelesen
+    columns = ['fuel'] + DAILY_COLUMNS
+    df = read_daily(DATA_DIR, years, columns=columns, start=since, fuels=fuel_types)
+    if df is None:
+        if since is None:
+            print("\n❌ Keine Daten gefunden!")
+            return
+        df = pd.DataFrame(columns=columns)
     print(f"\n📊 Gesamtdaten: {len(df):,} Zeilen")
     
     # Generate cache for each fuel type (Germany-wide, no region filter)
-    fuel_types = ['e5', 'e10', 'diesel']
-    
     print("\n🔄 Berechne Marktphasen...")
     for fuel in fuel_types:
         print(f"\n  Kraftstoff: {fuel.upper()}")
         
         try:
             # Calculate market phases (no region = Germany-wide)
-            result = calculate_market_phases(df, fuel=fuel, region=None)
+            new_days = aggregate_daily(df, fuel=fuel, region=None)
+            result, state = update_market_phases(states[fuel], new_days, since=since)
+            save_state(state, state_path(CACHE_DIR, fuel), versions)
             
             # Save to cache
             cache_file = os.path.join(CACHE_DIR, f'market_phases_{fuel}.json')
             with open(cache_file, 'w', encoding='utf-8') as f:
                 json.dump(result, f, ensure_ascii=False)
+            ensure_gzip(cache_file)
             
             # Stats
             n_days = result.get('meta', {}).get('n_days', 0)
@@ -83,4 +113,9 @@ def generate_market_phases_cache():
 
 
 if __name__ == '__main__':
-    generate_market_phases_cache()
+    parser = argparse.ArgumentParser(description='Generate market phase cache files.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only read new days and changed years since the saved state')
+    args = parser.parse_args()
+
+    generate_market_phases_cache(incremental=args.incremental)
@@ -0,0 +1,105 @@
+"""
+Cube-Generator für Marktphasen je PLZ3-Region
+
+Berechnet die Marktphasen für jede Region und jeden Kraftstoff (gebündelt,
+über alle CPU-Kerne) und legt sie in cache/market_phases_cube_{fuel}.*
+ab (Index als JSON, Zeitreihen als versionierte Parquet-Datei). Die API
+beantwortet Regionsanfragen danach direkt aus diesem Speicher.
+
+Mit --incremental werden nur die Tage nach dem gespeicherten Zustand
+(cache/market_phases_cube_state_{fuel}.parquet) sowie Jahre, deren Dateien
+sich seitdem geändert haben, gelesen und eingearbeitet.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_phase_cube import FUELS, INPUT_COLUMNS, build_cube, cube_files, update_cube, write_cube
+from market_phase_state import (
+    data_versions, last_date, load_state, load_versions, read_daily, reread_from, save_state, state_path
+)
+import dataset_layout
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+
+
+def generate_market_phases_cube(fuels, workers=None, incremental=False):
+    print("=" * 50)
+    print("Marktphasen Cube Generator (Region × Kraftstoff)")
+    print("=" * 50)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Alle vorhandenen Jahre und ihre aktuelle Version
+    years = dataset_layout.available_years(DATA_DIR, 'daily')
+    versions = data_versions(DATA_DIR, years)
+
+    # Gespeicherter Zustand: nur neue Tage und geänderte Jahre müssen gelesen werden
+    states = {fuel: None for fuel in fuels}
+    since = None
+    if incremental:
+        paths = {fuel: state_path(CACHE_DIR, fuel, regional=True) for fuel in fuels}
+        states = {fuel: load_state(path) for fuel, path in paths.items()}
+        if all(state is not None for state in states.values()):
+            since = min(
+                reread_from(last_date(states[fuel]), load_versions(paths[fuel]), versions)
+                for fuel in fuels
+            )
+            print(f"\n♻️  Inkrementell ab {since.date()}")
+        else:
+            print("\n⚠️  Kein vollständiger Zustand gefunden, berechne komplett")
+            states = {fuel: None for fuel in fuels}
+
+    if since is not None:
+        years = [year for year in years if year >= since.year]
+
+    print("\n📂 Lade Parquet-Dateien...")
+    for year in years:
+        print(f"  ✓ {year}")
+
+    # Alle Jahre als ein Dataset: nur die Partitionen der gewählten Kraftstoffe werden gelesen
+    df = read_daily(DATA_DIR, years, columns=INPUT_COLUMNS, start=since, fuels=list(fuels))
+    if df is None:
+        if since is None:
+            print("\n❌ Keine Daten gefunden!")
+            return
+        df = pd.DataFrame(columns=INPUT_COLUMNS)
+    print(f"\n📊 Gesamtdaten: {len(df):,} Zeilen, {df['region_plz3'].nunique()} Regionen")
+
+    for fuel in fuels:
+        print(f"\n  Kraftstoff: {fuel.upper()}")
+        start = time.time()
+        if states[fuel] is not None:
+            results, state = update_cube(states[fuel], df, fuel, since, workers=workers)
+        else:
+            results, state = build_cube(df, fuel, workers=workers)
+        write_cube(results, CACHE_DIR, fuel)
+        save_state(state, state_path(CACHE_DIR, fuel, regional=True), versions)
+
+        files = cube_files(CACHE_DIR, fuel)
+        size_kb = sum(os.path.getsize(p) for p in files) / 1024
+        print(f"    ✓ {len(results)} Regionen in {time.time() - start:.1f}s")
+        print(f"    💾 Gespeichert: {', '.join(os.path.basename(p) for p in files)} ({size_kb:.1f} KB)")
+
+    print("\n" + "=" * 50)
+    print("✅ Cube-Generierung abgeschlossen!")
+    print("=" * 50)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute market phases for every PLZ3 region and fuel.')
+    parser.add_argument('--fuel', choices=FUELS, action='append', help='Only these fuels (default: all)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only read new days and changed years since the saved state')
+    args = parser.parse_args()
+
+    generate_market_phases_cube(args.fuel or FUELS, workers=args.workers, incremental=args.incremental)
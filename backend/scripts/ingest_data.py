@@ -1,22 +1,41 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import os
 import glob
 import concurrent.futures
-from functools import partial
+from typing import NamedTuple
 import requests
 import xml.etree.ElementTree as ET
 import argparse
 import sys
+import time
+import json
+import hashlib
+from contextlib import contextmanager
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import dataset_layout
+from atomic_io import atomic_write
+
 RAW_DATA_ROOT = os.path.join(BASE_DIR, 'data', 'tankerkoenig_historic')
 OUTPUT_DIR = os.path.join(BASE_DIR, 'data')
 
-def load_stations_map(year):
+class StationLookup(NamedTuple):
+    """Stations of a year as flat arrays: uuid -> row -> region code -> PLZ3 label."""
+    uuids: pa.Array      # station uuids, value set for pc.index_in
+    codes: np.ndarray    # int32 region code per uuid
+    regions: np.ndarray  # PLZ3 label per region code (sorted)
+
+def load_stations(year, raw_root=RAW_DATA_ROOT):
+    """Returns the StationLookup of the latest stations file of year and the PLZ3 centroids."""
     print(f"Loading Stations Metadata for {year}...")
     search_patterns = [
-        os.path.join(RAW_DATA_ROOT, "stations", str(year), "**", "*-stations.csv"),
+        os.path.join(raw_root, "stations", str(year), "**", "*-stations.csv"),
     ]
     
     stations_files = []
@@ -25,10 +44,10 @@ def load_stations_map(year):
     
     if not stations_files:
         print(f"Warning: No specific stations found for {year}, trying all...")
-        stations_files = glob.glob(os.path.join(RAW_DATA_ROOT, "stations", "**", "*-stations.csv"), recursive=True)
+        stations_files = glob.glob(os.path.join(raw_root, "stations", "**", "*-stations.csv"), recursive=True)
 
     if not stations_files:
-        raise FileNotFoundError(f"No stations found in {RAW_DATA_ROOT}")
+        raise FileNotFoundError(f"No stations found in {raw_root}")
         
     target_file = sorted(stations_files)[-1]
     print(f"Using Stations File: {target_file}")
@@ -39,12 +58,19 @@ def load_stations_map(year):
     df = df[(df['plz'] >= 1000) & (df['plz'] <= 99999)]
     df['plz3'] = df['post_code'].astype(str).str.zfill(5).str[:3]
     
-    station_map = df.set_index('uuid')['plz3'].to_dict()
+    # Last entry wins for duplicate uuids, like building a uuid -> plz3 dict
+    unique = df.drop_duplicates('uuid', keep='last')
+    regions, codes = np.unique(unique['plz3'].to_numpy(dtype=str), return_inverse=True)
+    stations = StationLookup(
+        uuids=pa.array(unique['uuid'].to_numpy(dtype=str), type=pa.string()),
+        codes=codes.astype(np.int32),
+        regions=regions.astype(object)
+    )
     
     centroids = df.groupby('plz3')[['latitude', 'longitude']].mean().reset_index()
     centroids.rename(columns={'latitude': 'lat', 'longitude': 'lon'}, inplace=True)
     
-    return station_map, centroids
+    return stations, centroids
 
 OIL_URL = "https://www.eia.gov/dnav/pet/hist_xls/RBRTEd.xls"
 ECB_URL = "https://www.ecb.europa.eu/stats/policy_and_exchange_rates/euro_reference_exchange_rates/html/usd.xml"
@@ -106,132 +132,384 @@ def fetch_real_macro_data(date_range):
 def generate_macro_data(date_range):
     return fetch_real_macro_data(date_range)
 
-def process_single_file(file_path, station_map=None):
-    cols_to_use = ['date', 'station_uuid', 'diesel', 'e5', 'e10']
+# Station lookup of a worker process: installed once per worker by init_worker
+# instead of being pickled into every task
+_stations = None
+
+def init_worker(stations):
+    global _stations
+    _stations = stations
+
+def region_codes(uuids, stations):
+    """Region code per price row, -1 for unknown stations (vectorized hash lookup in Arrow)."""
+    index = pc.fill_null(pc.index_in(uuids, value_set=stations.uuids), -1).to_numpy()
+    return np.where(index >= 0, stations.codes[index], -1)
+
+# Alphabetical, so the rows come out in the same (region, fuel) order as a pandas groupby
+FUEL_COLUMNS = ['diesel', 'e10', 'e5']
+MIN_PRICE = 0.1
+
+def read_prices(file_path):
+    """station_uuid and the fuel price columns of a prices CSV as an Arrow table (prices as float64)."""
+    columns = ['station_uuid'] + FUEL_COLUMNS
     try:
-        df = pd.read_csv(file_path, usecols=cols_to_use, engine='pyarrow')
-        if df.empty: return None
+        return pacsv.read_csv(file_path, convert_options=pacsv.ConvertOptions(
+            include_columns=columns, column_types={fuel: pa.float64() for fuel in FUEL_COLUMNS}
+        ))
+    except pa.ArrowInvalid:
+        # Non-numeric prices: read as text and coerce them to NaN like pd.to_numeric(errors='coerce')
+        table = pacsv.read_csv(file_path, convert_options=pacsv.ConvertOptions(
+            include_columns=columns, column_types={fuel: pa.string() for fuel in FUEL_COLUMNS}
+        ))
+        return pa.table(
+            [table['station_uuid']] + [
+                pa.array(pd.to_numeric(table[fuel].to_pandas(), errors='coerce'), type=pa.float64())
+                for fuel in FUEL_COLUMNS
+            ],
+            names=columns
+        )
+
+def aggregate_prices(codes, prices, n_regions):
+    """
+    mean/std/min/max per (region code, fuel) over all fuel columns in one pass.
+    codes: region code per row (-1 for unknown stations), prices: one float64
+    array per fuel. Rows are keyed as region * n_fuels + fuel; count, sum and
+    squared deviations are bincount reductions, min/max unbuffered ufunc.at
+    (empty keys keep inf there, they are dropped at the end).
+    Prices <= MIN_PRICE (and NaN) are ignored. std uses ddof=1 and is 0 for a
+    single price. Returns the present keys, their price count and statistics.
+    """
+    n_fuels = len(prices)
+    key = np.concatenate([codes * n_fuels + i for i in range(n_fuels)])
+    value = np.concatenate(prices)
+    # Unknown stations have negative keys; NaN > MIN_PRICE is False
+    valid = (value > MIN_PRICE) & (key >= 0)
+    key, value = key[valid], value[valid]
+
+    size = n_regions * n_fuels
+    count = np.bincount(key, minlength=size)
+    low = np.full(size, np.inf)
+    np.minimum.at(low, key, value)
+    high = np.full(size, -np.inf)
+    np.maximum.at(high, key, value)
+    # Summing offsets from the minimum keeps the mean of equal prices exact (like
+    # pandas' compensated sum), so ties between regions survive for the ranks
+    mean = low + np.bincount(key, weights=value - low[key], minlength=size) / np.maximum(count, 1)
+    dev = value - mean[key]
+    var = np.bincount(key, weights=dev * dev, minlength=size) / np.maximum(count - 1, 1)
+
+    present = np.flatnonzero(count)
+    return present, count[present], mean[present], np.sqrt(var[present]), low[present], high[present]
+
+def process_single_file(file_path, stations=None):
+    stations = stations if stations is not None else _stations
+    try:
+        table = read_prices(file_path)
+        if table.num_rows == 0: return None
         
         filename_date = os.path.basename(file_path)[:10]
         current_date = pd.to_datetime(filename_date)
         
-        if station_map:
-            df['region_plz3'] = df['station_uuid'].map(station_map)
-            df = df.dropna(subset=['region_plz3'])
-        else:
+        if stations is None or len(stations.uuids) == 0:
             return None
-            
-        for col in ['diesel', 'e5', 'e10']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-        df_melt = df.melt(id_vars=['region_plz3'], value_vars=['diesel', 'e5', 'e10'], 
-                          var_name='fuel', value_name='price')
-        df_melt = df_melt[df_melt['price'] > 0.1]
+        codes = region_codes(table['station_uuid'], stations)
+        prices = [table[fuel].to_numpy() for fuel in FUEL_COLUMNS]
+        keys, _, mean, std, low, high = aggregate_prices(codes, prices, len(stations.regions))
         
-        if df_melt.empty: return None
+        if len(keys) == 0: return None
 
-        agg = df_melt.groupby(['region_plz3', 'fuel'])['price'].agg(['mean', 'std', 'min', 'max']).reset_index()
+        n_fuels = len(FUEL_COLUMNS)
+        agg = pd.DataFrame({
+            'region_plz3': stations.regions[keys // n_fuels],
+            'fuel': np.array(FUEL_COLUMNS, dtype=object)[keys % n_fuels],
+            'price_mean': mean,
+            'price_std': std,
+            'price_min': low,
+            'price_max': high,
+        })
         agg['date'] = current_date
-        agg.rename(columns={'mean': 'price_mean', 'std': 'price_std', 'min': 'price_min', 'max': 'price_max'}, inplace=True)
-        agg['price_std'] = agg['price_std'].fillna(0)
         
         return agg
     except Exception as e:
         print(f"Error in {os.path.basename(file_path)}: {e}")
         return None
 
-def main():
-    parser = argparse.ArgumentParser(description='Process Tankerkoenig data for a specific year.')
-    parser.add_argument('--year', type=int, required=True, help='Year to process (e.g., 2019, 2024)')
-    args = parser.parse_args()
-    
-    year = args.year
+@contextmanager
+def stage(timings, name):
+    """Adds the wall time of the block to timings[name] (no-op if timings is None)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+MANIFEST_VERSION = 1
+FEATURE_WINDOW = 7
+# Ranks compare period means rounded to this many decimals: equal prices can come out
+# of different summation orders a few ulp apart, rounding keeps them tied
+RANK_DECIMALS = 10
+
+WEEKLY_AGG = {
+    'price_mean': 'mean', 'price_std': 'mean',
+    'brent_oil_eur': 'mean', 'exchange_rate_eur_usd': 'mean', 'date': 'min',
+    'lat': 'first', 'lon': 'first' # Preserve Coordinates
+}
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_manifest(path, year):
+    """Returns the manifest of a previous run or None (missing, unreadable or other version/year)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('year') != year:
+        return None
+    return manifest
+
+def scan_price_files(price_files, raw_root, known):
+    """
+    Compares the price files with the manifest entries (known: relpath -> entry).
+    Size and mtime are checked first; the file is only hashed if they differ,
+    so unchanged files are not read at all.
+    Returns (entries for all current files, relpaths to process, removed relpaths).
+    """
+    entries, todo = {}, []
+    for path in price_files:
+        rel = os.path.relpath(path, raw_root)
+        st = os.stat(path)
+        entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'date': os.path.basename(path)[:10]}
+        old = known.get(rel)
+        if old and old['size'] == entry['size'] and old['mtime_ns'] == entry['mtime_ns']:
+            entry['sha256'] = old['sha256']
+        else:
+            entry['sha256'] = file_digest(path)
+            if not old or old['sha256'] != entry['sha256']:
+                todo.append(rel)
+        entries[rel] = entry
+    removed = sorted(set(known) - set(entries))
+    return entries, todo, removed
+
+def read_stored(output_dir, granularity, year):
+    """Stored rows of a year from the partitioned dataset."""
+    return dataset_layout.read(output_dir, granularity, [year]).to_pandas()
+
+def add_features(df, since=None):
+    """
+    ma_7d / trend_slope per region and fuel on a frame sorted by date, region, fuel.
+    With since only rows from that date on are recomputed (plus the 7 rows before
+    them per group as window context); older rows keep their stored values.
+    """
+    keys = ['region_plz3', 'fuel']
+    part = df
+    if since is not None:
+        pos = df.groupby(keys).cumcount()
+        first = pos.where(df['date'] >= since).groupby([df[k] for k in keys]).transform('min')
+        part = df[pos >= first - FEATURE_WINDOW]
+    grouped = part.groupby(keys)['price_mean']
+    ma = grouped.rolling(window=FEATURE_WINDOW, min_periods=1).mean().reset_index(level=[0, 1], drop=True)
+    slope = grouped.diff(FEATURE_WINDOW).fillna(0)
+    if since is None:
+        df['ma_7d'] = ma.reindex(df.index)
+        df['trend_slope'] = slope
+    else:
+        target = part['date'] >= since
+        df.loc[part.index[target], 'ma_7d'] = ma.reindex(part.index)[target]
+        df.loc[part.index[target], 'trend_slope'] = slope[target]
+    return df
+
+def year_week(dates):
+    iso = dates.dt.isocalendar()
+    return iso.year.astype(str) + "-W" + iso.week.astype(str).str.zfill(2)
+
+def period_rows(df_daily, dates, freq):
+    """Daily rows in the same weeks ('W', Monday to Sunday like ISO weeks) or months ('M') as dates."""
+    return df_daily[df_daily['date'].dt.to_period(freq).isin(dates.to_period(freq))]
+
+def aggregate_periods(df, period_col):
+    """Weekly/monthly rows per region and fuel."""
+    out = df.groupby([period_col, 'region_plz3', 'fuel']).agg(WEEKLY_AGG).reset_index()
+    rounded = out['price_mean'].round(RANK_DECIMALS)
+    out['rank'] = rounded.groupby([out[period_col], out['fuel']]).rank(method='min').astype(int)
+    return out
+
+def merge_periods(stored, fresh, period_col, periods):
+    """Replaces the given periods of a stored weekly/monthly table with fresh rows."""
+    if stored is None:
+        return fresh
+    df = pd.concat([stored[~stored[period_col].isin(periods)], fresh], ignore_index=True)
+    df.sort_values([period_col, 'region_plz3', 'fuel'], inplace=True)
+    return df.reset_index(drop=True)
+
+def ingest_year(year, raw_root=RAW_DATA_ROOT, output_dir=OUTPUT_DIR, macro=None, workers=None, timings=None, full=False):
+    """
+    Builds the daily/weekly/monthly partitions of year (dataset/granularity=*/year=*/fuel=*,
+    see dataset_layout) from the raw stations/prices tree.
+    macro: function(dates) -> DataFrame with the macro columns (default: real oil/FX data).
+    timings: optional dict that receives the wall time per stage.
+
+    Processed price files are recorded in ingest_manifest_{year}.json (path, size,
+    mtime, sha256). On the next run only new or changed files are aggregated and
+    merged into the stored daily file, and only the weeks/months they touch are
+    recomputed. Rows of already ingested days keep the station mapping, centroids
+    and macro values of their run; full=True rebuilds the year from scratch.
+    Returns the list of written files (empty if there was nothing to process).
+    """
+    macro = macro or generate_macro_data
     print(f"Processing data for YEAR: {year}")
 
-    if not os.path.exists(RAW_DATA_ROOT):
-        print(f"ERROR: Raw Data Path not found: {RAW_DATA_ROOT}")
-        return
+    if not os.path.exists(raw_root):
+        print(f"ERROR: Raw Data Path not found: {raw_root}")
+        return []
+
+    manifest_path = os.path.join(output_dir, f'ingest_manifest_{year}.json')
+
+    manifest = None if full else load_manifest(manifest_path, year)
+    if manifest and not all(dataset_layout.is_partitioned(output_dir, g, year) for g in ('daily', 'weekly', 'monthly')):
+        print("Outputs missing, ignoring manifest.")
+        manifest = None
+    incremental = manifest is not None
 
-    station_map, centroids = load_stations_map(year)
-    
     # Prices path for specific year
-    price_files = glob.glob(os.path.join(RAW_DATA_ROOT, "prices", str(year), "**", "*-prices.csv"), recursive=True)
+    price_files = glob.glob(os.path.join(raw_root, "prices", str(year), "**", "*-prices.csv"), recursive=True)
     price_files.sort()
     
     print(f"Found {len(price_files)} daily files for {year}. Starting processing...")
     
     if not price_files:
-        print(f"No price files found for year {year} in {os.path.join(RAW_DATA_ROOT, 'prices', str(year))}")
-        return
-    
-    daily_aggregated = []
+        print(f"No price files found for year {year} in {os.path.join(raw_root, 'prices', str(year))}")
+        return []
+
+    with stage(timings, 'scan'):
+        known = manifest['files'] if incremental else {}
+        entries, todo, removed = scan_price_files(price_files, raw_root, known)
+
+    if incremental:
+        print(f"Manifest: {len(todo)} new/changed, {len(removed)} removed, "
+              f"{len(entries) - len(todo)} unchanged files")
+        if not todo and not removed:
+            print("Already up to date.")
+            return []
+
+    with stage(timings, 'stations'):
+        stations, centroids = load_stations(year, raw_root)
     
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        worker = partial(process_single_file, station_map=station_map)
-        results = list(executor.map(worker, price_files))
+    with stage(timings, 'prices'):
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(stations,)
+        ) as executor:
+            results = list(executor.map(process_single_file, [os.path.join(raw_root, rel) for rel in todo]))
         
     daily_aggregated = [r for r in results if r is not None]
     
-    if not daily_aggregated:
+    if not daily_aggregated and not incremental:
         print("No data found after processing!")
-        return
+        return []
 
-    # Concat & Sort
-    df_full = pd.concat(daily_aggregated, ignore_index=True)
-    df_full.sort_values(['date', 'region_plz3', 'fuel'], inplace=True)
-    
-    # Merge Centroids (Lat/Lon)
-    print("Merging Lat/Lon Centroids...")
-    df_full = df_full.merge(centroids, left_on='region_plz3', right_on='plz3', how='left')
-    df_full.drop(columns=['plz3'], inplace=True)
+    with stage(timings, 'combine'):
+        # Concat & Sort
+        if daily_aggregated:
+            df_new = pd.concat(daily_aggregated, ignore_index=True)
+            df_new.sort_values(['date', 'region_plz3', 'fuel'], inplace=True)
+            
+            # Merge Centroids (Lat/Lon)
+            print("Merging Lat/Lon Centroids...")
+            df_new = df_new.merge(centroids, left_on='region_plz3', right_on='plz3', how='left')
+            df_new.drop(columns=['plz3'], inplace=True)
 
     # Macro Data Generation (Real Data)
-    print("Fetching/Merging Macro Data...")
-    df_macro = generate_macro_data(df_full['date'].unique())
-    df_full = df_full.merge(df_macro, on='date', how='left')
+    with stage(timings, 'macro'):
+        if daily_aggregated:
+            print("Fetching/Merging Macro Data...")
+            new_dates = df_new['date'].unique()
+            if incremental:
+                # Fetch a week of lead-in so weekends at the start can be forward filled
+                lead_in = pd.date_range(new_dates.min() - pd.Timedelta(days=FEATURE_WINDOW), new_dates.max(), freq='D')
+                df_macro = macro(lead_in)
+                df_macro = df_macro[df_macro['date'].isin(new_dates)]
+            else:
+                df_macro = macro(new_dates)
+            df_new = df_new.merge(df_macro, on='date', how='left')
+
+    # Dates whose rows are replaced (new, changed and removed files)
+    touched = pd.to_datetime(sorted({entries[rel]['date'] for rel in todo} | {known[rel]['date'] for rel in removed}))
+
+    with stage(timings, 'combine'):
+        if incremental:
+            print("Merging into stored daily data...")
+            stored = read_stored(output_dir, 'daily', year)
+            parts = [stored[~stored['date'].isin(touched)]]
+            if daily_aggregated:
+                parts.append(df_new)
+            df_full = pd.concat(parts, ignore_index=True)[stored.columns]
+            df_full.sort_values(['date', 'region_plz3', 'fuel'], inplace=True)
+            df_full.reset_index(drop=True, inplace=True)
+        else:
+            df_full = df_new
     
     # Features
-    print("Calculating Features...")
-    df_full['ma_7d'] = df_full.groupby(['region_plz3', 'fuel'])['price_mean'] \
-                        .transform(lambda x: x.rolling(window=7, min_periods=1).mean())
-    df_full['trend_slope'] = df_full.groupby(['region_plz3', 'fuel'])['price_mean'].diff(7).fillna(0)
+    with stage(timings, 'features'):
+        print("Calculating Features...")
+        add_features(df_full, since=touched.min() if incremental else None)
 
     # Save Daily
-    out_daily = os.path.join(OUTPUT_DIR, f'data_daily_{year}.parquet')
-    print(f"Saving Daily: {out_daily}")
-    df_full.to_parquet(out_daily, index=False)
+    with stage(timings, 'write_daily'):
+        print(f"Saving Daily: {dataset_layout.partition_dir(output_dir, 'daily', year)}")
+        outputs = dataset_layout.write_year(df_full, output_dir, 'daily', year)
     
     # Weekly
-    print("Aggregating Weekly...")
-    df_full['year_week'] = df_full['date'].dt.isocalendar().year.astype(str) + "-W" + \
-                           df_full['date'].dt.isocalendar().week.astype(str).str.zfill(2)
-                           
-    df_weekly = df_full.groupby(['year_week', 'region_plz3', 'fuel']).agg({
-        'price_mean': 'mean', 'price_std': 'mean',
-        'brent_oil_eur': 'mean', 'exchange_rate_eur_usd': 'mean', 'date': 'min',
-        'lat': 'first', 'lon': 'first' # Preserve Coordinates
-    }).reset_index()
-    
-    df_weekly['change_pct'] = df_weekly.groupby(['region_plz3', 'fuel'])['price_mean'].pct_change().fillna(0)
-    df_weekly['rank'] = df_weekly.groupby(['year_week', 'fuel'])['price_mean'].rank(method='min').astype(int)
-    
-    out_weekly = os.path.join(OUTPUT_DIR, f'data_weekly_{year}.parquet')
-    df_weekly.to_parquet(out_weekly, index=False)
+    with stage(timings, 'weekly'):
+        print("Aggregating Weekly...")
+        rows = period_rows(df_full, touched, 'W') if incremental else df_full
+        rows = rows.assign(year_week=year_week(rows['date']))
+        weeks = year_week(pd.Series(touched)).unique() if incremental else None
+        df_weekly = merge_periods(
+            read_stored(output_dir, 'weekly', year) if incremental else None,
+            aggregate_periods(rows, 'year_week'), 'year_week', weeks
+        )
+        # Week-over-week change also depends on the neighbouring weeks, so it is recomputed for the whole table
+        df_weekly['change_pct'] = df_weekly.groupby(['region_plz3', 'fuel'])['price_mean'].pct_change().fillna(0)
+        df_weekly = df_weekly[['year_week', 'region_plz3', 'fuel', *WEEKLY_AGG, 'change_pct', 'rank']]
+        outputs += dataset_layout.write_year(df_weekly, output_dir, 'weekly', year)
     
     # Monthly
-    print("Aggregating Monthly...")
-    df_full['year_month'] = df_full['date'].dt.strftime('%Y-%m')
-    df_monthly = df_full.groupby(['year_month', 'region_plz3', 'fuel']).agg({
-        'price_mean': 'mean', 'price_std': 'mean',
-        'brent_oil_eur': 'mean', 'exchange_rate_eur_usd': 'mean', 'date': 'min',
-        'lat': 'first', 'lon': 'first' # Preserve Coordinates
-    }).reset_index()
-    df_monthly['rank'] = df_monthly.groupby(['year_month', 'fuel'])['price_mean'].rank(method='min').astype(int)
-    
-    out_monthly = os.path.join(OUTPUT_DIR, f'data_monthly_{year}.parquet')
-    df_monthly.to_parquet(out_monthly, index=False)
+    with stage(timings, 'monthly'):
+        print("Aggregating Monthly...")
+        rows = period_rows(df_full, touched, 'M') if incremental else df_full
+        rows = rows.assign(year_month=rows['date'].dt.to_period('M').astype(str))
+        months = touched.strftime('%Y-%m').unique() if incremental else None
+        df_monthly = merge_periods(
+            read_stored(output_dir, 'monthly', year) if incremental else None,
+            aggregate_periods(rows, 'year_month'), 'year_month', months
+        )
+        outputs += dataset_layout.write_year(df_monthly, output_dir, 'monthly', year)
+
+    # The manifest is written last (atomically): after a crash the same files are simply processed again
+    def dump(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'year': year, 'files': entries}, f, indent=1)
+    atomic_write(manifest_path, dump, suffix='.json.tmp')
     
     print("ALL DONE.")
+    return outputs
+
+def main():
+    parser = argparse.ArgumentParser(description='Process Tankerkoenig data for a specific year.')
+    parser.add_argument('--year', type=int, required=True, help='Year to process (e.g., 2019, 2024)')
+    parser.add_argument('--raw-root', default=RAW_DATA_ROOT, help='Root of the stations/ and prices/ tree')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Where the parquet files are written')
+    parser.add_argument('--workers', type=int, help='Worker processes for the price files (default: all cores)')
+    parser.add_argument('--full', action='store_true', help='Ignore the manifest and rebuild the whole year')
+    args = parser.parse_args()
+    
+    ingest_year(args.year, raw_root=args.raw_root, output_dir=args.output_dir, workers=args.workers, full=args.full)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,56 @@
+"""
+Wandelt vorhandene data_{daily,weekly,monthly}_{year}.parquet in das
+partitionierte Layout (data/dataset/granularity=*/year=*/fuel=*, siehe
+dataset_layout.py) um.
+
+Die Einzeldateien bleiben liegen, sofern nicht --remove angegeben ist; sobald
+eine Partition existiert, lesen API und Skripte nur noch diese.
+
+    python backend/scripts/partition_data.py                 # alle Jahre und Granularitäten
+    python backend/scripts/partition_data.py --granularity daily --year 2024 --remove
+"""
+
+import os
+import sys
+import argparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow.parquet as pq
+import dataset_layout
+from data_store import GRANULARITIES
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def partition_file(data_dir, granularity, year, remove=False):
+    source = dataset_layout.legacy_path(data_dir, granularity, year)
+    if not os.path.exists(source):
+        return False
+    table = pq.read_table(source)
+    paths = dataset_layout.write_year(table, data_dir, granularity, year)
+    size = sum(os.path.getsize(p) for p in paths)
+    print(f"  ✓ {os.path.basename(source)} -> {len(paths)} Partitionen ({size / 1024 / 1024:.1f} MB)")
+    if remove:
+        os.remove(source)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert single parquet files into the partitioned dataset layout.')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--granularity', choices=GRANULARITIES, action='append', help='Only these granularities')
+    parser.add_argument('--year', type=int, action='append', help='Only these years (default: all present)')
+    parser.add_argument('--remove', action='store_true', help='Delete the single files afterwards')
+    args = parser.parse_args()
+
+    converted = 0
+    for granularity in args.granularity or GRANULARITIES:
+        for year in args.year or dataset_layout.available_years(args.data_dir, granularity):
+            converted += partition_file(args.data_dir, granularity, year, remove=args.remove)
+    print(f"{converted} Datei(en) umgewandelt.")
+
+
+if __name__ == '__main__':
+    main()
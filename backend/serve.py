@@ -0,0 +1,87 @@
+"""
+Produktionsbetrieb: mehrere Worker-Prozesse über gemeinsam gemappte Daten
+
+    python backend/serve.py                 # alle Kerne, Port 5000
+    python backend/serve.py --workers 4 --threads 8 --port 8000
+
+Ablauf:
+1. Die Parquet-Dateien werden einmalig in Arrow-IPC-Dateien umgewandelt
+   (data/arrow/, neu nur wenn die Quelle neuer ist).
+2. Der Master lädt die App und wärmt sie auf (Tabellen mappen, Indizes,
+   gzip-Varianten), danach ist /api/ready = 200.
+3. gunicorn forkt die Worker: die Tabellen sind read-only gemappt und liegen
+   einmal im Page-Cache; der Speicherbedarf wächst nicht mit der Worker-Zahl.
+
+Benötigt gunicorn (Linux/macOS). Entwicklung weiterhin mit python backend/app.py.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+# Muss vor dem Import der App gesetzt sein (DatasetStore liest es beim Import)
+os.environ.setdefault('DATA_MMAP_DIR', os.path.join(BASE_DIR, 'data', 'arrow'))
+
+
+def load_app():
+    """Importiert die App und wärmt sie auf (einmal im Master, vor dem Forken)."""
+    import app as backend
+
+    start = time.time()
+    backend.warm_up()
+    stats = backend.datasets.stats()
+    logging.getLogger('tankdaten.serve').info(
+        "warm_up duration_s=%.1f datasets=%d mmap_dir=%s bytes=%d",
+        time.time() - start, len(stats['entries']), backend.DATA_MMAP_DIR, stats['bytes'])
+    return backend.app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the dashboard with multiple worker processes.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='Worker processes (default: all cores)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker')
+    parser.add_argument('--timeout', type=int, default=120, help='Worker timeout in seconds')
+    args = parser.parse_args()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is required for production mode (pip install gunicorn); "
+                 "use python backend/app.py for development")
+
+    class Server(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'preload_app': True,
+        'accesslog': '-',
+    }
+    Server(load_app(), options).run()
+
+
+if __name__ == '__main__':
+    main()
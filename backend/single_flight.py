@@ -0,0 +1,66 @@
+"""
+Single-Flight: gleichzeitige identische Berechnungen zusammenfassen
+
+Der erste Aufrufer eines Schlüssels rechnet, alle parallelen Aufrufer mit
+demselben Schlüssel warten auf dieses Ergebnis (bzw. dieselbe Exception)
+statt selbst zu rechnen. Nach Abschluss wird der Schlüssel freigegeben; das
+Ergebnis selbst wird hier nicht gecacht, das übernehmen die Aufrufer.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Koalesziert parallele Aufrufe pro Schlüssel."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """fn() für key ausführen - oder auf den bereits laufenden Aufruf warten."""
+        with self._lock:
+            call = self._calls.get(key)
+            owner = call is None
+            if owner:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._calls)}
@@ -0,0 +1,40 @@
+"""
+Gemeinsame Fixtures: backend/ im Importpfad, Flask-App auf einem temporären
+Datenverzeichnis (DATA_DIR wird beim Import von app.py gelesen, daher einmal
+pro Testlauf).
+"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope='session')
+def data_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data')
+    (path / 'cache').mkdir()
+    return path
+
+
+@pytest.fixture(scope='session')
+def app_module(data_dir):
+    previous = os.environ.get('DATA_DIR')
+    os.environ['DATA_DIR'] = str(data_dir)
+    try:
+        import app
+    finally:
+        if previous is None:
+            del os.environ['DATA_DIR']
+        else:
+            os.environ['DATA_DIR'] = previous
+    app.app.testing = True
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,210 @@
+"""
+HTTP-Caching (http_cache.py) über den Flask-Testclient
+
+- ETag / If-None-Match / If-Modified-Since -> 304
+- Cache-Dateien mit und ohne Accept-Encoding: gzip (.gz daneben)
+- fehlgeschlagene Kompression: keine temp-Datei, unkomprimiert ausgeliefert
+- Antwortformat (responses.negotiate_format) als Teil des ETags
+
+    python -m pytest backend/tests
+"""
+
+import gzip
+import json
+import os
+
+import pytest
+from flask import Flask, jsonify
+
+import http_cache
+from responses import negotiate_format
+from http_cache import ensure_gzip, is_fresh, not_modified, request_variant, send_cache_file, stamp, validators
+
+PAYLOAD = {'values': list(range(500))}
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    (tmp_path / 'data.json').write_text(json.dumps(PAYLOAD))
+    return tmp_path
+
+
+@pytest.fixture
+def cache_client(cache_dir):
+    app = Flask(__name__)
+
+    @app.route('/file')
+    def file_route():
+        return send_cache_file(str(cache_dir), 'data.json')
+
+    @app.route('/missing')
+    def missing_route():
+        return send_cache_file(str(cache_dir), 'missing.json')
+
+    @app.route('/computed')
+    def computed_route():
+        v = validators([str(cache_dir / 'data.json')], request_variant())
+        if is_fresh(v):
+            return not_modified(v)
+        return stamp(jsonify(PAYLOAD), v)
+
+    @app.route('/negotiated')
+    def negotiated_route():
+        fmt = negotiate_format()
+        v = validators([str(cache_dir / 'data.json')], request_variant(fmt))
+        if is_fresh(v):
+            return not_modified(v)
+        return stamp(jsonify({'format': fmt}), v)
+
+    return app.test_client()
+
+
+def temp_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+
+def test_computed_etag_and_304(cache_client, cache_dir):
+    response = cache_client.get('/computed?x=1')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.last_modified is not None
+
+    # Passendes ETag -> 304 ohne Body, abweichendes -> 200
+    cached = cache_client.get('/computed?x=1', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    assert cached.headers['ETag'] == etag
+    assert cache_client.get('/computed?x=1', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert cache_client.get('/computed?x=1', headers={'If-None-Match': f'"other", {etag}'}).status_code == 304
+
+    # Die Anfrage-Variante (Query-String) gehört zum ETag
+    assert cache_client.get('/computed?x=2', headers={'If-None-Match': etag}).status_code == 200
+
+    # If-Modified-Since, sofern kein If-None-Match gesendet wird
+    since = response.headers['Last-Modified']
+    assert cache_client.get('/computed?x=1', headers={'If-Modified-Since': since}).status_code == 304
+    assert cache_client.get('/computed?x=1', headers={
+        'If-Modified-Since': since, 'If-None-Match': '"other"'
+    }).status_code == 200
+
+    # Neu geschriebene Quelldatei -> neues ETag
+    path = cache_dir / 'data.json'
+    path.write_text(json.dumps({'values': []}))
+    os.utime(path, ns=(os.stat(path).st_mtime_ns + 10**9,) * 2)
+    assert cache_client.get('/computed?x=1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_format_is_part_of_the_etag(cache_client):
+    accept = {
+        'json': '*/*',
+        'ndjson': 'application/x-ndjson',
+        'arrow': 'application/vnd.apache.arrow.stream, application/json;q=0.5',
+    }
+    etags = {}
+    for fmt, header in accept.items():
+        response = cache_client.get('/negotiated', headers={'Accept': header})
+        assert response.get_json()['format'] == fmt
+        assert 'Accept' in response.headers['Vary']
+        etags[fmt] = response.headers['ETag']
+    assert len(set(etags.values())) == 3
+    # ?format hat Vorrang vor Accept
+    assert cache_client.get('/negotiated?format=arrow', headers={'Accept': 'application/json'}).get_json() == {'format': 'arrow'}
+
+    assert cache_client.get('/negotiated', headers={
+        'Accept': accept['ndjson'], 'If-None-Match': etags['ndjson']
+    }).status_code == 304
+    assert cache_client.get('/negotiated', headers={
+        'Accept': accept['json'], 'If-None-Match': etags['ndjson']
+    }).status_code == 200
+
+
+def test_cache_file_without_gzip(cache_client, cache_dir):
+    response = cache_client.get('/file', headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.data) == PAYLOAD
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert not (cache_dir / 'data.json.gz').exists()
+
+    etag = response.headers['ETag']
+    assert cache_client.get('/file', headers={'If-None-Match': etag}).status_code == 304
+    assert cache_client.get('/file', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert cache_client.get('/missing').status_code == 404
+
+
+def test_cache_file_with_gzip(cache_client, cache_dir):
+    response = cache_client.get('/file', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == PAYLOAD
+    assert (cache_dir / 'data.json.gz').exists()
+
+    # Eigenes ETag je Kodierung
+    plain = cache_client.get('/file', headers={'Accept-Encoding': 'identity'})
+    assert plain.headers['ETag'] != response.headers['ETag']
+    etag = response.headers['ETag']
+    assert cache_client.get('/file', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+    assert cache_client.get('/file', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag}).status_code == 200
+    assert temp_files(cache_dir) == []
+
+
+def test_gzip_refreshed_when_source_changes(cache_dir):
+    path = str(cache_dir / 'data.json')
+    gz_path = ensure_gzip(path)
+    before = os.stat(gz_path).st_mtime_ns
+    assert ensure_gzip(path) == gz_path and os.stat(gz_path).st_mtime_ns == before
+
+    with open(path, 'w') as f:
+        json.dump({'values': [1]}, f)
+    os.utime(path, ns=(before + 10**9,) * 2)
+    ensure_gzip(path)
+    with gzip.open(gz_path) as f:
+        assert json.load(f) == {'values': [1]}
+
+
+def test_failed_compression_leaves_no_temp_file(cache_client, cache_dir, monkeypatch):
+    def disk_full(src, dst):
+        dst.write(src.read(100))
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(http_cache.shutil, 'copyfileobj', disk_full)
+    assert ensure_gzip(str(cache_dir / 'data.json')) is None
+    assert temp_files(cache_dir) == []
+    assert not (cache_dir / 'data.json.gz').exists()
+
+    # Ausgeliefert wird dann unkomprimiert
+    response = cache_client.get('/file', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.data) == PAYLOAD
+    assert temp_files(cache_dir) == []
+
+
+def test_unexpected_compression_error_leaves_no_temp_file(cache_dir, monkeypatch):
+    def broken(src, dst):
+        dst.write(src.read(100))
+        raise RuntimeError('broken')
+
+    monkeypatch.setattr(http_cache.shutil, 'copyfileobj', broken)
+    with pytest.raises(RuntimeError):
+        ensure_gzip(str(cache_dir / 'data.json'))
+    assert temp_files(cache_dir) == []
+    assert not (cache_dir / 'data.json.gz').exists()
+
+
+def test_app_serves_market_phase_cache_file(client, data_dir):
+    """Die Marktphasen-Route liefert die vorberechnete Datei konditional und gzip-kodiert."""
+    path = data_dir / 'cache' / 'market_phases_diesel.json'
+    path.write_text(json.dumps(PAYLOAD))
+    try:
+        response = client.get('/api/data/market-phases?fuel=diesel', headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200 and response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.data)) == PAYLOAD
+        cached = client.get('/api/data/market-phases?fuel=diesel', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']
+        })
+        assert cached.status_code == 304
+    finally:
+        for name in ('market_phases_diesel.json', 'market_phases_diesel.json.gz'):
+            if (data_dir / 'cache' / name).exists():
+                os.remove(data_dir / 'cache' / name)
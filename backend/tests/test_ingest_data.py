@@ -0,0 +1,117 @@
+"""
+Preis-Aggregation in scripts/ingest_data.py
+
+- bincount-Kernel (aggregate_prices / process_single_file) gegen den
+  pandas-groupby der alten Implementierung: Anzahl, min, max, mean,
+  std (ddof=1) und Zeilenreihenfolge
+- Ränge der Wochen/Monate: gleiche Preise bleiben gleichrangig
+
+    python -m pytest backend/tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'scripts'))
+
+import ingest_data
+from ingest_data import FUEL_COLUMNS, StationLookup
+
+
+@pytest.fixture
+def stations():
+    uuids = [f'station-{i}' for i in range(8)]
+    # Region 2 hat genau eine Station (std einer einzelnen Preisangabe)
+    codes = np.array([0, 0, 0, 1, 1, 1, 2, 3], dtype=np.int32)
+    return StationLookup(pa.array(uuids), codes, np.array(['101', '102', '103', '104'], dtype=object))
+
+
+@pytest.fixture
+def prices_csv(tmp_path):
+    rng = np.random.default_rng(7)
+    n = 400
+    station = rng.integers(0, 9, n)  # station-8 ist unbekannt
+    frame = pd.DataFrame({
+        'date': '2024-03-01 08:00:00+01',
+        'station_uuid': [f'station-{i}' for i in station],
+        'diesel': rng.integers(1500, 1900, n) / 1000,
+        'e5': rng.integers(1600, 2000, n) / 1000,
+        'e10': rng.integers(1550, 1950, n) / 1000,
+    })
+    # Ungültige Preise (0, <= MIN_PRICE, fehlend) und identische Preise
+    frame.loc[::17, 'diesel'] = 0.0
+    frame.loc[::23, 'e5'] = 0.05
+    frame.loc[::29, 'e10'] = np.nan
+    frame.loc[frame['station_uuid'].isin(['station-3', 'station-4', 'station-5']), 'e10'] = 1.799
+    # Region 3 ohne gültigen e5-Preis
+    frame.loc[frame['station_uuid'] == 'station-7', 'e5'] = 0.0
+    path = tmp_path / '2024-03-01-prices.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def groupby_reference(file_path, stations):
+    """Die alte Implementierung: melt + groupby."""
+    df = pd.read_csv(file_path, usecols=['date', 'station_uuid', 'diesel', 'e5', 'e10'])
+    codes = ingest_data.region_codes(pa.array(df['station_uuid'], type=pa.string()), stations)
+    known = codes >= 0
+    df = df[known].copy()
+    df['region_plz3'] = stations.regions[codes[known]]
+    df_melt = df.melt(id_vars=['region_plz3'], value_vars=['diesel', 'e5', 'e10'],
+                      var_name='fuel', value_name='price')
+    df_melt = df_melt[df_melt['price'] > 0.1]
+    agg = df_melt.groupby(['region_plz3', 'fuel'])['price'].agg(['count', 'mean', 'std', 'min', 'max']).reset_index()
+    agg['std'] = agg['std'].fillna(0)
+    return agg
+
+
+def test_aggregate_prices_matches_groupby(prices_csv, stations):
+    table = ingest_data.read_prices(prices_csv)
+    codes = ingest_data.region_codes(table['station_uuid'], stations)
+    keys, count, mean, std, low, high = ingest_data.aggregate_prices(
+        codes, [table[fuel].to_numpy() for fuel in FUEL_COLUMNS], len(stations.regions)
+    )
+    expected = groupby_reference(prices_csv, stations)
+
+    n_fuels = len(FUEL_COLUMNS)
+    assert list(stations.regions[keys // n_fuels]) == list(expected['region_plz3'])
+    assert list(np.array(FUEL_COLUMNS)[keys % n_fuels]) == list(expected['fuel'])
+    np.testing.assert_array_equal(count, expected['count'])
+    np.testing.assert_array_equal(low, expected['min'])
+    np.testing.assert_array_equal(high, expected['max'])
+    np.testing.assert_allclose(mean, expected['mean'], rtol=1e-12)
+    np.testing.assert_allclose(std, expected['std'], rtol=1e-9, atol=1e-12)
+    # Gleiche Preise: Mittelwert exakt, std 0
+    e10 = expected['fuel'].to_numpy() == 'e10'
+    tied = e10 & (expected['region_plz3'].to_numpy() == '102')
+    assert mean[tied][0] == 1.799 and std[tied][0] == 0.0
+
+
+def test_process_single_file_matches_groupby(prices_csv, stations):
+    result = ingest_data.process_single_file(prices_csv, stations)
+    expected = groupby_reference(prices_csv, stations).drop(columns='count')
+    expected['date'] = pd.Timestamp('2024-03-01')
+    expected.columns = ['region_plz3', 'fuel', 'price_mean', 'price_std', 'price_min', 'price_max', 'date']
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-9)
+
+
+def test_rank_keeps_ties_of_equal_prices():
+    # Gleiche Wochenmittel aus verschiedenen Summationsreihenfolgen, wenige ulp auseinander
+    df = pd.DataFrame({
+        'year_week': '2024-W10',
+        'region_plz3': ['101', '102', '103'],
+        'fuel': 'e10',
+        'price_mean': [1.7 + 1e-15, 1.7, 1.75],
+        'price_std': 0.0, 'brent_oil_eur': 70.0, 'exchange_rate_eur_usd': 1.1,
+        'date': pd.Timestamp('2024-03-04'), 'lat': 50.0, 'lon': 8.0,
+    })
+    out = ingest_data.aggregate_periods(df, 'year_week')
+    assert list(out['rank']) == [1, 1, 3]
+    # Die Preise selbst bleiben ungerundet
+    assert out['price_mean'].iloc[0] == 1.7 + 1e-15
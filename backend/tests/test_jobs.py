@@ -0,0 +1,210 @@
+"""
+Hintergrund-Jobs über mehrere Worker-Prozesse
+
+- JobQueue in zwei Prozessen über dasselbe state_dir: gemeinsamer Job,
+  serverweite Grenzen, Status aus jedem Prozess abrufbar
+- serve.py --workers 2 auf synthetischen Daten: jede Status-Abfrage wird
+  beantwortet, wiederholte Anfragen teilen sich einen Job
+- Route: nach einem abgeschlossenen Job kein neuer Job, auch wenn das
+  Ergebnis inzwischen aus dem Memo verdrängt wurde
+
+    python -m pytest backend/tests
+"""
+
+import glob
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+from jobs import DONE, QUEUED, RUNNING, JobQueue, JobQueueFull, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason='needs fcntl (Linux/macOS)')
+
+
+def _other_process(state_dir, job_id, conn):
+    """Zweiter Worker-Prozess: fragt den Job ab und reicht selbst ein."""
+    jobs = JobQueue(state_dir, workers=1, max_queued=1)
+    job = jobs.get(job_id)
+    same = jobs.submit(('slow',), lambda: None)
+    waiting = jobs.submit(('other',), lambda: None)
+    try:
+        jobs.submit(('third',), lambda: None)
+        full = False
+    except JobQueueFull:
+        full = True
+    conn.send({
+        'status': job.status if job else None,
+        'same_id': same.id,
+        'waiting': waiting.status,
+        'full': full,
+        'stats': jobs.stats(),
+    })
+    # Den eigenen Job laufen lassen, sobald der Slot frei wird
+    deadline = time.time() + 10
+    while jobs.get(waiting.id).status != DONE and time.time() < deadline:
+        time.sleep(0.05)
+    conn.send(jobs.get(waiting.id).status)
+
+
+def _crashing_process(state_dir):
+    """Worker-Prozess, der mitten im Job endet."""
+    JobQueue(state_dir).submit(('crash',), lambda: time.sleep(60))
+    time.sleep(0.2)
+    os._exit(0)
+
+
+# spawn statt fork: ein geforktes Kind erbt die offenen Lock-Dateien des Elternprozesses
+# (gunicorn forkt seine Worker, bevor ein Job läuft)
+SPAWN = multiprocessing.get_context('spawn')
+
+
+def test_job_queue_is_shared_between_processes(tmp_path):
+    state_dir = str(tmp_path / 'jobs')
+    jobs = JobQueue(state_dir, workers=1, max_queued=1)
+    job = jobs.submit(('slow',), lambda: time.sleep(3.0))
+
+    parent, child = SPAWN.Pipe()
+    process = SPAWN.Process(target=_other_process, args=(state_dir, job.id, child))
+    process.start()
+    seen = parent.recv()
+
+    # Job aus dem anderen Prozess bekannt, gleicher Schlüssel -> derselbe Job
+    assert seen['status'] in (QUEUED, RUNNING)
+    assert seen['same_id'] == job.id
+    # Einziger Slot belegt: der zweite Job wartet, ein dritter passt nicht mehr in die Warteschlange
+    assert seen['waiting'] == QUEUED
+    assert seen['full']
+    assert seen['stats']['running'] == 1 and seen['stats']['queued'] == 1
+
+    assert parent.recv() == DONE
+    process.join(10)
+    assert jobs.get(job.id).status == DONE
+    assert jobs.submitted == 1
+
+
+def test_job_of_a_dead_process_is_reported_and_restarted(tmp_path):
+    state_dir = str(tmp_path / 'jobs')
+    process = SPAWN.Process(target=_crashing_process, args=(state_dir,))
+    process.start()
+    process.join(10)
+
+    jobs = JobQueue(state_dir)
+    job_id = JobQueue.job_id(('crash',))
+    assert jobs.get(job_id).status == 'error'
+    job = jobs.submit(('crash',), lambda: None)
+    assert job.id == job_id and job.status != 'error' and jobs.submitted == 1
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    pytest.importorskip('gunicorn')
+    requests = pytest.importorskip('requests')
+    import run_benchmarks
+
+    work_dir = str(tmp_path_factory.mktemp('serve'))
+    data_dir = run_benchmarks.prepare_data_dir(work_dir, n_regions=10, seed=1)
+    port = _free_port()
+    env = dict(os.environ, DATA_DIR=data_dir, DATA_MMAP_DIR=os.path.join(work_dir, 'arrow'), LOG_LEVEL='WARNING')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, 'serve.py'), '--workers', '2', '--port', str(port),
+         '--host', '127.0.0.1'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + '/api/ready', timeout=1).status_code == 200:
+                break
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    else:
+        process.kill()
+        pytest.fail('server did not become ready')
+    yield base_url
+    process.terminate()
+    process.wait(10)
+
+
+def test_two_workers_share_jobs(server):
+    import requests
+
+    # Eine neue Verbindung je Anfrage, damit beide Worker drankommen
+    pids = {requests.get(server + '/api/ready').json()['pid'] for _ in range(20)}
+    assert len(pids) == 2
+
+    url = server + '/api/data/market-phases?fuel=e10&min_days=6'
+    responses = [requests.get(url) for _ in range(10)]
+    assert {r.status_code for r in responses} == {202}
+    job_ids = {r.json()['job_id'] for r in responses}
+    assert len(job_ids) == 1
+
+    status_url = server + responses[0].json()['status_url']
+    polls = []
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        status = requests.get(status_url)
+        polls.append(status.status_code)
+        if status.status_code == 200 and status.json()['status'] == DONE:
+            break
+        time.sleep(0.05)
+    assert set(polls) == {200}
+
+    # Ergebnis aus jedem Worker, ohne neuen Job
+    for _ in range(10):
+        response = requests.get(url)
+        assert response.status_code == 200
+        assert response.json()['timeseries']
+    # Über beide Worker hinweg wurde genau ein Job gestartet
+    ready = [requests.get(server + '/api/ready').json() for _ in range(20)]
+    submitted = {r['pid']: r['jobs']['submitted'] for r in ready}
+    assert len(submitted) == 2 and sum(submitted.values()) == 1
+
+
+@pytest.fixture
+def daily_data(data_dir):
+    import synthetic
+    paths = synthetic.write_daily(str(data_dir), [2023], n_regions=5, seed=2)
+    yield
+    for path in paths:
+        os.remove(path)
+
+
+def test_finished_job_is_not_resubmitted(app_module, client, daily_data, monkeypatch):
+    url = '/api/data/market-phases?fuel=e10&min_days=7'
+    response = client.get(url)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    deadline = time.time() + 60
+    while app_module.heavy_jobs.get(job_id).status not in ('done', 'error') and time.time() < deadline:
+        time.sleep(0.05)
+    assert app_module.heavy_jobs.get(job_id).status == DONE
+
+    # Ergebnis verdrängt (Speicher und Datei): die erneute Anfrage wird direkt beantwortet
+    monkeypatch.setattr(app_module.market_phase_memo, 'cached', lambda *args, **kwargs: False)
+    for path in glob.glob(os.path.join(app_module.market_phase_memo.results_dir, '*.json')):
+        os.remove(path)
+    submitted = app_module.heavy_jobs.submitted
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json()['timeseries']
+    assert app_module.heavy_jobs.submitted == submitted
+
+    # Andere Parameter ohne abgeschlossenen Job laufen weiter als Job
+    assert client.get('/api/data/market-phases?fuel=e10&min_days=8').status_code == 202
@@ -0,0 +1,44 @@
+"""
+Zustand für inkrementelle Marktphasen-Updates (market_phase_state.py)
+
+- Datenversionen in den Parquet-Metadaten
+- reread_from: geänderte Jahre werden ab dem 1. Januar neu gelesen
+
+    python -m pytest backend/tests
+"""
+
+import pandas as pd
+
+import market_phase_state
+
+
+def test_state_round_trip(tmp_path):
+    state = pd.DataFrame({'date': pd.date_range('2024-01-01', periods=3), 'price_mean': [1.7, 1.8, 1.75]})
+    path = str(tmp_path / 'cache' / 'market_phases_state_e10.parquet')
+    assert market_phase_state.load_state(path) is None
+    assert market_phase_state.load_versions(path) is None
+
+    versions = {'2023': '1:10', '2024': '2:20'}
+    market_phase_state.save_state(state, path, versions)
+    pd.testing.assert_frame_equal(market_phase_state.load_state(path), state)
+    assert market_phase_state.load_versions(path) == versions
+    assert market_phase_state.last_date(state) == pd.Timestamp('2024-01-03')
+    assert list((tmp_path / 'cache').iterdir()) == [tmp_path / 'cache' / 'market_phases_state_e10.parquet']
+
+
+def test_reread_from():
+    last = pd.Timestamp('2024-06-30')
+    stored = {'2022': 'a', '2023': 'b', '2024': 'c'}
+    reread_from = market_phase_state.reread_from
+
+    # Nichts geändert: ab dem Tag nach dem Zustand
+    assert reread_from(last, stored, dict(stored)) == pd.Timestamp('2024-07-01')
+    # Laufendes Jahr ergänzt: ab dessen 1. Januar
+    assert reread_from(last, stored, {**stored, '2024': 'd'}) == pd.Timestamp('2024-01-01')
+    # Korrigiertes oder entferntes älteres Jahr
+    assert reread_from(last, stored, {**stored, '2022': 'x'}) == pd.Timestamp('2022-01-01')
+    assert reread_from(last, stored, {'2023': 'b', '2024': 'c'}) == pd.Timestamp('2022-01-01')
+    # Neues Jahr nach dem Zustand ändert nichts am Start
+    assert reread_from(last, stored, {**stored, '2025': 'e'}) == pd.Timestamp('2024-07-01')
+    # Ohne gespeicherte Versionen: alles neu
+    assert reread_from(last, None, stored) == pd.Timestamp('2022-01-01')
@@ -0,0 +1,116 @@
+"""
+Ausschnitt, Ausdünnung (LTTB) und Spaltenformat der Marktphasen-Antworten
+
+- market_phase_view: erste und letzte Punkte bleiben erhalten, Länge gleich
+  max_points, Spaltenformat mit start/count/offsets
+- Route /api/data/market-phases: ungültiges max_points -> 400
+
+    python -m pytest backend/tests
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from market_phase_view import MIN_POINTS, lttb_indices, shape_result
+from market_phases import TIMESERIES_COLUMNS
+
+
+def fake_result(n=365, seed=1):
+    """Ergebnis im Format von calculate_market_phases mit einer Preisspitze in der Mitte."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-01-01', periods=n, freq='D').strftime('%Y-%m-%d')
+    price = 1.7 + 0.1 * np.sin(np.arange(n) / 20) + rng.normal(scale=0.005, size=n)
+    price[n // 2] = 2.5
+    records = []
+    for i, day in enumerate(dates):
+        record = {c: float(rng.uniform()) for c in TIMESERIES_COLUMNS}
+        record.update({'date': day, 'price_mean': float(price[i]), 'phase': 'KEINE'})
+        records.append(record)
+    phases = [{'phase': 'ASYMMETRIE', 'start_date': dates[10], 'end_date': dates[20], 'duration_days': 11}]
+    return {'timeseries': records, 'phases': phases, 'meta': {'n_days': n, 'oil_available': True}}
+
+
+def test_lttb_keeps_ends_and_length():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000, dtype=float)
+    y = rng.normal(size=1000)
+    for n_out in (MIN_POINTS, 10, 137, 999):
+        idx = lttb_indices(x, y, n_out)
+        assert len(idx) == n_out
+        assert idx[0] == 0 and idx[-1] == 999
+        assert (np.diff(idx) > 0).all()
+    np.testing.assert_array_equal(lttb_indices(x, y, 1000), np.arange(1000))
+
+
+@pytest.mark.parametrize('max_points', [MIN_POINTS, 50, 364])
+def test_records_downsampled(max_points):
+    result = fake_result()
+    shaped = shape_result(result, max_points=max_points)
+    records = shaped['timeseries']
+    assert len(records) == max_points == shaped['meta']['n_points']
+    assert records[0] == result['timeseries'][0]
+    assert records[-1] == result['timeseries'][-1]
+    dates = [r['date'] for r in records]
+    assert dates == sorted(dates)
+    if max_points > MIN_POINTS:
+        assert max(r['price_mean'] for r in records) == 2.5
+    assert shaped['phases'] == result['phases']
+
+
+def test_records_with_missing_prices_downsampled():
+    result = fake_result()
+    for r in result['timeseries'][:5] + result['timeseries'][100:110]:
+        r['price_mean'] = None
+    shaped = shape_result(result, max_points=40)
+    records = shaped['timeseries']
+    assert len(records) == 40
+    assert records[0]['date'] == result['timeseries'][5]['date']
+    assert records[-1] == result['timeseries'][-1]
+
+
+def test_columns_layout_downsampled():
+    result = fake_result()
+    shaped = shape_result(result, max_points=60, columns=['price_mean', 'phase'], layout='columns')
+    series = shaped['timeseries']
+    assert series['start'] == '2024-01-01' and series['count'] == 60
+    assert set(series) == {'start', 'count', 'offsets', 'price_mean', 'phase'}
+    assert len(series['offsets']) == len(series['price_mean']) == len(series['phase']) == 60
+    assert series['offsets'][0] == 0 and series['offsets'][-1] == 364
+    assert series['price_mean'][0] == result['timeseries'][0]['price_mean']
+    assert series['price_mean'][-1] == result['timeseries'][-1]['price_mean']
+    assert shaped['meta']['layout'] == 'columns' and shaped['meta']['n_points'] == 60
+
+
+def test_columns_layout_consecutive_days_without_offsets():
+    result = fake_result(n=30)
+    series = shape_result(result, date_from='2024-01-05', date_to='2024-01-14', layout='columns')['timeseries']
+    assert series['start'] == '2024-01-05' and series['count'] == 10
+    assert 'offsets' not in series
+    assert series['price_mean'] == [r['price_mean'] for r in result['timeseries'][4:14]]
+
+
+@pytest.fixture
+def cached_result(data_dir):
+    result = fake_result()
+    path = data_dir / 'cache' / 'market_phases_e10.json'
+    path.write_text(json.dumps(result))
+    yield result
+    path.unlink()
+
+
+@pytest.mark.parametrize('value', ['abc', '1.5', '-1', str(MIN_POINTS - 1)])
+def test_route_rejects_invalid_max_points(client, cached_result, value):
+    response = client.get(f'/api/data/market-phases?fuel=e10&max_points={value}')
+    assert response.status_code == 400
+    assert 'max_points' in response.get_json()['error']
+
+
+def test_route_downsamples(client, cached_result):
+    response = client.get('/api/data/market-phases?fuel=e10&max_points=50&layout=columns')
+    assert response.status_code == 200
+    series = response.get_json()['timeseries']
+    assert series['count'] == 50 and len(series['price_mean']) == 50
+    assert series['price_mean'][-1] == cached_result['timeseries'][-1]['price_mean']
@@ -0,0 +1,377 @@
+"""
+Marktphasen-Erkennung (market_phases.py) gegen einfache Schleifen-Referenzen
+
+- rollende Korrelationen und bester Lag wie die ursprüngliche Schleife mit
+  Series.corr: NaN-Lücken, konstante Fenster (Varianz 0), zu kurze Reihen
+- Klassifikation, Intervall-Gruppierung (RLE) und Fusion wie die
+  ursprünglichen zeilenweisen Schleifen: angrenzende Läufe, eintägige
+  Phasen, Abstände genau an der Fusionsschwelle
+- inkrementelle Updates gegen die vollständige Berechnung: Phasen gleich,
+  Metriken bis auf Rundung; korrigierte und entfernte Tage, first_changed_day
+
+    python -m pytest backend/tests
+"""
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import market_phases
+
+
+def sample_series(n=60, seed=3):
+    """Zwei Reihen mit NaN-Lücken, einer konstanten Strecke und einer langen Lücke (auf n gekürzt)."""
+    rng = np.random.default_rng(seed)
+    a = np.cumsum(rng.normal(size=60))
+    b = 0.6 * a + rng.normal(size=60)
+    a[[5, 17, 18]] = np.nan
+    b[[9, 30]] = np.nan
+    a[20:36] = 1.5          # konstant: Varianz 0 -> NaN-Korrelation
+    b[44:57] = np.nan       # Fenster mit weniger als 2 gültigen Paaren
+    return a[:n], b[:n]
+
+
+def pearson_loop(a, b, window):
+    out = np.full(len(a), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # Series.corr bei Varianz 0
+        for e in range(window - 1, len(a)):
+            out[e] = pd.Series(a[e - window + 1:e + 1]).corr(pd.Series(b[e - window + 1:e + 1]))
+    return out
+
+
+def best_lag_loop(zp, zo, window, max_lag):
+    """Die ursprüngliche Schleife aus find_best_lag_correlation."""
+    zp, zo = pd.Series(zp), pd.Series(zo)
+    best_corr = np.full(len(zp), np.nan)
+    best_lag = np.full(len(zp), np.nan)
+    for i in range(window + max_lag, len(zp)):
+        max_rho, max_l = -np.inf, 0
+        for lag in range(0, max_lag + 1):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                rho = zp.iloc[i - window + 1:i + 1].corr(zo.iloc[i - window + 1 - lag:i + 1 - lag])
+            if not pd.isna(rho) and rho > max_rho:
+                max_rho, max_l = rho, lag
+        if max_rho > -np.inf:
+            best_corr[i], best_lag[i] = max_rho, max_l
+    return best_corr, best_lag
+
+
+@pytest.mark.parametrize('window', [2, 5, 14])
+def test_rolling_pearson_matches_series_corr(window):
+    a, b = sample_series()
+    np.testing.assert_array_equal(market_phases.rolling_pearson(a, b, window), pearson_loop(a, b, window))
+
+
+def test_rolling_pearson_columns_match_single_series():
+    a, b = sample_series()
+    a2, b2 = sample_series(seed=4)
+    result = market_phases.rolling_pearson(np.column_stack([a, a2]), np.column_stack([b, b2]), 7)
+    np.testing.assert_array_equal(result[:, 0], pearson_loop(a, b, 7))
+    np.testing.assert_array_equal(result[:, 1], pearson_loop(a2, b2, 7))
+
+
+def test_rolling_pearson_shorter_than_window():
+    a, b = sample_series(n=5)
+    assert np.isnan(market_phases.rolling_pearson(a, b, 14)).all()
+
+
+@pytest.mark.parametrize('window,max_lag', [(14, 7), (5, 3)])
+def test_best_lag_matches_loop(window, max_lag):
+    zp, zo = sample_series()
+    corr, lag = market_phases.best_lag_arrays(zp, zo, window, max_lag)
+    expected_corr, expected_lag = best_lag_loop(zp, zo, window, max_lag)
+    np.testing.assert_array_equal(corr, expected_corr)
+    np.testing.assert_array_equal(lag, expected_lag)
+    # Konstante Strecke und lange Lücke liefern Tage ohne gültigen Lag
+    assert np.isnan(corr[window + max_lag:]).any()
+
+
+def test_best_lag_columns_match_single_series():
+    zp, zo = sample_series()
+    zp2, zo2 = sample_series(seed=5)
+    corr, lag = market_phases.best_lag_arrays(np.column_stack([zp, zp2]), np.column_stack([zo, zo2]))
+    for column, (p, o) in enumerate([(zp, zo), (zp2, zo2)]):
+        expected_corr, expected_lag = best_lag_loop(p, o, 14, 7)
+        np.testing.assert_array_equal(corr[:, column], expected_corr)
+        np.testing.assert_array_equal(lag[:, column], expected_lag)
+
+
+def test_best_lag_series_too_short():
+    zp, zo = sample_series(n=21)
+    corr, lag = market_phases.best_lag_arrays(zp, zo, 14, 7)
+    assert np.isnan(corr).all() and np.isnan(lag).all()
+
+
+# --- Klassifikation und Intervalle --------------------------------------------
+
+def classify_phase_row(row, vp_high, vo_low):
+    """Die ursprüngliche zeilenweise Klassifikation (Standard-Schwellen)."""
+    rho, zp, zo_lagged = row['best_correlation'], row['zp'], row['zo_lagged']
+    vp, vo, vol_ratio = row['vp'], row['vo'], row['vol_ratio']
+    if pd.isna(vp) or pd.isna(vo):
+        return 'KEINE'
+    if pd.isna(rho):
+        rho = 0
+    if not pd.isna(zp) and not pd.isna(zo_lagged) and abs(zp - zo_lagged) >= 1.3:
+        return 'ASYMMETRIE'
+    if rho < 0.5 and (vol_ratio >= 2.0 or (vp >= vp_high and vo <= vo_low)):
+        return 'INTERNE_FAKTOREN'
+    return 'KEINE'
+
+
+def intervals_loop(df):
+    """Die ursprüngliche Gruppierung per iterrows."""
+    intervals = []
+    current, start, end, count = None, None, None, 0
+    sums = {}
+
+    def close():
+        if current is not None and current != 'KEINE':
+            intervals.append({
+                'phase': current,
+                'start_date': start.strftime('%Y-%m-%d'),
+                'end_date': end.strftime('%Y-%m-%d'),
+                'duration_days': count,
+                'avg_correlation': sums['best_correlation'] / max(count, 1),
+                'avg_lag': sums['best_lag'] / max(count, 1),
+                'avg_vol_ratio': sums['vol_ratio'] / max(count, 1),
+            })
+
+    for _, row in df.iterrows():
+        if row['phase'] != current:
+            close()
+            current, start, count = row['phase'], row['date'], 0
+            sums = {'best_correlation': 0, 'best_lag': 0, 'vol_ratio': 0}
+        end = row['date']
+        count += 1
+        for col in sums:
+            if not pd.isna(row[col]):
+                sums[col] += row[col]
+    close()
+    return intervals
+
+
+def merge_loop(intervals, max_gap):
+    """Die ursprüngliche Fusion mit Datums-Parsing je Paar."""
+    if len(intervals) < 2:
+        return intervals
+    merged, current = [], intervals[0].copy()
+    for nxt in intervals[1:]:
+        if nxt['phase'] == current['phase']:
+            gap = (pd.to_datetime(nxt['start_date']) - pd.to_datetime(current['end_date'])).days
+            if gap <= max_gap + 1:
+                w1, w2 = current['duration_days'], nxt['duration_days']
+                total = w1 + w2
+                current['end_date'] = nxt['end_date']
+                for key in ('avg_correlation', 'avg_lag', 'avg_vol_ratio'):
+                    current[key] = (current[key] * w1 + nxt[key] * w2) / total
+                current['duration_days'] = total
+                continue
+        merged.append(current)
+        current = nxt.copy()
+    merged.append(current)
+    return merged
+
+
+def phase_frame(phases, dates=None, seed=0):
+    """Tagesreihe mit vorgegebenen Phasen und Metriken (mit NaN-Lücken)."""
+    n = len(phases)
+    rng = np.random.default_rng(seed)
+    if dates is None:
+        dates = pd.date_range('2024-01-01', periods=n, freq='D')
+    corr = rng.uniform(-1, 1, n)
+    corr[::7] = np.nan
+    lag = rng.integers(0, 8, n).astype(float)
+    lag[::5] = np.nan
+    return pd.DataFrame({
+        'date': pd.DatetimeIndex(dates), 'phase': np.array(phases, dtype=object),
+        'best_correlation': corr, 'best_lag': lag, 'vol_ratio': rng.uniform(0, 4, n),
+    })
+
+
+def test_classify_phases_matches_row_wise():
+    rng = np.random.default_rng(11)
+    n = 500
+    df = pd.DataFrame({
+        'best_correlation': rng.uniform(-1, 1, n),
+        'zp': rng.normal(size=n) * 1.5,
+        'zo_lagged': rng.normal(size=n),
+        'vp': rng.uniform(0, 0.02, n),
+        'vo': rng.uniform(0, 0.03, n),
+        'vol_ratio': rng.uniform(0, 4, n),
+    })
+    for col, step in (('best_correlation', 3), ('zp', 7), ('zo_lagged', 11), ('vp', 13), ('vo', 17), ('vol_ratio', 19)):
+        df.loc[::step, col] = np.nan
+    # Genau auf den Schwellen
+    df.loc[1, ['zp', 'zo_lagged']] = [1.3, 0.0]
+    df.loc[2, ['best_correlation', 'vol_ratio', 'zp', 'zo_lagged']] = [0.5, 2.0, 0.0, 0.0]
+    df.loc[4, ['best_correlation', 'vol_ratio', 'zp', 'zo_lagged']] = [0.4, 2.0, 0.0, 0.0]
+    vp_high, vo_low = df['vp'].quantile(0.8), df['vo'].quantile(0.4)
+
+    phases = market_phases.classify_phases(df, vp_high, vo_low)
+    expected = [classify_phase_row(row, vp_high, vo_low) for _, row in df.iterrows()]
+    assert list(phases) == expected
+    assert {'ASYMMETRIE', 'INTERNE_FAKTOREN', 'KEINE'} <= set(expected)
+    assert list(phases[[1, 2, 4]]) == ['ASYMMETRIE', 'KEINE', 'INTERNE_FAKTOREN']
+
+
+def test_intervals_match_loop():
+    rng = np.random.default_rng(2)
+    phases = rng.choice(['KEINE', 'ASYMMETRIE', 'INTERNE_FAKTOREN'], size=300, p=[0.5, 0.3, 0.2])
+    # Fehlende Kalendertage: Abstände zwischen Zeilen sind nicht immer ein Tag
+    dates = pd.Timestamp('2023-01-01') + pd.to_timedelta(np.cumsum(rng.integers(1, 4, 300)), unit='D')
+    df = phase_frame(phases, dates)
+    intervals = market_phases.group_phases_to_intervals(df)
+    assert intervals == intervals_loop(df)
+    for max_gap in (0, 1, 2, 5):
+        assert market_phases.merge_close_intervals(intervals, max_gap) == merge_loop(intervals, max_gap)
+
+
+def test_single_day_and_adjacent_runs():
+    df = phase_frame(['ASYMMETRIE', 'INTERNE_FAKTOREN', 'INTERNE_FAKTOREN', 'ASYMMETRIE', 'KEINE', 'ASYMMETRIE'])
+    intervals = market_phases.group_phases_to_intervals(df)
+    assert intervals == intervals_loop(df)
+    # Eintägige Phase am Anfang, direkt angrenzende Läufe verschiedener Phasen bleiben getrennt
+    assert [(i['phase'], i['start_date'], i['duration_days']) for i in intervals] == [
+        ('ASYMMETRIE', '2024-01-01', 1),
+        ('INTERNE_FAKTOREN', '2024-01-02', 2),
+        ('ASYMMETRIE', '2024-01-04', 1),
+        ('ASYMMETRIE', '2024-01-06', 1),
+    ]
+    # Gleiche Phase mit einem KEINE-Tag dazwischen (Abstand 2 = max_gap + 1)
+    merged = market_phases.merge_close_intervals(intervals, max_gap=1)
+    assert merged == merge_loop(intervals, 1)
+    assert [(i['phase'], i['start_date'], i['end_date'], i['duration_days']) for i in merged] == [
+        ('ASYMMETRIE', '2024-01-01', '2024-01-01', 1),
+        ('INTERNE_FAKTOREN', '2024-01-02', '2024-01-03', 2),
+        ('ASYMMETRIE', '2024-01-04', '2024-01-06', 2),
+    ]
+    assert market_phases.merge_close_intervals(intervals, max_gap=0) == intervals
+
+
+@pytest.mark.parametrize('gap_days,max_gap,merges', [(2, 2, True), (3, 2, True), (4, 2, False), (1, 0, True), (2, 0, False)])
+def test_merge_gap_threshold(gap_days, max_gap, merges):
+    # Zwei ASYMMETRIE-Läufe, deren Starttag gap_days nach dem Ende des ersten liegt
+    dates = list(pd.date_range('2024-02-27', periods=3, freq='D'))
+    dates += list(pd.date_range(dates[-1] + pd.Timedelta(days=gap_days), periods=3, freq='D'))
+    phases = ['ASYMMETRIE'] * 3 + ['ASYMMETRIE'] * 3
+    df = phase_frame(phases, dates)
+    intervals = [
+        market_phases.group_phases_to_intervals(df.iloc[:3])[0],
+        market_phases.group_phases_to_intervals(df.iloc[3:].reset_index(drop=True))[0],
+    ]
+    merged = market_phases.merge_close_intervals(intervals, max_gap)
+    assert merged == merge_loop(intervals, max_gap)
+    assert (len(merged) == 1) == merges
+    if merges:
+        assert merged[0]['duration_days'] == 6 and merged[0]['end_date'] == intervals[1]['end_date']
+
+
+# --- Inkrementelle Updates -----------------------------------------------------
+
+def daily_frame(n=400, seed=8):
+    """Tagesreihe (DAILY_COLUMNS) mit Preis- und Ölpreis-Random-Walk (Öl wie im Ingest lückenlos)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2022-01-01', periods=n, freq='D')
+    price = 1.7 * np.exp(np.cumsum(rng.normal(scale=0.01, size=n)))
+    oil = 70 * np.exp(np.cumsum(rng.normal(scale=0.02, size=n)))
+    return pd.DataFrame({
+        'date': dates, 'price_mean': price, 'brent_oil_eur': oil,
+        'price_std': rng.uniform(0.01, 0.05, n),
+    })
+
+
+def full_result(daily):
+    return market_phases.calculate_market_phases(daily.assign(fuel='e10'))
+
+
+def assert_same_result(result, expected):
+    """Phasen gleich, Metriken bis auf Rundung."""
+    exact = ('phase', 'start_date', 'end_date', 'duration_days')
+    assert [{k: p[k] for k in exact} for p in result['phases']] == [{k: p[k] for k in exact} for p in expected['phases']]
+    for got, want in zip(result['phases'], expected['phases']):
+        for key in ('avg_correlation', 'avg_lag', 'avg_vol_ratio'):
+            assert got[key] == pytest.approx(want[key], rel=1e-9, abs=1e-12)
+    got, want = pd.DataFrame(result['timeseries']), pd.DataFrame(expected['timeseries'])
+    assert list(got['date']) == list(want['date'])
+    assert list(got['phase']) == list(want['phase'])
+    numeric = [c for c in market_phases.TIMESERIES_COLUMNS if c not in ('date', 'phase')]
+    np.testing.assert_allclose(
+        got[numeric].to_numpy(dtype=float), want[numeric].to_numpy(dtype=float), rtol=1e-9, atol=1e-12
+    )
+
+
+@pytest.mark.parametrize('split', [100, 300, 399])
+def test_update_matches_full_calculation(split):
+    daily = daily_frame()
+    _, state = market_phases.update_market_phases(None, daily.iloc[:split])
+    result, new_state = market_phases.update_market_phases(state, daily.iloc[split:])
+    expected = full_result(daily)
+    assert any(p['phase'] != 'KEINE' for p in expected['phases'])
+    assert_same_result(result, expected)
+    assert len(new_state) == len(daily)
+    assert list(new_state.columns) == market_phases.STATE_COLUMNS
+
+
+def test_update_in_steps_matches_full_calculation():
+    daily = daily_frame()
+    _, state = market_phases.update_market_phases(None, daily.iloc[:60])
+    for start in range(60, len(daily), 45):
+        result, state = market_phases.update_market_phases(state, daily.iloc[start:start + 45])
+    assert_same_result(result, full_result(daily))
+
+
+def test_update_without_enough_state_computes_everything():
+    daily = daily_frame()
+    insufficient, state = market_phases.update_market_phases(None, daily.iloc[:10])
+    assert insufficient['meta']['error'] == 'Weniger als 14 Tage Daten'
+    result, _ = market_phases.update_market_phases(state, daily.iloc[10:])
+    assert_same_result(result, full_result(daily))
+
+
+def test_update_recomputes_corrected_and_removed_days():
+    daily = daily_frame()
+    _, state = market_phases.update_market_phases(None, daily.iloc[:350])
+    since = pd.Timestamp('2022-09-01')
+
+    corrected = daily.copy()
+    corrected.loc[corrected['date'] == pd.Timestamp('2022-10-15'), 'price_mean'] *= 1.05
+    corrected = corrected[corrected['date'] != pd.Timestamp('2022-11-20')].reset_index(drop=True)
+
+    result, new_state = market_phases.update_market_phases(
+        state, corrected[corrected['date'] >= since], since=since
+    )
+    assert_same_result(result, full_result(corrected))
+    assert pd.Timestamp('2022-11-20') not in set(new_state['date'])
+
+
+def test_first_changed_day():
+    daily = daily_frame(n=60)
+    first = market_phases.first_changed_day
+    assert first(daily, daily.copy()) is None
+
+    # Rundungsrauschen zählt nicht als Änderung, NaN gegen NaN auch nicht
+    noisy = daily.copy()
+    noisy['price_mean'] *= 1 + 1e-14
+    assert first(daily, noisy) is None
+
+    changed = daily.copy()
+    changed.loc[[30, 45], 'price_std'] += 0.001
+    assert first(daily, changed) == daily['date'][30]
+
+    gap = daily.copy()
+    gap.loc[[10, 20], 'brent_oil_eur'] = np.nan
+    assert first(daily, gap) == daily['date'][10]
+    assert first(gap, gap.copy()) is None
+
+    assert first(daily, daily.drop(index=40)) == daily['date'][40]
+    assert first(daily.iloc[:50], daily) == daily['date'][50]
@@ -1,5 +1,23 @@
 import { MarketPhasesChart } from '../components/MarketPhasesChart.js';
 import { state } from '../state.js';
+import { fetchWithJobs } from '../services/jobs.js';
+
+// Timeseries fields used by MarketPhasesChart
+const CHART_COLUMNS = ['price_mean', 'price_ma7', 'price_std', 'brent_oil_eur'];
+
+// Column payload (layout=columns) -> one object per day
+function columnsToRecords(ts) {
+    const start = Date.parse(`${ts.start}T00:00:00Z`);
+    const fields = Object.keys(ts).filter(k => !['start', 'count', 'offsets'].includes(k));
+    const rows = new Array(ts.count);
+    for (let i = 0; i < ts.count; i++) {
+        const offset = ts.offsets ? ts.offsets[i] : i;
+        const row = { date: new Date(start + offset * 86400000).toISOString().slice(0, 10) };
+        fields.forEach(f => { row[f] = ts[f][i]; });
+        rows[i] = row;
+    }
+    return rows;
+}
 
 export class MarketPhasesPage {
     constructor() {
@@ -246,12 +264,22 @@ export class MarketPhasesPage {
             if (this.state.region) {
                 params.append('region', this.state.region);
             }
-
-            const res = await fetch(`/api/data/market-phases?${params.toString()}`);
+            // Only what the chart draws: about one point per pixel, column layout
+            params.append('max_points', Math.max(200, Math.round(chartDiv.clientWidth || 800)));
+            params.append('columns', CHART_COLUMNS.join(','));
+            params.append('layout', 'columns');
+
+            // Uncached calculations run as a server job; show progress while waiting
+            const res = await fetchWithJobs(`/api/data/market-phases?${params.toString()}`, {
+                onProgress: job => {
+                    const text = job.status === 'running' ? 'Berechne Marktphasen...' : 'Warte auf Berechnung...';
+                    chartDiv.innerHTML = `<div style="display:flex;align-items:center;justify-content:center;height:100%;color:#888;">${text}</div>`;
+                }
+            });
             if (!res.ok) throw new Error('Fehler beim Laden der Daten');
 
             const json = await res.json();
-            this.data = json.timeseries;
+            this.data = Array.isArray(json.timeseries) ? json.timeseries : columnsToRecords(json.timeseries);
             this.meta = json.phases; // Phasen-Intervalle
             this.metaData = json.meta; // Meta-Informationen
 
@@ -1,5 +1,6 @@
 import { RegionalMap } from '../components/RegionalMap.js';
 import { state } from '../state.js';
+import { fetchWithJobs } from '../services/jobs.js';
 
 export class RegionalPage {
     constructor() {
@@ -671,7 +672,8 @@ export class RegionalPage {
         }
 
         try {
-            const response = await fetch(`/api/data/regional?year=${year}`);
+            // A missing grid is built by a server job; fetchWithJobs waits for it
+            const response = await fetchWithJobs(`/api/data/regional?year=${year}`);
 
             if (response.status === 404) {
                 // No Data for this year
@@ -0,0 +1,43 @@
+// Fetch for endpoints that answer a cache miss with "202 Accepted" + job id.
+// Polls the job until it is finished, then requests the original URL again
+// (now served from the cache). 503 responses are retried after Retry-After.
+
+const POLL_INTERVAL_MS = 500;
+const MAX_BUSY_RETRIES = 5;
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+async function waitForJob(job, onProgress) {
+    while (true) {
+        await sleep(POLL_INTERVAL_MS);
+        const res = await fetch(job.status_url);
+        // Every server process knows every job, so 404 means expired or unknown:
+        // re-requesting the URL would start the computation again
+        if (res.status === 404) throw new Error('Berechnung nicht mehr verfügbar');
+        job = await res.json();
+        if (onProgress) onProgress(job);
+        if (job.status === 'error') throw new Error(job.error || 'Berechnung fehlgeschlagen');
+        if (job.status === 'done') return;
+    }
+}
+
+export async function fetchWithJobs(url, { onProgress } = {}) {
+    let busy = 0;
+    while (true) {
+        const res = await fetch(url);
+        if (res.status === 202) {
+            const job = await res.json();
+            if (onProgress) onProgress(job);
+            await waitForJob(job, onProgress);
+            continue;
+        }
+        if (res.status === 503 && busy < MAX_BUSY_RETRIES) {
+            busy += 1;
+            const seconds = parseInt(res.headers.get('Retry-After') || '5', 10);
+            if (onProgress) onProgress({ status: 'busy', retry_after: seconds });
+            await sleep(seconds * 1000);
+            continue;
+        }
+        return res;
+    }
+}